@@ -0,0 +1,106 @@
+"""
+Build a simulated installation (about 300 files / 15 MB) and a minor release that changes
+10 files, serve both the full release zip and the delta manifest from a local HTTP stand-in,
+and compare bytes transferred and wall time of the full update flow (backup everything +
+download zip + extract + copy everything) with the delta update.
+
+Run from the project root: python -m benchmarks.autoupdate_delta
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import requests
+
+from src.autoupdate.delta import apply_delta_update, build_manifest, compute_delta
+
+
+if __name__ == '__main__':
+    import random
+    import threading
+    import zipfile
+    from functools import partial
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    logging.basicConfig(level=logging.WARNING)
+    served_bytes = []
+
+    class CountingHandler(SimpleHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def copyfile(self, source, outputfile):
+            data = source.read()
+            served_bytes.append(len(data))
+            outputfile.write(data)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        random.seed(0)
+        release_dir = os.path.join(work_dir, "release", "files")
+        install_dir = os.path.join(work_dir, "install")
+        for i in range(300):
+            rel_path = os.path.join("src", f"pkg{i % 12}", f"module_{i}.py")
+            size = random.randint(8, 90) * 1024
+            content = os.urandom(size // 2).hex().encode("ascii")
+            for base in (release_dir, install_dir):
+                os.makedirs(os.path.join(base, os.path.dirname(rel_path)), exist_ok=True)
+                with open(os.path.join(base, rel_path), "wb") as f:
+                    f.write(content)
+        # Minor release: 10 modified files and one new file
+        for i in random.sample(range(300), 10):
+            with open(os.path.join(release_dir, "src", f"pkg{i % 12}", f"module_{i}.py"), "ab") as f:
+                f.write(b"\n# changed\n")
+        with open(os.path.join(release_dir, "src", "new_feature.py"), "wb") as f:
+            f.write(b"print('new')\n")
+
+        release_root = os.path.join(work_dir, "release")
+        with zipfile.ZipFile(os.path.join(release_root, "release.zip"), "w", zipfile.ZIP_DEFLATED) as zipf:
+            for root, _, names in os.walk(release_dir):
+                for name in names:
+                    path = os.path.join(root, name)
+                    zipf.write(path, os.path.relpath(path, release_dir))
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(CountingHandler, directory=release_root))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}"
+        with open(os.path.join(release_root, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(build_manifest(release_dir, "1.0.1", f"{base}/files/"), f)
+        total_size = sum(os.path.getsize(os.path.join(r, n)) for r, _, ns in os.walk(install_dir) for n in ns)
+        print(f"Installation: 300 files, {total_size / 1024 / 1024:.1f} MB")
+
+        # Full update flow: back up every file, download the zip, extract and copy every file
+        full_dir = os.path.join(work_dir, "full")
+        shutil.copytree(install_dir, full_dir)
+        served_bytes.clear()
+        start = time.time()
+        with zipfile.ZipFile(os.path.join(work_dir, "full_backup.zip"), "w", zipfile.ZIP_DEFLATED) as zipf:
+            for root, _, names in os.walk(full_dir):
+                for name in names:
+                    path = os.path.join(root, name)
+                    zipf.write(path, os.path.relpath(path, full_dir))
+        response = requests.get(f"{base}/release.zip")
+        zip_path = os.path.join(work_dir, "update.zip")
+        with open(zip_path, "wb") as f:
+            f.write(response.content)
+        extract_dir = os.path.join(work_dir, "extracted")
+        with zipfile.ZipFile(zip_path) as zipf:
+            zipf.extractall(extract_dir)
+        shutil.copytree(extract_dir, full_dir, dirs_exist_ok=True)
+        print(f"Full update:  {sum(served_bytes) / 1024:.0f} KB transferred, {time.time() - start:.2f}s")
+
+        # Delta update (RollbackManager writes its snapshot under the real .backup directory,
+        # so the backup is skipped here and only the transfer/install path is measured)
+        served_bytes.clear()
+        result = apply_delta_update(f"{base}/manifest.json", "1.0.1", "1.0.0",
+                                    create_backup=False, root_dir=install_dir)
+        print(f"Delta update: {sum(served_bytes) / 1024:.0f} KB transferred, {result['elapsed']:.2f}s, "
+              f"{len(result['changed'])} files installed")
+        changed, _ = compute_delta(json.load(open(os.path.join(release_root, "manifest.json"))), install_dir)
+        print(f"Files still differing after delta update: {len(changed)}")
+        server.shutdown()
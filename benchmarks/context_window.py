@@ -0,0 +1,63 @@
+"""
+回放一段 300 轮的长对话（约每 25 轮贴一次长文章或网页提取结果），对比原来按条数截取（15 轮）
+和按 token 预算（8000）截取时，每次请求发送的提示词 token 数，以及维护上下文的耗时
+
+在项目根目录执行: python -m benchmarks.context_window
+"""
+
+from typing import Dict, List
+
+from src.services.ai.context_window import ContextWindow, MESSAGE_OVERHEAD, estimate_message_tokens, estimate_tokens
+
+
+if __name__ == '__main__':
+    import random
+    import time
+
+    random.seed(0)
+    max_groups = 15
+    token_budget = 8000
+    system_prompt = "你是一个温柔的角色。" * 300
+    system_tokens = estimate_tokens(system_prompt) + MESSAGE_OVERHEAD
+
+    conversation = []
+    for turn in range(300):
+        if turn % 25 == 10:
+            user_message = "帮我看看这篇文章：" + "这是一段很长的网页正文内容，包含许多细节。" * 400
+        else:
+            user_message = "今天" + "天气不错，我们去散步吧" * random.randint(1, 6)
+        conversation.append({"role": "user", "content": user_message})
+        conversation.append({"role": "assistant", "content": "好呀$" + "我也想出去走走" * random.randint(1, 8)})
+
+    def report(name: str, sizes: List[int], elapsed: float):
+        sizes = sorted(sizes)
+        print(f"{name}: 平均 {sum(sizes) / len(sizes):.0f}, P95 {sizes[int(len(sizes) * 0.95)]}, "
+              f"最大 {sizes[-1]} tokens/请求, 上下文维护 {elapsed * 1000:.1f} ms")
+
+    # 原实现：列表按条数截取，每次追加后重新切片
+    history: List[Dict] = []
+    sizes = []
+    elapsed = 0.0
+    for index, message in enumerate(conversation):
+        start = time.perf_counter()
+        history.append(message)
+        while len(history) > max_groups * 2:
+            history = history[-max_groups * 2:]
+        elapsed += time.perf_counter() - start
+        if message["role"] == "user":
+            sizes.append(system_tokens + sum(estimate_message_tokens(m) for m in history[-max_groups * 2:]))
+    report("按条数截取", sizes, elapsed)
+
+    window = ContextWindow(max_groups * 2, token_budget)
+    sizes = []
+    elapsed = 0.0
+    for message in conversation:
+        start = time.perf_counter()
+        window.append(message)
+        if message["role"] == "user":
+            selected, used = window.select(system_tokens)
+            elapsed += time.perf_counter() - start
+            sizes.append(system_tokens + used)
+        else:
+            elapsed += time.perf_counter() - start
+    report("按 token 预算", sizes, elapsed)
@@ -0,0 +1,80 @@
+"""
+生成包含 10000 个表情包的模拟表情库，对比逐次 listdir 与内存索引两种方式下
+回复后处理（提取表情标签、清理标签、选择表情包）的耗时
+
+在项目根目录执行: python -m benchmarks.emoji_handler
+"""
+
+import logging
+import os
+import random
+import time
+
+from src.handlers.emoji import EMOJI_EXTENSIONS, EmojiHandler
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    def legacy_process(handler: EmojiHandler, reply: str) -> list:
+        """原实现：逐字符查找标签，逐个标签替换，每个标签 listdir 一次"""
+        selected = []
+        for part in reply.split('$'):
+            tags = []
+            start = 0
+            while True:
+                start = part.find('[', start)
+                if start == -1:
+                    break
+                end = part.find(']', start)
+                if end == -1:
+                    break
+                tag = part[start + 1:end].lower()
+                if tag in handler.emotion_types:
+                    tags.append(tag)
+                start = end + 1
+            for tag in tags:
+                part = part.replace(f'[{tag}]', '')
+            for tag in tags:
+                target_dir = os.path.join(handler.emoji_dir, tag)
+                if os.path.exists(target_dir):
+                    files = [f for f in os.listdir(target_dir) if f.lower().endswith(EMOJI_EXTENSIONS)]
+                    if files:
+                        selected.append(os.path.join(target_dir, random.choice(files)))
+        return selected
+
+    def indexed_process(handler: EmojiHandler, reply: str) -> list:
+        selected = []
+        for part in reply.split('$'):
+            part, tags = handler.split_emotion_tags(part)
+            for tag in tags:
+                path = handler.get_emoji_for_emotion(tag)
+                if path:
+                    selected.append(path)
+        return selected
+
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        handler = EmojiHandler(tmp_dir)
+        handler.emoji_dir = os.path.join(tmp_dir, "emojis")
+        total_files = 10000
+        for i in range(total_files):
+            emotion_type = handler.emotion_types[i % len(handler.emotion_types)]
+            target_dir = os.path.join(handler.emoji_dir, emotion_type)
+            os.makedirs(target_dir, exist_ok=True)
+            open(os.path.join(target_dir, f"{i}.gif"), "wb").close()
+
+        start = time.perf_counter()
+        handler.build_emoji_index()
+        print(f"建立索引耗时: {(time.perf_counter() - start) * 1000:.1f} 毫秒")
+
+        replies = [
+            f"今天好开心呀[happy]$你呢？[{random.choice(handler.emotion_types)}]$[Love]晚上一起吃饭吧",
+            "嗯嗯，我知道啦$[sleepy]有点困了$那我先去睡啦[tired]",
+        ] * 500
+        for name, process in (("listdir", legacy_process), ("内存索引", indexed_process)):
+            start = time.perf_counter()
+            for reply in replies:
+                process(handler, reply)
+            cost = (time.perf_counter() - start) / len(replies) * 1000
+            print(f"{name}: 平均每条回复后处理 {cost:.3f} 毫秒")
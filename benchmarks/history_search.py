@@ -0,0 +1,72 @@
+"""
+在临时数据库中生成 2000000 条聊天记录（写入后统一补齐全文索引），对比全文索引搜索和逐行 LIKE 匹配的耗时
+
+在项目根目录执行: python -m benchmarks.history_search
+"""
+
+from datetime import datetime
+
+from src.services.history_search import ChatHistorySearch
+
+
+if __name__ == '__main__':
+    import os
+    import random
+    import tempfile
+    import time
+    from src.services.database import create_db_engine, init_db, init_fts
+
+    total = 2000000
+    random.seed(0)
+    chars = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严龙飞"
+    words = ["".join(random.sample(chars, random.choice((2, 2, 3, 4)))) for _ in range(3000)]
+    english = ["hello", "coffee", "python", "movie", "weekend", "music", "travel", "photo"]
+
+    def sentence() -> str:
+        parts = random.choices(words, k=random.randint(3, 10))
+        if random.random() < 0.1:
+            parts.append(random.choice(english))
+        return "，".join(parts)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bench_engine = create_db_engine(os.path.join(tmp_dir, "bench.db"))
+        init_db(bench_engine)
+        start = time.perf_counter()
+        raw = bench_engine.raw_connection()
+        cursor = raw.cursor()
+        batch = 50000
+        for offset in range(0, total, batch):
+            cursor.executemany(
+                "INSERT INTO chat_messages (sender_id, sender_name, message, reply, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(f"wxid_{random.randint(0, 1999)}", "用户", sentence(), sentence(),
+                  datetime.now().isoformat(sep=" ")) for _ in range(batch)])
+            raw.commit()
+        raw.close()
+        init_fts(bench_engine)
+        print(f"生成 {total} 条聊天记录（含全文索引）: {time.perf_counter() - start:.1f} 秒, "
+              f"数据库 {os.path.getsize(os.path.join(tmp_dir, 'bench.db')) / 1024 / 1024:.0f} MB")
+
+        search = ChatHistorySearch(bench_engine)
+        rare_phrase = words[7] + "，" + words[8]
+        cases = [
+            ("常见两字词", words[0][:2], None, "recent"),
+            ("四字词", next(word for word in words if len(word) == 4), None, "recent"),
+            ("相邻两词（短语）", rare_phrase, None, "recent"),
+            ("两个词同时出现", f"{words[3]} {words[4]}", None, "recent"),
+            ("英文单词", "coffee", None, "recent"),
+            ("指定发送者", words[5], "wxid_42", "recent"),
+            ("按相关度排序", words[6], None, "relevance"),
+            ("单字（逐行匹配）", words[0][:1], None, "recent"),
+        ]
+        for name, query, sender_id, order in cases:
+            start = time.perf_counter()
+            for _ in range(5):
+                results = search.search(query, sender_id=sender_id, limit=20, order=order)
+            elapsed = (time.perf_counter() - start) / 5 * 1000
+            print(f"{name} [{query}]: {len(results)} 条, {elapsed:.2f} ms")
+
+        with bench_engine.connect() as conn:
+            start = time.perf_counter()
+            conn.exec_driver_sql("SELECT id FROM chat_messages WHERE message LIKE ? OR reply LIKE ? "
+                                 "ORDER BY id DESC LIMIT 20", (f"%{rare_phrase}%", f"%{rare_phrase}%")).fetchall()
+            print(f"对照 - 逐行 LIKE 匹配相邻两词: {(time.perf_counter() - start) * 1000:.2f} ms")
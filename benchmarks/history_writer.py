@@ -0,0 +1,101 @@
+"""
+在临时数据库中对比原来每条消息一个线程、一个会话、单独提交（默认日志模式）的写入方式，
+和 WAL + 批量提交的写入线程：持续写入 1000000 条记录的吞吐量、持续负载下的写入延迟，以及百万行时按用户查询最近记录的耗时
+
+在项目根目录执行: python -m benchmarks.history_writer
+"""
+
+import threading
+import time
+from typing import List
+
+from src.services.database import ChatMessage
+from src.services.history_writer import ChatHistoryWriter
+
+
+if __name__ == '__main__':
+    import os
+    import random
+    import tempfile
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.services.database import Base, create_db_engine, init_db
+
+    total = 1000000
+    users = [f"wxid_{i}" for i in range(2000)]
+
+    def percentile(values: List[float], ratio: float) -> float:
+        values = sorted(values)
+        return values[min(len(values) - 1, int(len(values) * ratio))]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # 原写入方式：每条消息一个线程、一个会话、单独提交
+        old_engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'old.db')}")
+        Base.metadata.create_all(old_engine)
+        OldSession = sessionmaker(bind=old_engine)
+        old_count = 2000
+        old_latencies = []
+
+        def save_old(sender_id: str):
+            start = time.perf_counter()
+            try:
+                session = OldSession()
+                session.add(ChatMessage(sender_id=sender_id, sender_name="用户", message="你好" * 10, reply="好呀" * 20))
+                session.commit()
+                session.close()
+                old_latencies.append(time.perf_counter() - start)
+            except Exception:
+                pass
+
+        start = time.perf_counter()
+        threads = []
+        for i in range(old_count):
+            thread = threading.Thread(target=save_old, args=(random.choice(users),))
+            thread.start()
+            threads.append(thread)
+            if len(threads) >= 8:
+                threads.pop(0).join()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        print(f"每条消息单独提交: {old_count} 条 {elapsed:.2f} 秒, {len(old_latencies) / elapsed:.0f} 条/秒, "
+              f"失败 {old_count - len(old_latencies)} 条, 延迟 P50 {percentile(old_latencies, 0.5) * 1000:.1f} ms, "
+              f"P99 {percentile(old_latencies, 0.99) * 1000:.1f} ms")
+
+        # 写入线程：WAL + 批量提交
+        new_engine = create_db_engine(os.path.join(tmp_dir, 'new.db'))
+        init_db(new_engine)
+        writer = ChatHistoryWriter(sessionmaker(bind=new_engine))
+        start = time.perf_counter()
+        for i in range(total):
+            writer.write(users[i % len(users)], "用户", "你好" * 10, "好呀" * 20)
+        writer.flush()
+        elapsed = time.perf_counter() - start
+        metrics = writer.get_metrics()
+        print(f"写入线程批量提交: {metrics['written']} 条 {elapsed:.2f} 秒, {metrics['written'] / elapsed:.0f} 条/秒, "
+              f"{metrics['batches']} 个事务, 延迟 P50 {percentile(list(writer._latencies), 0.5) * 1000:.1f} ms, "
+              f"P99 {metrics['p99_latency'] * 1000:.1f} ms, 最大 {metrics['max_latency'] * 1000:.1f} ms")
+
+        # 持续负载下的写入延迟：8 个线程共每秒约 2000 条，持续 5 秒
+        writer._latencies.clear()
+
+        def steady_producer():
+            for i in range(1250):
+                writer.write(random.choice(users), "用户", "你好" * 10, "好呀" * 20)
+                time.sleep(0.004)
+
+        producers = [threading.Thread(target=steady_producer) for _ in range(8)]
+        for thread in producers:
+            thread.start()
+        for thread in producers:
+            thread.join()
+        writer.flush()
+        metrics = writer.get_metrics()
+        print(f"持续负载（约 2000 条/秒）写入延迟: 平均 {metrics['avg_latency'] * 1000:.2f} ms, "
+              f"P99 {metrics['p99_latency'] * 1000:.2f} ms, 最大 {metrics['max_latency'] * 1000:.2f} ms")
+
+        start = time.perf_counter()
+        for user in users[:200]:
+            writer.get_recent_history(user, limit=20)
+        print(f"百万行按用户查询最近 20 条: 平均 {(time.perf_counter() - start) / 200 * 1000:.2f} ms/次")
+        writer.stop()
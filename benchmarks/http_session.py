@@ -0,0 +1,73 @@
+"""
+启动本地 HTTPS 模拟服务器（自签名证书，需要 openssl 命令），
+对比每次新建连接的 requests.post 与共享连接池的平均请求耗时
+
+在项目根目录执行: python -m benchmarks.http_session
+"""
+
+import threading
+
+import requests
+
+from src.services.http_session import HttpSessionPool
+
+
+if __name__ == '__main__':
+    import json
+    import os
+    import ssl
+    import subprocess
+    import tempfile
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            body = json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    rounds = 200
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cert_path = os.path.join(tmp_dir, "cert.pem")
+        key_path = os.path.join(tmp_dir, "key.pem")
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+             "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost",
+             "-keyout", key_path, "-out", cert_path],
+            check=True, capture_output=True
+        )
+        server = ThreadingHTTPServer(("localhost", 0), Handler)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_path, key_path)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        url = f"https://localhost:{server.server_port}/v1/chat/completions"
+        payload = {"model": "test", "messages": [{"role": "user", "content": "hi"}]}
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            requests.post(url, json=payload, verify=cert_path, timeout=10).json()
+        plain_cost = (time.perf_counter() - start) / rounds * 1000
+
+        pool = HttpSessionPool()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            pool.post(url, json=payload, verify=cert_path).json()
+        pooled_cost = (time.perf_counter() - start) / rounds * 1000
+
+        print(f"requests.post（每次新建连接）: 平均 {plain_cost:.2f} 毫秒/次")
+        print(f"共享连接池: 平均 {pooled_cost:.2f} 毫秒/次")
+        print(f"连接统计: {pool.stats()}")
+        server.shutdown()
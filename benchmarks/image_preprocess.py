@@ -0,0 +1,79 @@
+"""
+对一组图片（默认生成模拟的手机照片和聊天截图，也可以传入图片目录）分别统计
+原图与压缩后的请求体大小，以及上传到本地模拟服务器的耗时
+在项目根目录执行: python -m benchmarks.image_preprocess [图片目录]
+"""
+
+from typing import Tuple
+
+from src.services.ai.image_preprocess import Image, _sniff_mime_type, crop_emoji_region, prepare_image
+
+
+if __name__ == '__main__':
+    import base64
+    import json
+    import os
+    import sys
+    import tempfile
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.request import Request, urlopen
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            body = b'{"choices": [{"message": {"content": "ok"}}]}'
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def upload(url: str, image_data: bytes, mime_type: str) -> Tuple[int, float]:
+        body = json.dumps({
+            "model": "test",
+            "messages": [{"role": "user", "content": [
+                {"type": "image_url", "image_url": {
+                    "url": f"data:{mime_type};base64,{base64.b64encode(image_data).decode('utf-8')}"}},
+                {"type": "text", "text": "请描述这个图片"}
+            ]}]
+        }).encode("utf-8")
+        start = time.perf_counter()
+        with urlopen(Request(url, data=body, headers={"Content-Type": "application/json"})) as response:
+            response.read()
+        return len(body), time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if len(sys.argv) > 1:
+            sample_dir = sys.argv[1]
+        else:
+            # 模拟样本：带噪点的 4000x3000 照片（接近 12MP 手机照片）和 1920x1080 聊天截图
+            sample_dir = tmp_dir
+            Image.effect_noise((4000, 3000), 40).convert("RGB").save(os.path.join(tmp_dir, "photo.jpg"), quality=92)
+            screenshot = Image.new("RGB", (1920, 1080), (245, 245, 245))
+            screenshot.paste(Image.effect_noise((240, 240), 60).convert("RGB"), (120, 620))
+            screenshot.save(os.path.join(tmp_dir, "screenshot.png"))
+            (crop_emoji_region(screenshot) or screenshot).save(os.path.join(tmp_dir, "screenshot_cropped.png"))
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+
+        for name in sorted(os.listdir(sample_dir)):
+            path = os.path.join(sample_dir, name)
+            if not name.lower().endswith((".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp")):
+                continue
+            with open(path, "rb") as f:
+                raw = f.read()
+            before_size, before_cost = upload(url, raw, _sniff_mime_type(raw))
+            prepared, mime_type = prepare_image(path)
+            after_size, after_cost = upload(url, prepared, mime_type)
+            print(f"{name}: 请求体 {before_size / 1024:.0f}KB -> {after_size / 1024:.0f}KB ({mime_type}), "
+                  f"上传耗时 {before_cost * 1000:.1f}ms -> {after_cost * 1000:.1f}ms")
+        server.shutdown()
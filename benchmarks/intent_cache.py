@@ -0,0 +1,45 @@
+"""
+回放一段聊天记录（默认使用内置样例，也可以传入每行一条消息的文本文件），
+统计提醒意图和联网意图识别各自避免的模型调用次数
+在项目根目录执行: python -m benchmarks.intent_cache [聊天记录文件]
+"""
+
+from modules.recognition.intent_cache import VerdictCache, has_time_hint, is_trivial_message
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "r", encoding="utf-8") as f:
+            chat_log = [line.strip() for line in f if line.strip()]
+    else:
+        chat_log = [
+            "早安", "在吗？", "今天好累啊", "哈哈哈", "用户发送了一张表情包，表情包的内容是：：一只猫在睡觉",
+            "嗯嗯", "晚上吃什么好呢", "10分钟后提醒我关火", "好的", "谢谢~", "😂😂", "你在干嘛呀",
+            "最近有什么好看的电影", "哈哈哈", "早安", "明天早上八点叫我起床", "晚安", "嗯", "🙂", "你好",
+            "我想你了", "在吗？", "最近有什么好看的电影", "好的", "今天天气怎么样", "ok", "嘿嘿",
+        ]
+
+    reminder_cache = VerdictCache()
+    search_cache = VerdictCache()
+
+    for message in chat_log:
+        # 提醒意图：预过滤 -> 缓存（只缓存"无提醒"结果）-> 调用模型
+        if is_trivial_message(message) or not has_time_hint(message):
+            reminder_cache.record_skip()
+        elif reminder_cache.get(message) is None:
+            reminder_cache.record_call()
+
+        # 联网意图：预过滤 -> 缓存 -> 调用模型
+        if is_trivial_message(message):
+            search_cache.record_skip()
+        elif search_cache.get(message) is None:
+            search_cache.record_call()
+            search_cache.put(message, {"search_required": False, "search_query": ""})
+
+    print(f"回放 {len(chat_log)} 条消息")
+    for name, cache in (("提醒意图", reminder_cache), ("联网意图", search_cache)):
+        stats = cache.stats()
+        print(f"[{name}] 调用模型 {stats['classifier_calls']} 次, 缓存命中 {stats['cache_hits']} 次, "
+              f"预过滤跳过 {stats['skipped']} 次, 避免调用比例 {stats['avoided_rate']:.0%}")
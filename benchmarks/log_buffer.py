@@ -0,0 +1,39 @@
+"""
+写入 100000 行日志，验证内存占用固定、两个读取方按各自游标读取互不影响，以及等待新日志的唤醒延迟
+
+在项目根目录执行: python -m benchmarks.log_buffer
+"""
+
+import threading
+
+from src.utils.log_buffer import LogRingBuffer
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    buffer = LogRingBuffer(capacity=1000)
+    for i in range(100000):
+        buffer.append(f"[12:00:00] 第{i}行日志 " + "x" * 80)
+    size = sys.getsizeof(buffer._lines) + sum(sys.getsizeof(line) for _, line in buffer._lines)
+    print(f"写入 100000 行后缓冲区保存 {len(buffer._lines)} 行, 约 {size / 1024:.0f} KB")
+
+    lines, cursor_a, missed = buffer.read(cursor=99000 - 500)
+    print(f"读取方A 游标 98500: 读到 {len(lines)} 行, 新游标 {cursor_a}, 错过 {missed} 行")
+    lines, cursor_b, _ = buffer.read(cursor=99990)
+    print(f"读取方B 游标 99990: 读到 {len(lines)} 行, 新游标 {cursor_b}")
+    buffer.append("新日志")
+    print(f"新日志写入后: A 读到 {len(buffer.read(cursor_a)[0])} 行, B 读到 {len(buffer.read(cursor_b)[0])} 行")
+
+    latency = []
+
+    def writer():
+        time.sleep(0.2)
+        latency.append(time.time())
+        buffer.append("唤醒测试")
+
+    threading.Thread(target=writer).start()
+    has_new = buffer.wait(buffer.last_seq, timeout=5)
+    print(f"等待新日志: {has_new}, 唤醒延迟 {(time.time() - latency[0]) * 1000:.2f} ms")
+    print(f"服务端重启后的旧游标: 读到 {len(LogRingBuffer().read(cursor=500)[0])} 行")
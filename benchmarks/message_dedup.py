@@ -0,0 +1,32 @@
+"""
+模拟处理 1000 万条消息，对比无上限 set 和去重器的内存增长
+在项目根目录执行: python -m benchmarks.message_dedup [消息数量]
+"""
+
+import time
+
+from src.utils.message_dedup import MessageDeduplicator
+
+
+if __name__ == '__main__':
+    import sys
+    import tracemalloc
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    step = max(total // 10, 1)
+
+    def run(name, container, add):
+        tracemalloc.start()
+        start = time.perf_counter()
+        for i in range(total):
+            add(container, f"msg-{i}")
+            if (i + 1) % step == 0:
+                current, _ = tracemalloc.get_traced_memory()
+                print(f"[{name}] {i + 1:>10} 条消息: 占用 {current / 1024 / 1024:8.1f} MB")
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        cost = time.perf_counter() - start
+        print(f"[{name}] 峰值 {peak / 1024 / 1024:.1f} MB, 记录数 {len(container)}, 耗时 {cost:.1f} 秒\n")
+
+    run("无上限 set", set(), lambda s, msg_id: s.add(msg_id))
+    run("MessageDeduplicator", MessageDeduplicator(), lambda d, msg_id: d.add(msg_id))
@@ -0,0 +1,48 @@
+"""
+对比 1000 个模拟用户下每次构建系统提示词的耗时
+
+在项目根目录执行: python -m benchmarks.prompt_cache
+"""
+
+import os
+
+from src.services.ai.prompt_cache import prompt_cache
+
+
+if __name__ == '__main__':
+    import tempfile
+    import time
+
+    users = 1000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        base_path = os.path.join(tmp_dir, "base.md")
+        worldview_path = os.path.join(tmp_dir, "worldview.md")
+        with open(base_path, "w", encoding="utf-8") as f:
+            f.write("基础设定\n" * 200)
+        with open(worldview_path, "w", encoding="utf-8") as f:
+            f.write("世界观\n" * 200)
+        persona = "人设内容\n" * 300
+
+        def build_uncached():
+            with open(base_path, "r", encoding="utf-8") as f:
+                base = f.read()
+            with open(worldview_path, "r", encoding="utf-8") as f:
+                worldview = f.read()
+            return f"{base}\n\n你所饰演的角色所处世界的世界观为：\n{worldview}\n\n你所扮演的角色介绍如下：\n{persona}"
+
+        def build_cached():
+            base = prompt_cache.read(base_path)
+            worldview = prompt_cache.read(worldview_path)
+            prefix, suffix = prompt_cache.get_static_prompt(persona, lambda: (
+                f"{base}\n\n你所饰演的角色所处世界的世界观为：\n{worldview}",
+                f"\n\n你所扮演的角色介绍如下：\n{persona}"
+            ))
+            return f"{prefix}{suffix}"
+
+        assert build_uncached() == build_cached()
+        for name, build in (("无缓存", build_uncached), ("有缓存", build_cached)):
+            start = time.perf_counter()
+            for _ in range(users):
+                build()
+            cost = (time.perf_counter() - start) / users * 1e6
+            print(f"{name}: 每次构建 {cost:.1f} 微秒 ({users} 个模拟用户)")
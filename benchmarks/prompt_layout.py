@@ -0,0 +1,95 @@
+"""
+启动本地模拟服务器：按 64 token 为一块缓存提示词前缀（与 DeepSeek 的硬盘缓存方式类似），
+首字延迟 = 20 毫秒 + 每个未命中 token 0.2 毫秒，并在 usage 中返回缓存命中的 token 数。
+分别用默认布局和稳定前缀布局回放 30 轮对话，对比缓存命中率和平均首字延迟
+
+在项目根目录执行: python -m benchmarks.prompt_layout
+"""
+
+import threading
+from typing import Dict, List
+
+from src.services.ai.prompt_layout import PromptUsageStats, build_chat_messages
+
+
+if __name__ == '__main__':
+    import hashlib
+    import json
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    import requests
+
+    from src.services.ai.context_window import ContextWindow, estimate_tokens
+
+    BLOCK_TOKENS = 64
+    cached_blocks = set()
+
+    def tokenize(messages: List[Dict]) -> List[str]:
+        # 按估算的 token 数把序列化后的消息切成等长片段，模拟分词结果
+        tokens = []
+        for message in messages:
+            text = f"<|{message['role']}|>{message['content']}"
+            count = max(1, estimate_tokens(text))
+            step = max(1, len(text) // count)
+            tokens.extend(text[i:i + step] for i in range(0, len(text), step))
+        return tokens
+
+    class PrefixCacheHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            tokens = tokenize(payload["messages"])
+            digest = hashlib.sha256()
+            cached = 0
+            for start in range(0, len(tokens) - BLOCK_TOKENS + 1, BLOCK_TOKENS):
+                digest.update("".join(tokens[start:start + BLOCK_TOKENS]).encode("utf-8"))
+                key = digest.hexdigest()
+                if key in cached_blocks and cached == start:
+                    cached += BLOCK_TOKENS
+                cached_blocks.add(key)
+            time.sleep(0.02 + (len(tokens) - cached) * 0.0002)
+            body = json.dumps({
+                "choices": [{"message": {"role": "assistant", "content": "好呀"}}],
+                "usage": {"prompt_tokens": len(tokens), "completion_tokens": 2,
+                          "prompt_tokens_details": {"cached_tokens": cached}}
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PrefixCacheHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+
+    prefix = "你需要遵守以下对话规则。" * 150 + "\n\n你所饰演的角色所处世界的世界观为：\n" + "这是一个安静的小镇。" * 100
+    suffix = "\n\n你所扮演的角色介绍如下：\n" + "她温柔、体贴，喜欢读书和散步。" * 120
+    core_memory = "用户喜欢猫，住在杭州。"
+    session = requests.Session()
+
+    for stable_prefix in (False, True):
+        cached_blocks.clear()
+        stats = PromptUsageStats()
+        window = ContextWindow(30)
+        elapsed = []
+        for turn in range(30):
+            window.append({"role": "user", "content": f"第{turn}句话，今天过得怎么样？"})
+            time_prompt = f"当前时间是 2025年01月01日 12:{turn:02d}:{turn * 7 % 60:02d} 星期三，腊月初二。"
+            messages, _ = build_chat_messages(prefix, suffix, core_memory, time_prompt,
+                                              list(window), stable_prefix)
+            start = time.perf_counter()
+            response = session.post(url, json={"model": "stand-in", "messages": messages}).json()
+            elapsed.append(time.perf_counter() - start)
+            stats.record(response["usage"])
+            window.append({"role": "assistant", "content": response["choices"][0]["message"]["content"]})
+        result = stats.stats()
+        name = "稳定前缀布局" if stable_prefix else "默认布局"
+        print(f"{name}: 提示词 {result['prompt_tokens']} tokens, 缓存命中 {result['cached_tokens']} tokens "
+              f"({result['hit_rate']:.0%}), 平均首字延迟 {sum(elapsed) / len(elapsed) * 1000:.0f} ms")
+    server.shutdown()
@@ -0,0 +1,66 @@
+"""
+添加 100000 个一天后到期的提醒，分别统计原来每秒全量扫描的轮询方式和堆调度器在空闲时的 CPU 占用，
+并验证到期任务能按时执行
+
+在项目根目录执行: python -m benchmarks.reminder_scheduler
+"""
+
+import threading
+import time
+
+from modules.reminder.scheduler import ReminderScheduler
+
+
+if __name__ == '__main__':
+    from datetime import datetime, timedelta
+
+    pending = 100000
+    measure_seconds = 5
+
+    class Task:
+        def __init__(self, target_time: datetime):
+            self.target_time = target_time
+
+        def is_due(self) -> bool:
+            return datetime.now() >= self.target_time
+
+    # 原实现：每秒加锁并逐个检查所有任务
+    tasks = {f"task_{i}": Task(datetime.now() + timedelta(days=1)) for i in range(pending)}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def poll_loop():
+        while not stop.is_set():
+            with lock:
+                due = [task_id for task_id, task in tasks.items() if task.is_due()]
+                for task_id in due:
+                    del tasks[task_id]
+            time.sleep(1)
+
+    cpu_start = time.process_time()
+    threading.Thread(target=poll_loop, daemon=True).start()
+    time.sleep(measure_seconds)
+    stop.set()
+    poll_cpu = time.process_time() - cpu_start
+    print(f"每秒全量扫描: {pending} 个待执行提醒, {measure_seconds} 秒内 CPU 时间 {poll_cpu:.3f} 秒 "
+          f"({poll_cpu / measure_seconds:.1%})")
+
+    fired = []
+    scheduler = ReminderScheduler(lambda task_id, task: fired.append((task_id, time.time() - task)))
+    due_time = time.time() + 86400
+    for i in range(pending):
+        scheduler.add(f"task_{i}", due_time + i, due_time + i)
+    scheduler.start()
+    cpu_start = time.process_time()
+    time.sleep(measure_seconds)
+    heap_cpu = time.process_time() - cpu_start
+    print(f"堆调度器: {len(scheduler)} 个待执行提醒, {measure_seconds} 秒内 CPU 时间 {heap_cpu:.3f} 秒 "
+          f"({heap_cpu / measure_seconds:.1%})")
+
+    for i in range(pending // 2):
+        scheduler.cancel(f"task_{i}")
+    now = time.time()
+    scheduler.add("soon", now + 0.5, now + 0.5)
+    time.sleep(1)
+    print(f"取消一半后剩余 {len(scheduler)} 个, 到期任务执行: {fired}")
+    scheduler.stop()
@@ -0,0 +1,77 @@
+"""
+使用模拟的 WeChat.SendMsg（每次发送耗时 50 毫秒），4 个会话同时各回复 5 段消息，
+对比在工作线程中 sleep 的分段发送与发送调度器的工作线程占用时间，并检查每个会话的发送顺序
+（分段间隔按 1/10 缩放：0.4-0.8 秒）
+
+在项目根目录执行: python -m benchmarks.send_scheduler
+"""
+
+import threading
+import time
+from typing import Callable, Tuple
+
+from src.utils.send_scheduler import SendScheduler
+
+
+if __name__ == '__main__':
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+
+    class FakeWeChat:
+        def __init__(self):
+            self.sent = []
+            self._lock = threading.Lock()
+
+        def SendMsg(self, msg, who):
+            time.sleep(0.05)
+            with self._lock:
+                self.sent.append((who, msg))
+
+    chats = [f"会话{i}" for i in range(4)]
+    parts = [f"第{i}段" for i in range(5)]
+
+    def check_order(wx: FakeWeChat) -> bool:
+        return all([msg for who, msg in wx.sent if who == chat] == parts for chat in chats)
+
+    def run(reply: Callable[[str], None]) -> Tuple[float, float]:
+        occupancy = []
+
+        def worker(chat_id: str):
+            start = time.time()
+            reply(chat_id)
+            occupancy.append(time.time() - start)
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=len(chats)) as executor:
+            list(executor.map(worker, chats))
+        return sum(occupancy), time.time() - start
+
+    # 原实现：工作线程中发送并 sleep
+    sleep_wx = FakeWeChat()
+
+    def sleep_reply(chat_id: str):
+        for part in parts:
+            sleep_wx.SendMsg(msg=part, who=chat_id)
+            time.sleep(random.uniform(0.4, 0.8))
+
+    busy, elapsed = run(sleep_reply)
+    print(f"sleep 分段发送: 工作线程占用合计 {busy:.2f} 秒, 全部发送完成 {elapsed:.2f} 秒, "
+          f"顺序正确: {check_order(sleep_wx)}")
+
+    # 发送调度器：工作线程只负责加入队列
+    outbox_wx = FakeWeChat()
+    scheduler = SendScheduler()
+    scheduler.start()
+
+    def outbox_reply(chat_id: str):
+        for part in parts:
+            scheduler.schedule(chat_id, lambda part=part: outbox_wx.SendMsg(msg=part, who=chat_id),
+                               gap=random.uniform(0.4, 0.8))
+
+    start = time.time()
+    busy, _ = run(outbox_reply)
+    scheduler.wait_idle()
+    elapsed = time.time() - start
+    print(f"发送调度器: 工作线程占用合计 {busy * 1000:.2f} 毫秒, 全部发送完成 {elapsed:.2f} 秒, "
+          f"顺序正确: {check_order(outbox_wx)}, 统计: {scheduler.get_metrics()}")
+    scheduler.stop()
@@ -0,0 +1,76 @@
+"""
+用模拟的 GetListenMessage 消息源压测：20 个会话，每个会话 10 条消息，
+其中一个会话的每条消息处理耗时 0.5 秒（模拟慢速 LLM 调用），其余 0.02 秒，
+对比单线程队列和分片线程池的总耗时、等待时间，并检查每个会话内的消息顺序
+
+在项目根目录执行: python -m benchmarks.sharded_worker_pool
+"""
+
+import threading
+import time
+
+from src.utils.sharded_worker_pool import ShardedWorkerPool
+
+
+if __name__ == '__main__':
+    import random
+
+    class FakeMessage:
+        def __init__(self, who, seq):
+            self.sender = who
+            self.content = f"{who} 的第 {seq} 条消息"
+            self.seq = seq
+
+    class FakeWeChat:
+        """模拟 wxauto.WeChat，GetListenMessage 每次返回若干会话的一批新消息"""
+
+        def __init__(self, chats, messages_per_chat):
+            self.pending = {who: [FakeMessage(who, seq) for seq in range(messages_per_chat)] for who in chats}
+
+        def GetListenMessage(self):
+            batch = {}
+            for who in random.sample(list(self.pending), k=min(5, len(self.pending))):
+                messages = self.pending[who]
+                count = random.randint(1, 3)
+                batch[who], self.pending[who] = messages[:count], messages[count:]
+                if not self.pending[who]:
+                    del self.pending[who]
+            return batch
+
+    chats = [f"用户{i}" for i in range(20)]
+    slow_chat = chats[0]
+
+    def run(workers):
+        random.seed(0)
+        wx = FakeWeChat(chats, 10)
+        received = {who: [] for who in chats}
+        received_lock = threading.Lock()
+
+        def handle(msg, chat_name):
+            time.sleep(0.5 if chat_name == slow_chat else 0.02)
+            with received_lock:
+                received[chat_name].append(msg.seq)
+
+        pool = ShardedWorkerPool(f"压测-{workers}线程", workers, handle)
+        pool.start()
+        start = time.perf_counter()
+        # 模拟消息分发器
+        while True:
+            msgs = wx.GetListenMessage()
+            if not msgs:
+                break
+            for who, one_msgs in msgs.items():
+                for msg in one_msgs:
+                    pool.submit(who, msg, who)
+        pool.join()
+        cost = time.perf_counter() - start
+        metrics = pool.get_metrics()
+        pool.stop()
+
+        ordered = all(seqs == sorted(seqs) and len(seqs) == 10 for seqs in received.values())
+        print(f"[{pool.name}] 总耗时 {cost:.2f} 秒, 处理 {metrics['processed']} 条, "
+              f"平均等待 {metrics['avg_wait'] * 1000:.0f} 毫秒, 最大等待 {metrics['max_wait'] * 1000:.0f} 毫秒, "
+              f"会话内顺序正确: {ordered}")
+
+    run(1)
+    run(8)
@@ -0,0 +1,84 @@
+"""
+启动本地 SSE 模拟服务器（按 OpenAI chat.completion.chunk 格式逐字输出，每个字间隔 50 毫秒），
+对比流式分段发送与等待完整回复后发送的首条消息耗时
+
+在项目根目录执行: python -m benchmarks.stream_segmenter
+"""
+
+from src.services.ai.stream_segmenter import StreamSegmenter, consume_stream
+
+
+if __name__ == '__main__':
+    import json
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from openai import OpenAI
+
+    reply = "<think>先想一想用户在问什么</think>早上好呀$今天天气不错[开心]$要不要一起出去走走？"
+    char_delay = 0.05
+
+    class SSEHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            self.send_response(200)
+            if not body.get("stream"):
+                time.sleep(char_delay * len(reply))
+                payload = json.dumps({
+                    "id": "test", "object": "chat.completion", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": reply}}]
+                }).encode("utf-8")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for char in reply:
+                time.sleep(char_delay)
+                chunk = {
+                    "id": "test", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": char}, "finish_reason": None}]
+                }
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SSEHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = OpenAI(api_key="test", base_url=f"http://127.0.0.1:{server.server_port}/v1")
+    request = {"model": "test", "messages": [{"role": "user", "content": "早"}]}
+
+    start = time.perf_counter()
+    response = client.chat.completions.create(**request)
+    full_reply = response.choices[0].message.content
+    print(f"非流式: 首条消息耗时 {time.perf_counter() - start:.2f} 秒")
+
+    start = time.perf_counter()
+    first_segment_time = []
+    segments = []
+
+    def on_segment(segment):
+        if not first_segment_time:
+            first_segment_time.append(time.perf_counter() - start)
+        segments.append(segment)
+
+    segmenter = StreamSegmenter(on_segment)
+    text = consume_stream(client.chat.completions.create(stream=True, **request), segmenter)
+    total = time.perf_counter() - start
+    print(f"流式: 首条消息耗时 {first_segment_time[0]:.2f} 秒, 完整回复耗时 {total:.2f} 秒")
+
+    assert text == full_reply, "流式汇总的完整回复与非流式不一致"
+    assert segments == ["早上好呀", "今天天气不错[开心]"], segments
+    assert "先想一想" not in "".join(segments), "思考内容不应被发送"
+    print(f"回复结束前已发送片段: {segments}")
+    segmenter.flush()
+    assert segments[-1] == "要不要一起出去走走？", segments
+    print(f"回复结束后发送最后一个片段: {segments[-1]}")
+    server.shutdown()
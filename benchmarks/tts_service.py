@@ -0,0 +1,66 @@
+"""
+启动本地模拟 TTS 服务器（接口与 fish.audio 的 /v1/tts 相同，每次合成耗时 0.5 秒），
+验证会话复用、相同文本只合成一次、并发请求合并和磁盘占用上限
+
+在项目根目录执行: python -m benchmarks.tts_service
+"""
+
+import os
+import threading
+
+from modules.tts.service import TTSService
+
+
+if __name__ == '__main__':
+    import tempfile
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    import ormsgpack
+
+    requests_received = []
+
+    class FakeTTSHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            payload = ormsgpack.unpackb(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            requests_received.append((self.client_address[1], payload["text"]))
+            time.sleep(0.5)
+            body = b"ID3" + payload["text"].encode("utf-8") * 4096
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/mpeg")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTTSHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        service = TTSService(base_url=f"http://127.0.0.1:{server.server_port}", voice_dir=tmp_dir)
+        # 模拟服务器不校验密钥，未配置时使用占位值
+        service.tts_api_key = service.tts_api_key or "test"
+        service.MAX_CACHE_BYTES = 3 * 4096 * 30
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            paths = set(executor.map(service._generate_audio_file, ["起床啦，该上班了"] * 4))
+        print(f"4 个相同文本并发合成: 耗时 {time.time() - start:.2f} 秒, 请求 TTS {len(requests_received)} 次, "
+              f"文件: {[os.path.basename(path) for path in paths]}")
+
+        start = time.time()
+        service._generate_audio_file("起床啦，该上班了")
+        print(f"再次合成相同文本: 耗时 {time.time() - start:.3f} 秒, 累计请求 TTS {len(requests_received)} 次")
+
+        for i in range(6):
+            service._generate_audio_file(f"第{i}条提醒，记得喝水")
+        files = [name for name in os.listdir(tmp_dir) if name.endswith(".mp3")]
+        connections = {port for port, _ in requests_received}
+        print(f"合成 6 条新文本后保留 {len(files)} 个文件 (上限 {service.MAX_CACHE_BYTES} 字节), "
+              f"累计请求 TTS {len(requests_received)} 次, 使用 {len(connections)} 个连接")
+    server.shutdown()
@@ -0,0 +1,158 @@
+"""
+启动本地模拟嵌入服务（OpenAI 兼容接口，按文本中的相邻两字和单词生成确定的向量，相同文本的向量总是相同），
+经 EmbeddingModelAI 写入对话并检索埋入的往事；再直接写入 100000 轮对话（1024 维），
+对比签名筛选 + 精确重排与整个矩阵精确计算的检索耗时和召回率
+
+在项目根目录执行: python -m benchmarks.vector_memory
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from modules.memory.vector_memory import VECTORS_FILENAME, VectorMemoryStore, _VectorIndex, _normalize, conversation_text
+
+
+if __name__ == '__main__':
+    import random
+    import re
+    import shutil
+    import tempfile
+    import time
+    import zlib
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from src.services.ai.embedding import EmbeddingModelAI
+
+    dimension = 1024
+    token_vectors: Dict[str, np.ndarray] = {}
+
+    def fake_embedding(text: str) -> np.ndarray:
+        tokens = re.findall(r"[a-z0-9]+", text.lower())
+        for run in re.findall(r"[一-鿿]+", text):
+            tokens.extend(run[i:i + 2] for i in range(max(1, len(run) - 1)))
+        vector = np.zeros(dimension, dtype=np.float32)
+        for token in tokens:
+            if token not in token_vectors:
+                rng = np.random.default_rng(zlib.crc32(token.encode("utf-8")))
+                token_vectors[token] = rng.standard_normal(dimension).astype(np.float32)
+            vector += token_vectors[token]
+        return vector
+
+    requests_served = []
+
+    class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            texts = payload["input"] if isinstance(payload["input"], list) else [payload["input"]]
+            requests_served.append(len(texts))
+            body = json.dumps({
+                "object": "list",
+                "model": payload["model"],
+                "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(text).tolist()}
+                         for i, text in enumerate(texts)],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0}
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeEmbeddingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    embedding = EmbeddingModelAI(model_name="fake-embedding", dimension=dimension, api_key="test",
+                                 base_url=f"http://127.0.0.1:{server.server_port}/v1")
+    assert embedding.available
+
+    random.seed(0)
+    chars = "的一是在不了有和人这中大为上个我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严龙飞"
+    words = ["".join(random.sample(chars, random.choice((2, 3)))) for _ in range(2000)]
+
+    def conversation(index: int) -> Dict:
+        return {"timestamp": f"2025-01-01 00:00:{index % 60:02d}",
+                "user": "，".join(random.choices(words, k=random.randint(4, 10))),
+                "bot": "，".join(random.choices(words, k=random.randint(4, 12)))}
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        # 经模拟嵌入服务写入，检索埋入的往事
+        store = VectorMemoryStore(embedding.get_embeddings_batch, dimension, "fake-embedding")
+        small_dir = os.path.join(tmp_dir, "small")
+        os.makedirs(small_dir)
+        planted = {150: {"timestamp": "2025-01-01 12:00:00", "user": "我家的猫叫年糕，是一只橘猫", "bot": "年糕这个名字好可爱"},
+                   420: {"timestamp": "2025-01-02 12:00:00", "user": "下个月我要去杭州出差", "bot": "记得带伞，杭州经常下雨"}}
+        start = time.perf_counter()
+        for i in range(500):
+            store.add(small_dir, planted.get(i) or conversation(i))
+        store.flush()
+        print(f"经嵌入服务写入 500 轮对话: {time.perf_counter() - start:.2f} 秒, {len(requests_served) - 1} 次嵌入请求")
+        for query in ("你还记得我家猫叫什么吗", "我去杭州出差要注意什么"):
+            top = store.recall(small_dir, query, top_k=1, exclude_recent=10)[0]
+            print(f"检索 [{query}]: {top['user']} (相似度 {top['score']:.2f})")
+
+        # 十万轮对话
+        large_dir = os.path.join(tmp_dir, "large")
+        os.makedirs(large_dir)
+        total = 100000
+        conversations = [conversation(i) for i in range(total)]
+        start = time.perf_counter()
+        index = _VectorIndex(large_dir, dimension, "fake-embedding")
+        for offset in range(0, total, 5000):
+            chunk = conversations[offset:offset + 5000]
+            index.append(chunk, _normalize(np.stack([fake_embedding(conversation_text(c)) for c in chunk])))
+        print(f"生成 {total} 轮对话的向量: {time.perf_counter() - start:.1f} 秒, "
+              f"向量文件 {os.path.getsize(os.path.join(large_dir, VECTORS_FILENAME)) / 1024 / 1024:.0f} MB")
+        del index
+
+        store = VectorMemoryStore(embedding.get_embeddings_batch, dimension, "fake-embedding")
+        start = time.perf_counter()
+        store.count(large_dir)
+        index = store._indexes[large_dir]
+        print(f"打开十万轮记忆（计算签名）: {(time.perf_counter() - start) * 1000:.0f} ms, "
+              f"签名占用 {index._signatures.nbytes / 1024 / 1024:.1f} MB")
+
+        # 查询：取一轮对话的部分词语再加入无关词语，模拟换一种说法提起往事
+        queries = []
+        for _ in range(200):
+            target = random.randrange(total)
+            parts = conversations[target]["user"].split("，")
+            queries.append(_normalize(fake_embedding("，".join(random.sample(parts, max(2, len(parts) // 2))
+                                                              + random.choices(words, k=2)))))
+
+        def exact_search(query: np.ndarray, top_k: int) -> List[int]:
+            scores = index.vectors @ query
+            rows = np.argpartition(-scores, top_k)[:top_k]
+            return [int(row) for row in rows[np.argsort(-scores[rows])]]
+
+        for name, search in (("整个矩阵精确计算", lambda q: exact_search(q, 3)),
+                             ("签名筛选 + 精确重排", lambda q: [row for row, _ in index.search(q, 3, 0, store.candidates)])):
+            search(queries[0])
+            elapsed = []
+            results = []
+            for query in queries:
+                start = time.perf_counter()
+                results.append(search(query))
+                elapsed.append(time.perf_counter() - start)
+            elapsed.sort()
+            if name == "整个矩阵精确计算":
+                exact_results = results
+            recall = sum(len(set(r) & set(e)) for r, e in zip(results, exact_results)) / (3 * len(queries))
+            print(f"{name}: P50 {elapsed[len(elapsed) // 2] * 1000:.2f} ms, P99 {elapsed[int(len(elapsed) * 0.99)] * 1000:.2f} ms, "
+                  f"top-3 召回率 {recall:.1%}")
+
+        start = time.perf_counter()
+        for query in queries:
+            store.search(large_dir, query, top_k=3, exclude_recent=10)
+        print(f"search（含读取对话内容）: 平均 {(time.perf_counter() - start) / len(queries) * 1000:.2f} ms")
+    finally:
+        store.stop()
+        server.shutdown()
+        del index, store
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,45 @@
+"""
+模拟同一篇文章链接被分享到多个群：8 个线程同时请求同一链接的不同写法，
+再模拟重启后重新请求，统计实际调用接口的次数
+
+在项目根目录执行: python -m benchmarks.web_content_cache
+"""
+
+import os
+import time
+
+from src.services.ai.web_content_cache import WebContentCache, normalize_url
+
+
+if __name__ == '__main__':
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    calls = []
+
+    def slow_extract():
+        calls.append(time.time())
+        time.sleep(1)
+        return "# 网页内容摘要\n\n示例文章内容"
+
+    variants = [
+        "https://Example.com/article/1?utm_source=wechat",
+        "example.com/article/1",
+        "https://example.com:443/article/1/#comments",
+        "https://example.com/article/1?spm=a.b.c",
+    ] * 2
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_path = os.path.join(tmp_dir, "web_content.json")
+        cache = WebContentCache(cache_path)
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=len(variants)) as executor:
+            results = list(executor.map(
+                lambda url: cache.get_or_fetch(f"weblens:{normalize_url(url)}", slow_extract), variants
+            ))
+        print(f"{len(variants)} 个并发请求耗时 {time.time() - start:.2f} 秒, 实际调用接口 {len(calls)} 次, "
+              f"结果一致: {len(set(results)) == 1}, 统计: {cache.stats()}")
+
+        restarted = WebContentCache(cache_path)
+        restarted.get_or_fetch(f"weblens:{normalize_url(variants[0])}", slow_extract)
+        print(f"重启后再次请求, 累计调用接口 {len(calls)} 次, 统计: {restarted.stats()}")
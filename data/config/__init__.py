@@ -33,6 +33,11 @@ class LLMSettings:
     max_tokens: int
     temperature: float
     auto_model_switch: bool = False
+    stream_response: bool = False
+    stable_prompt_prefix: bool = False
+    http_pool_maxsize: int = 10  # 每个主机最多保持的空闲连接数
+    http_connect_timeout: float = 10  # 连接超时（秒）
+    http_read_timeout: float = 300  # 读取超时（秒）
 
 @dataclass
 class ImageRecognitionSettings:
@@ -40,6 +45,10 @@ class ImageRecognitionSettings:
     base_url: str
     temperature: float
     model: str
+    max_image_edge: int = 1568
+    image_quality: int = 85
+    image_format: str = "JPEG"
+    crop_emoji_screenshot: bool = False  # 识别动画表情前把聊天窗口截图裁剪到表情包区域（按常见窗口布局估计，表情包识别结果只在开启时缓存）
 
 @dataclass
 class ImageGenerationSettings:
@@ -73,6 +82,13 @@ class QuietTimeSettings:
 class ContextSettings:
     max_groups: int
     avatar_dir: str  # 人设目录路径，prompt文件和表情包目录都将基于此路径
+    max_prompt_tokens: int = 0  # 单次请求提示词的 token 上限（含系统提示词），0 表示只按轮数限制
+    long_term_memory: bool = False  # 是否启用长期记忆（对话向量检索，需要嵌入模型服务）
+    long_term_memory_top_k: int = 3  # 每次回复检索的相关往事轮数
+    embedding_api_key: str = ""  # 嵌入模型服务的 API Key，未设置时不启用长期记忆
+    embedding_base_url: str = "https://dashscope.aliyuncs.com/compatible-mode/v1"  # 嵌入模型服务地址（OpenAI 兼容接口）
+    embedding_model: str = "text-embedding-v3"  # 嵌入模型名称
+    embedding_dimension: int = 1024  # 请求的向量维度，0 表示使用模型的默认维度（不传 dimensions 参数）
 
 @dataclass
 class MessageQueueSettings:
@@ -401,7 +417,12 @@ class Config:
                     model=llm_data['model'].get('value', ''),
                     max_tokens=int(llm_data['max_tokens'].get('value', 0)),
                     temperature=float(llm_data['temperature'].get('value', 0)),
-                    auto_model_switch=bool(llm_data['auto_model_switch'].get('value', False))
+                    auto_model_switch=bool(llm_data['auto_model_switch'].get('value', False)),
+                    stream_response=bool(llm_data.get('stream_response', {}).get('value', False)),
+                    stable_prompt_prefix=bool(llm_data.get('stable_prompt_prefix', {}).get('value', False)),
+                    http_pool_maxsize=int(llm_data.get('http_pool_maxsize', {}).get('value', 10)),
+                    http_connect_timeout=float(llm_data.get('http_connect_timeout', {}).get('value', 10)),
+                    http_read_timeout=float(llm_data.get('http_read_timeout', {}).get('value', 300))
                 )
 
                 # 媒体设置
@@ -415,7 +436,11 @@ class Config:
                         api_key=image_recognition_data['api_key'].get('value', ''),
                         base_url=image_recognition_data['base_url'].get('value', ''),
                         temperature=float(image_recognition_data['temperature'].get('value', 0)),
-                        model=image_recognition_data['model'].get('value', '')
+                        model=image_recognition_data['model'].get('value', ''),
+                        max_image_edge=int(image_recognition_data.get('max_image_edge', {}).get('value', 1568)),
+                        image_quality=int(image_recognition_data.get('image_quality', {}).get('value', 85)),
+                        image_format=str(image_recognition_data.get('image_format', {}).get('value', 'JPEG')),
+                        crop_emoji_screenshot=bool(image_recognition_data.get('crop_emoji_screenshot', {}).get('value', False))
                     ),
                     image_generation=ImageGenerationSettings(
                         model=image_generation_data['model'].get('value', ''),
@@ -475,7 +500,15 @@ class Config:
                     ),
                     context=ContextSettings(
                         max_groups=int(context_data['max_groups'].get('value', 0)),
-                        avatar_dir=avatar_dir
+                        avatar_dir=avatar_dir,
+                        max_prompt_tokens=int(context_data.get('max_prompt_tokens', {}).get('value', 0)),
+                        long_term_memory=bool(context_data.get('long_term_memory', {}).get('value', False)),
+                        long_term_memory_top_k=int(context_data.get('long_term_memory_top_k', {}).get('value', 3)),
+                        embedding_api_key=context_data.get('embedding_api_key', {}).get('value', ''),
+                        embedding_base_url=context_data.get('embedding_base_url', {}).get(
+                            'value', 'https://dashscope.aliyuncs.com/compatible-mode/v1'),
+                        embedding_model=context_data.get('embedding_model', {}).get('value', 'text-embedding-v3'),
+                        embedding_dimension=int(context_data.get('embedding_dimension', {}).get('value', 1024))
                     ),
                     schedule_settings=ScheduleSettings(
                         tasks=schedule_tasks
@@ -19,6 +19,7 @@ from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 import random
 from src.services.ai.llm_service import LLMService
+from modules.memory.short_memory_store import short_memory_store
 from data.config import config
 import re
 
@@ -42,6 +43,7 @@ class ContentGenerator:
         self.max_token = max_token
         self.temperature = temperature
         self.llm_client = None
+        self.short_memory_store = short_memory_store
 
         # 支持的内容类型及其配置
         self.content_types = {
@@ -144,16 +146,9 @@ class ContentGenerator:
         Returns:
             tuple: (角色设定, 最近对话, 提示词模板, 系统提示词) 如果发生错误则返回 (错误信息, None, None, None)
         """
-        # 读取短期记忆
-        short_memory_path = self._get_short_memory_path(avatar_name, user_id)
-        if not os.path.exists(short_memory_path):
-            error_msg = f"短期记忆文件不存在: {short_memory_path}"
-            logger.error(error_msg)
-            return (f"无法找到最近的对话记录，无法生成{prompt_type}。", None, None, None)
-
+        # 读取短期记忆（快照 + 追加日志，只有日志的用户也能读到）
         try:
-            with open(short_memory_path, "r", encoding="utf-8") as f:
-                short_memory = json.load(f)
+            short_memory = self.short_memory_store.load(self._get_avatar_memory_dir(avatar_name, user_id))
         except json.JSONDecodeError as e:
             error_msg = f"短期记忆文件格式错误: {str(e)}"
             logger.error(error_msg)
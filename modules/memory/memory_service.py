@@ -1,26 +1,115 @@
 import json
 import logging
 import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple, Any, TYPE_CHECKING
 
 from data.config import MAX_GROUPS
 from src.services.ai.llm_service import LLMService
+from modules.memory.short_memory_store import short_memory_store, LOG_FILENAME
+from modules.memory.relationship_index import relationship_index
+
+if TYPE_CHECKING:
+    # 长期记忆依赖 numpy，只在启用时由调用方创建，这里仅用于类型标注
+    from modules.memory.vector_memory import VectorMemoryStore
 
 # 获取日志记录器
 logger = logging.getLogger('memory')
 
+# 长期记忆的相似度下限，低于该值的往事不放入提示词
+RECALL_MIN_SCORE = 0.5
+
+
+def _file_signature(*paths: str) -> Tuple:
+    """获取文件的修改时间签名，用于判断缓存是否仍然有效（只调用 stat，不读取文件）"""
+    signature = []
+    for path in paths:
+        try:
+            signature.append(os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+class MemoryCache:
+    """
+    记忆状态缓存
+    按 (角色, 用户) 缓存短期记忆和核心记忆，容量有限，按最近使用顺序淘汰
+    每项记录文件签名，文件被外部修改（如 WebUI 编辑）后自动失效
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Tuple[Tuple, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str], field: str, signature: Tuple) -> Optional[Any]:
+        """读取缓存，签名不一致视为未命中"""
+        with self._lock:
+            entry = self._entries.get(key)
+            cached = entry.get(field) if entry else None
+            if cached is not None and cached[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+            return None
+
+    def put(self, key: Tuple[str, str], field: str, signature: Tuple, value: Any):
+        """写入缓存"""
+        with self._lock:
+            entry = self._entries.setdefault(key, {})
+            entry[field] = (signature, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def peek(self, key: Tuple[str, str], field: str) -> Optional[Any]:
+        """读取缓存值但不校验签名、不计入命中统计（用于写穿更新）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            cached = entry.get(field) if entry else None
+            return cached[1] if cached is not None else None
+
+    def invalidate(self, key: Tuple[str, str], field: str = None):
+        """使缓存失效，未指定 field 时清除该用户的全部缓存"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            if field is None:
+                del self._entries[key]
+            else:
+                entry.pop(field, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries
+            }
+
 
 class MemoryService:
     """
-    新版记忆服务模块，包含两种记忆类型:
+    新版记忆服务模块，包含三种记忆类型:
     1. 短期记忆：用于保存最近对话，在程序重启后加载到上下文
     2. 核心记忆：精简的用户核心信息摘要(50-100字)
+    3. 长期记忆（可选）：全部对话的嵌入向量，回复时检索与当前消息相关的往事
     每个用户拥有独立的记忆存储空间
     """
 
     def __init__(self, root_dir: str, api_key: str, base_url: str, model: str, max_token: int, temperature: float,
-                 max_groups: int = 10):
+                 max_groups: int = 10, vector_memory: Optional["VectorMemoryStore"] = None):
         self.root_dir = root_dir
         self.api_key = api_key
         self.base_url = base_url
@@ -30,6 +119,12 @@ class MemoryService:
         self.max_groups = MAX_GROUPS if MAX_GROUPS else max_groups  # 保存上下文组数设置
         self.llm_client = None
         self.conversation_count = {}  # 记录每个角色与用户组合的对话计数: {avatar_name_user_id: count}
+        # 短期记忆存储：追加写入日志，定期压缩为 short_memory.json（进程内共享同一实例）
+        self.short_memory_store = short_memory_store
+        # 记忆状态缓存：写穿更新，稳定状态下回复无需读取记忆文件
+        self.memory_cache = MemoryCache()
+        # 长期记忆存储，未启用时为 None
+        self.vector_memory = vector_memory
         self.deepseek = LLMService(
             api_key=api_key,
             base_url=base_url,
@@ -134,31 +229,24 @@ class MemoryService:
             logger.info(f"保存对话到用户记忆: 角色={avatar_name}, 用户ID={user_id}")
             logger.debug(f"记忆存储路径: {short_memory_path}")
 
-            # 读取现有短期记忆
-            short_memory = []
-            if os.path.exists(short_memory_path):
-                try:
-                    with open(short_memory_path, "r", encoding="utf-8") as f:
-                        short_memory = json.load(f)
-                except json.JSONDecodeError:
-                    logger.warning(f"短期记忆文件损坏，重置为空列表: {short_memory_path}")
-
-            # 添加新对话
+            # 追加新对话到短期记忆（只追加一行，定期压缩）
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             new_conversation = {
                 "timestamp": timestamp,
                 "user": user_message,
                 "bot": bot_reply
             }
-            short_memory.append(new_conversation)
-
-            # 保留最近50轮对话
-            if len(short_memory) > self.max_groups:
-                short_memory = short_memory[-self.max_groups:]
-
-            # 保存更新后的短期记忆
-            with open(short_memory_path, "w", encoding="utf-8") as f:
-                json.dump(short_memory, f, ensure_ascii=False, indent=2)
+            cache_key = (avatar_name, user_id)
+            with self.short_memory_store.get_lock(memory_dir):
+                self.short_memory_store.append(memory_dir, new_conversation)
+                # 写穿更新缓存中的短期记忆
+                cached = self.memory_cache.peek(cache_key, "short")
+                if cached is not None:
+                    short_memory = (cached + [new_conversation])[-self.max_groups:]
+                    self.memory_cache.put(cache_key, "short", self._short_memory_signature(memory_dir), short_memory)
+            # 加入长期记忆（后台批量获取嵌入向量）
+            if self.vector_memory:
+                self.vector_memory.add(memory_dir, new_conversation)
 
             # 更新对话计数
             self.conversation_count[conversation_key] += 1
@@ -268,8 +356,7 @@ class MemoryService:
                 "content": new_core_memory
             }
 
-            with open(core_memory_path, "w", encoding="utf-8") as f:
-                json.dump(updated_core_data, f, ensure_ascii=False, indent=2)
+            self._write_core_memory(avatar_name, user_id, updated_core_data)
 
             logger.info(f"已更新角色 {avatar_name} 用户 {user_id} 的核心记忆")
             return True
@@ -280,13 +367,51 @@ class MemoryService:
             # 如果在处理过程中发生错误，确保不会丢失现有记忆
             try:
                 if os.path.exists(core_memory_path) and existing_core_data:
-                    with open(core_memory_path, "w", encoding="utf-8") as f:
-                        json.dump(existing_core_data, f, ensure_ascii=False, indent=2)
+                    self._write_core_memory(avatar_name, user_id, existing_core_data)
             except Exception as recovery_error:
                 logger.error(f"恢复核心记忆失败: {str(recovery_error)}")
 
             return False
 
+    def _short_memory_signature(self, memory_dir: str) -> Tuple:
+        return _file_signature(os.path.join(memory_dir, "short_memory.json"), os.path.join(memory_dir, LOG_FILENAME))
+
+    @staticmethod
+    def _parse_core_memory(core_data) -> str:
+        """从核心记忆文件内容中取出记忆文本，兼容数组格式（旧格式）和单个对象格式"""
+        if isinstance(core_data, list):
+            return core_data[0].get("content", "") if core_data else ""
+        return core_data.get("content", "")
+
+    def _write_core_memory(self, avatar_name: str, user_id: str, core_data: Dict):
+        """写入核心记忆文件，并写穿更新缓存"""
+        core_memory_path = self._get_core_memory_path(avatar_name, user_id)
+        with open(core_memory_path, "w", encoding="utf-8") as f:
+            json.dump(core_data, f, ensure_ascii=False, indent=2)
+        content = self._parse_core_memory(core_data)
+        self.memory_cache.put((avatar_name, user_id), "core", _file_signature(core_memory_path), content)
+        try:
+            relationship_index.update(self._get_avatar_memory_root(avatar_name), user_id, content)
+        except Exception as e:
+            logger.error(f"更新关系索引失败: {str(e)}")
+
+    def _get_avatar_memory_root(self, avatar_name: str) -> str:
+        """获取角色的记忆根目录（包含所有用户的记忆目录）"""
+        return os.path.join(self.root_dir, "data", "avatars", avatar_name, "memory")
+
+    def get_special_relationship(self, avatar_name: str, user_name: str) -> str:
+        """
+        从关系索引中查找用户的特殊关系设定
+
+        Args:
+            avatar_name: 角色名称
+            user_name: 用户名
+
+        Returns:
+            str: 关系描述，没有特殊关系时返回空字符串
+        """
+        return relationship_index.lookup(self._get_avatar_memory_root(avatar_name), user_name)
+
     def get_core_memory(self, avatar_name: str, user_id: str) -> str:
         """
         获取角色的核心记忆
@@ -301,25 +426,84 @@ class MemoryService:
         try:
             # 获取核心记忆文件路径
             core_memory_path = self._get_core_memory_path(avatar_name, user_id)
+            signature = _file_signature(core_memory_path)
+
+            cached = self.memory_cache.get((avatar_name, user_id), "core", signature)
+            if cached is not None:
+                return cached
 
             # 如果文件不存在，返回空字符串
-            if not os.path.exists(core_memory_path):
-                return ""
-
-            # 读取核心记忆文件
-            with open(core_memory_path, "r", encoding="utf-8") as f:
-                core_data = json.load(f)
-
-                # 处理数组格式
-                if isinstance(core_data, list) and len(core_data) > 0:
-                    return core_data[0].get("content", "")
-                else:
-                    # 兼容旧格式
-                    return core_data.get("content", "")
+            if signature[0] is None:
+                content = ""
+            else:
+                # 读取核心记忆文件
+                with open(core_memory_path, "r", encoding="utf-8") as f:
+                    content = self._parse_core_memory(json.load(f))
+
+            self.memory_cache.put((avatar_name, user_id), "core", signature, content)
+            return content
         except Exception as e:
             logger.error(f"获取核心记忆失败: {str(e)}")
             return ""
 
+    def clear_core_memory(self, avatar_name: str, user_id: str):
+        """
+        清空核心记忆（保留文件结构）
+
+        Args:
+            avatar_name: 角色名称
+            user_id: 用户ID
+        """
+        if os.path.exists(self._get_core_memory_path(avatar_name, user_id)):
+            self._write_core_memory(avatar_name, user_id, {
+                "timestamp": self._get_timestamp(),
+                "content": ""  # 初始为空字符串
+            })
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        获取记忆缓存的命中统计
+
+        Returns:
+            Dict: 包含 hits、misses、hit_rate、size、max_entries
+        """
+        return self.memory_cache.stats()
+
+    def get_short_memory(self, avatar_name: str, user_id: str) -> List[Dict]:
+        """
+        获取短期记忆的原始对话列表
+
+        Args:
+            avatar_name: 角色名称
+            user_id: 用户ID
+
+        Returns:
+            List[Dict]: 对话列表，每项包含 timestamp、user、bot
+        """
+        memory_dir = self._get_avatar_memory_dir(avatar_name, user_id)
+        cache_key = (avatar_name, user_id)
+        with self.short_memory_store.get_lock(memory_dir):
+            signature = self._short_memory_signature(memory_dir)
+            short_memory = self.memory_cache.get(cache_key, "short", signature)
+            if short_memory is None:
+                short_memory = self.short_memory_store.load(memory_dir)
+                self.memory_cache.put(cache_key, "short", signature, short_memory)
+        # 返回副本，避免调用方修改缓存内容
+        return list(short_memory)
+
+    def reset_short_memory(self, avatar_name: str, user_id: str):
+        """
+        清空短期记忆
+
+        Args:
+            avatar_name: 角色名称
+            user_id: 用户ID
+        """
+        memory_dir = self._get_avatar_memory_dir(avatar_name, user_id)
+        with self.short_memory_store.get_lock(memory_dir):
+            self.short_memory_store.clear(memory_dir)
+            self.memory_cache.put((avatar_name, user_id), "short", self._short_memory_signature(memory_dir), [])
+
     def get_recent_context(self, avatar_name: str, user_id: str, context_size: int = None) -> List[Dict]:
         """
         获取最近的对话上下文，用于重启后恢复对话连续性
@@ -336,15 +520,11 @@ class MemoryService:
             max_groups = llm_client.config["max_groups"]
             logger.info(f"使用LLM配置的对话轮数: {max_groups}")
 
-            short_memory_path = self._get_short_memory_path(avatar_name, user_id)
-
-            if not os.path.exists(short_memory_path):
+            short_memory = self.get_short_memory(avatar_name, user_id)
+            if not short_memory:
                 logger.info(f"短期记忆不存在: {avatar_name} 用户: {user_id}")
                 return []
 
-            with open(short_memory_path, "r", encoding="utf-8") as f:
-                short_memory = json.load(f)
-
             # 转换为LLM接口要求的消息格式
             context = []
             for conv in short_memory[-max_groups:]:  # 使用max_groups轮对话
@@ -358,6 +538,29 @@ class MemoryService:
             logger.error(f"获取最近上下文失败: {str(e)}")
             return []
 
+    def recall_conversations(self, avatar_name: str, user_id: str, query: str, top_k: int = 3) -> List[Dict]:
+        """
+        从长期记忆中检索与当前消息最相关的往事（不包含已在短期记忆上下文中的最近对话）
+
+        Args:
+            avatar_name: 角色名称
+            user_id: 用户ID
+            query: 当前用户消息
+            top_k: 最多返回的轮数
+
+        Returns:
+            List[Dict]: 对话列表，每项包含 timestamp、user、bot、score，未启用长期记忆时为空列表
+        """
+        if not self.vector_memory:
+            return []
+        try:
+            memory_dir = self._get_avatar_memory_dir(avatar_name, user_id)
+            return self.vector_memory.recall(memory_dir, query, top_k=top_k, exclude_recent=self.max_groups,
+                                             min_score=RECALL_MIN_SCORE)
+        except Exception as e:
+            logger.error(f"检索长期记忆失败: {str(e)}")
+            return []
+
     def _get_timestamp(self) -> str:
         """获取当前时间戳"""
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -375,29 +578,15 @@ class MemoryService:
         """
         try:
             # 检查短期记忆是否存在且非空
-            short_memory_path = self._get_short_memory_path(avatar_name, user_id)
-            if os.path.exists(short_memory_path):
-                with open(short_memory_path, "r", encoding="utf-8") as f:
-                    short_memory = json.load(f)
-                    if short_memory:  # 如果列表不为空
-                        logger.debug(f"用户 {user_id} 与角色 {avatar_name} 有私聊记忆，条数: {len(short_memory)}")
-                        return True
+            short_memory = self.get_short_memory(avatar_name, user_id)
+            if short_memory:  # 如果列表不为空
+                logger.debug(f"用户 {user_id} 与角色 {avatar_name} 有私聊记忆，条数: {len(short_memory)}")
+                return True
 
             # 检查核心记忆是否存在且非空
-            core_memory_path = self._get_core_memory_path(avatar_name, user_id)
-            if os.path.exists(core_memory_path):
-                with open(core_memory_path, "r", encoding="utf-8") as f:
-                    core_memory = json.load(f)
-                    # 处理数组格式（旧格式）
-                    if isinstance(core_memory, list) and len(core_memory) > 0:
-                        if core_memory[0].get("content", "").strip():  # 如果内容不为空
-                            logger.debug(f"用户 {user_id} 与角色 {avatar_name} 有核心记忆")
-                            return True
-                    else:
-                        # 新格式（单个对象）
-                        if core_memory.get("content", "").strip():  # 如果内容不为空
-                            logger.debug(f"用户 {user_id} 与角色 {avatar_name} 有核心记忆")
-                            return True
+            if self.get_core_memory(avatar_name, user_id).strip():
+                logger.debug(f"用户 {user_id} 与角色 {avatar_name} 有核心记忆")
+                return True
 
             logger.debug(f"用户 {user_id} 与角色 {avatar_name} 没有私聊记忆")
             return False
@@ -0,0 +1,192 @@
+"""
+关系索引模块
+群聊回复时需要判断发送者与角色的特殊关系，原实现每次都遍历该角色下所有用户的核心记忆文件。
+本模块为每个角色维护一份关系索引，保存在角色记忆目录下（relationship_index.json）：
+- 只收录包含关系关键词的核心记忆，随核心记忆写入增量更新
+- 索引文件被其他进程（如 WebUI）修改后自动重新加载
+- 加载和写入索引时提取关系所在分句中可能的名字，建立 名字 -> 关系描述 的字典，查询只需一次字典查找
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger('memory')
+
+INDEX_FILENAME = "relationship_index.json"
+CORE_MEMORY_FILENAME = "core_memory.json"
+
+# 关系关键词，按优先级排列
+RELATIONSHIP_KEYWORDS = ["朋友", "敌人", "兄弟", "姐妹", "同事", "老师", "学生"]
+# 分句的分隔符（名字只在包含关系关键词的分句中提取）
+CLAUSE_SEPARATORS = re.compile(r"[\s，。；;,.!！?？、：:\"“”（）()【】\[\]]+")
+# 提取的名字最大长度（微信昵称不超过 16 个字符，群昵称略长）
+MAX_NAME_LENGTH = 20
+
+
+def _parse_content(core_data) -> str:
+    """从核心记忆文件内容中取出记忆文本，兼容数组格式（旧格式）和单个对象格式"""
+    if isinstance(core_data, list):
+        return core_data[0].get("content", "") if core_data else ""
+    return core_data.get("content", "")
+
+
+def _match_keyword(content: str) -> Optional[str]:
+    """返回内容中出现的第一个关系关键词"""
+    for keyword in RELATIONSHIP_KEYWORDS:
+        if keyword in content:
+            return keyword
+    return None
+
+
+def _extract_names(content: str) -> Dict[str, str]:
+    """
+    提取核心记忆中与关系关键词同一分句的名字
+
+    分句中的名字位置不固定（"张三是朋友"、"和张三是同事"、"老师张三"），
+    因此把分句的所有子串（不超过 MAX_NAME_LENGTH）都作为候选名字
+
+    Returns:
+        Dict[str, str]: {名字: 关系关键词}，同一名字以先出现的分句为准
+    """
+    names = {}
+    for clause in CLAUSE_SEPARATORS.split(content):
+        keyword = _match_keyword(clause)
+        if not keyword:
+            continue
+        for start in range(len(clause)):
+            for end in range(start + 1, min(len(clause), start + MAX_NAME_LENGTH) + 1):
+                names.setdefault(clause[start:end], keyword)
+    return names
+
+
+class RelationshipIndex:
+    def __init__(self):
+        # {角色记忆目录: {"mtime": 索引文件修改时间, "entries": {用户ID: {"keyword", "content"}}, "names": {名字: 关系关键词}}}
+        self._indexes: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _index_path(self, memory_root: str) -> str:
+        return os.path.join(memory_root, INDEX_FILENAME)
+
+    def _get_mtime(self, memory_root: str) -> Optional[int]:
+        try:
+            return os.stat(self._index_path(memory_root)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _build(self, memory_root: str) -> Dict[str, Dict]:
+        """遍历所有用户的核心记忆，重建索引（仅在索引文件不存在时执行）"""
+        entries = {}
+        if not os.path.isdir(memory_root):
+            return entries
+        for user_id in os.listdir(memory_root):
+            core_memory_path = os.path.join(memory_root, user_id, CORE_MEMORY_FILENAME)
+            if not os.path.exists(core_memory_path):
+                continue
+            try:
+                with open(core_memory_path, "r", encoding="utf-8") as f:
+                    content = _parse_content(json.load(f))
+            except Exception as e:
+                logger.debug(f"读取核心记忆文件失败: {str(e)}")
+                continue
+            keyword = _match_keyword(content)
+            if keyword:
+                entries[user_id] = {"keyword": keyword, "content": content}
+        logger.info(f"已重建关系索引: {memory_root}, 共 {len(entries)} 条")
+        return entries
+
+    def _save(self, memory_root: str, entries: Dict[str, Dict]) -> Optional[int]:
+        """原子地写入索引文件，返回写入后的修改时间"""
+        os.makedirs(memory_root, exist_ok=True)
+        index_path = self._index_path(memory_root)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, index_path)
+        return self._get_mtime(memory_root)
+
+    def _load_locked(self, memory_root: str) -> Dict:
+        """获取角色的索引，索引文件变化时重新加载，不存在时重建（调用方需持有锁）"""
+        mtime = self._get_mtime(memory_root)
+        index = self._indexes.get(memory_root)
+        if index is not None and index["mtime"] == mtime:
+            return index
+
+        entries = None
+        if mtime is not None:
+            try:
+                with open(self._index_path(memory_root), "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                logger.warning(f"关系索引文件损坏，重新构建: {memory_root}")
+        if not isinstance(entries, dict):
+            entries = self._build(memory_root)
+            mtime = self._save(memory_root, entries)
+
+        index = {"mtime": mtime, "entries": entries, "names": self._build_names(entries)}
+        self._indexes[memory_root] = index
+        return index
+
+    @staticmethod
+    def _build_names(entries: Dict[str, Dict]) -> Dict[str, str]:
+        """根据索引条目建立 名字 -> 关系关键词 的字典，名字出现在多条核心记忆中时以先收录的为准"""
+        names = {}
+        for entry in entries.values():
+            for name, keyword in _extract_names(entry["content"]).items():
+                names.setdefault(name, keyword)
+        return names
+
+    def update(self, memory_root: str, user_id: str, content: str):
+        """
+        核心记忆写入后更新索引
+
+        Args:
+            memory_root: 角色记忆目录（data/avatars/<角色>/memory）
+            user_id: 核心记忆所属的用户ID
+            content: 写入后的核心记忆内容
+        """
+        with self._lock:
+            index = self._load_locked(memory_root)
+            entries = index["entries"]
+            keyword = _match_keyword(content)
+            if keyword:
+                new_entry = {"keyword": keyword, "content": content}
+                if entries.get(user_id) == new_entry:
+                    return
+                entries[user_id] = new_entry
+            elif user_id in entries:
+                del entries[user_id]
+            else:
+                return
+            index["mtime"] = self._save(memory_root, entries)
+            index["names"] = self._build_names(entries)
+
+    def lookup(self, memory_root: str, user_name: str) -> str:
+        """
+        查找与指定用户名相关的特殊关系
+
+        Args:
+            memory_root: 角色记忆目录（data/avatars/<角色>/memory）
+            user_name: 用户名
+
+        Returns:
+            str: 关系描述，如 "张三是朋友"；没有特殊关系时返回空字符串
+        """
+        with self._lock:
+            keyword = self._load_locked(memory_root)["names"].get(user_name)
+        return f"{user_name}是{keyword}" if keyword else ""
+
+    def invalidate(self, memory_root: str = None):
+        """丢弃内存中的索引，下次查询时从索引文件重新加载"""
+        with self._lock:
+            if memory_root is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(memory_root, None)
+
+
+relationship_index = RelationshipIndex()
@@ -0,0 +1,235 @@
+"""
+短期记忆存储模块
+每个用户的短期记忆由两个文件组成：
+- short_memory.json: 压缩后的快照（与旧版格式相同，旧文件无需转换即可直接使用）
+- short_memory.log: 追加日志，每行一轮对话（JSON）
+
+写入只向日志追加一行，日志行数达到阈值后合并进快照并清空日志。
+同一用户的读写通过目录锁串行执行：进程内使用可重入锁，跨进程（机器人和 WebUI）使用 short_memory.lock 文件锁，
+避免压缩或 WebUI 替换记忆时其他进程读到“新快照 + 旧日志”（重复的对话）或追加的行丢失。
+进程内统一使用模块级的 short_memory_store 实例。
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from data.config import MAX_GROUPS
+
+logger = logging.getLogger('memory')
+
+SNAPSHOT_FILENAME = "short_memory.json"
+LOG_FILENAME = "short_memory.log"
+LOCK_FILENAME = "short_memory.lock"
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock_file(f):
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK 重试约 10 秒仍未取得锁时抛出异常，继续等待
+                continue
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class DirectoryLock:
+    """
+    单个记忆目录的锁：进程内可重入锁 + 跨进程文件锁
+
+    同一线程可以嵌套进入，只在最外层进入时加文件锁、退出时释放
+    """
+
+    def __init__(self, memory_dir: str):
+        self.memory_dir = memory_dir
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                os.makedirs(self.memory_dir, exist_ok=True)
+                self._file = open(os.path.join(self.memory_dir, LOCK_FILENAME), "a+b")
+                _lock_file(self._file)
+            except Exception:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                _unlock_file(self._file)
+            finally:
+                self._file.close()
+                self._file = None
+        self._lock.release()
+        return False
+
+
+class ShortMemoryStore:
+    def __init__(self, max_rounds: Optional[int] = None, compact_threshold: Optional[int] = None):
+        """
+        初始化短期记忆存储
+
+        Args:
+            max_rounds: 保留的最大对话轮数，None 表示不截断
+            compact_threshold: 日志行数达到该值时触发压缩，默认等于 max_rounds
+        """
+        self.max_rounds = max_rounds
+        self.compact_threshold = compact_threshold or max_rounds or 50
+        self._locks: Dict[str, DirectoryLock] = {}
+        self._locks_guard = threading.Lock()
+        # 记录每个目录的日志行数和文件大小，避免每次追加都重新统计（大小变化说明其他进程改过日志）
+        self._log_state: Dict[str, Tuple[int, int]] = {}
+
+    def get_lock(self, memory_dir: str) -> DirectoryLock:
+        """获取指定记忆目录的读写锁（可重入，调用方可在持有锁时继续读写）"""
+        with self._locks_guard:
+            lock = self._locks.get(memory_dir)
+            if lock is None:
+                lock = self._locks[memory_dir] = DirectoryLock(memory_dir)
+            return lock
+
+    @staticmethod
+    def _log_size(memory_dir: str) -> int:
+        try:
+            return os.path.getsize(os.path.join(memory_dir, LOG_FILENAME))
+        except FileNotFoundError:
+            return 0
+
+    def _read_snapshot(self, memory_dir: str) -> List[Dict]:
+        snapshot_path = os.path.join(memory_dir, SNAPSHOT_FILENAME)
+        if not os.path.exists(snapshot_path):
+            return []
+        try:
+            with open(snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, list) else []
+        except json.JSONDecodeError:
+            logger.warning(f"短期记忆文件损坏，按空列表处理: {snapshot_path}")
+            return []
+
+    def _read_log(self, memory_dir: str) -> List[Dict]:
+        log_path = os.path.join(memory_dir, LOG_FILENAME)
+        if not os.path.exists(log_path):
+            return []
+        conversations = []
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    conversations.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 进程中断可能留下写了一半的行，跳过即可
+                    logger.warning(f"跳过损坏的短期记忆日志行: {log_path}")
+        return conversations
+
+    def _truncate(self, conversations: List[Dict]) -> List[Dict]:
+        if self.max_rounds and len(conversations) > self.max_rounds:
+            return conversations[-self.max_rounds:]
+        return conversations
+
+    def _write_snapshot(self, memory_dir: str, conversations: List[Dict]):
+        """原子地写入快照并清空日志"""
+        snapshot_path = os.path.join(memory_dir, SNAPSHOT_FILENAME)
+        tmp_path = f"{snapshot_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(conversations, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, snapshot_path)
+
+        log_path = os.path.join(memory_dir, LOG_FILENAME)
+        if os.path.exists(log_path):
+            os.remove(log_path)
+        self._log_state[memory_dir] = (0, 0)
+
+    def load(self, memory_dir: str) -> List[Dict]:
+        """
+        读取短期记忆（快照 + 日志）
+
+        Args:
+            memory_dir: 用户记忆目录
+
+        Returns:
+            List[Dict]: 按时间顺序排列的对话列表
+        """
+        with self.get_lock(memory_dir):
+            return self._truncate(self._read_snapshot(memory_dir) + self._read_log(memory_dir))
+
+    def append(self, memory_dir: str, conversation: Dict):
+        """
+        追加一轮对话，日志达到阈值时压缩
+
+        Args:
+            memory_dir: 用户记忆目录
+            conversation: 对话内容 {"timestamp", "user", "bot"}
+        """
+        with self.get_lock(memory_dir):
+            log_path = os.path.join(memory_dir, LOG_FILENAME)
+            lines, size = self._log_state.get(memory_dir, (None, None))
+            if size != self._log_size(memory_dir):
+                lines = len(self._read_log(memory_dir))
+
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(conversation, ensure_ascii=False) + "\n")
+            lines += 1
+            self._log_state[memory_dir] = (lines, self._log_size(memory_dir))
+
+            if lines >= self.compact_threshold:
+                self._compact_locked(memory_dir)
+
+    def _compact_locked(self, memory_dir: str):
+        """将日志合并进快照（调用方需持有该目录的锁）"""
+        conversations = self._truncate(self._read_snapshot(memory_dir) + self._read_log(memory_dir))
+        self._write_snapshot(memory_dir, conversations)
+        logger.debug(f"短期记忆已压缩: {memory_dir}, 当前 {len(conversations)} 轮对话")
+
+    def compact(self, memory_dir: str):
+        """将日志合并进快照"""
+        with self.get_lock(memory_dir):
+            self._compact_locked(memory_dir)
+
+    def replace(self, memory_dir: str, conversations: List[Dict]):
+        """
+        用给定的对话列表整体替换短期记忆
+
+        Args:
+            memory_dir: 用户记忆目录
+            conversations: 新的对话列表
+        """
+        with self.get_lock(memory_dir):
+            self._write_snapshot(memory_dir, conversations)
+
+    def clear(self, memory_dir: str):
+        """清空短期记忆"""
+        self.replace(memory_dir, [])
+
+
+# 进程内共享的短期记忆存储（记忆服务、内容生成和 WebUI 使用同一个实例，共用目录锁）
+short_memory_store = ShortMemoryStore(max_rounds=MAX_GROUPS or 10)
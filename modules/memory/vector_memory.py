@@ -0,0 +1,371 @@
+"""
+长期记忆存储模块
+每轮对话的嵌入向量保存在用户记忆目录下，回复时按余弦相似度取出与当前消息最相关的往事：
+- long_term_memory.f32: 归一化后的嵌入向量（float32 矩阵，按行追加），检索时以内存映射方式读取
+- long_term_memory.jsonl: 与向量逐行对应的对话内容，每行一轮对话（JSON）
+- long_term_memory.json: 向量维度和嵌入模型，更换模型后旧记忆备份后重新开始，不与新向量混用
+
+写入时对话只加入队列，后台线程把队列中已有的对话合并为一次嵌入请求。
+检索时先用内存中的符号位签名（每维 1 bit）按汉明距离筛选候选，再读取候选的 float32 向量精确计算相似度，
+十万条记忆每次只需扫描几 MB 签名，不必读取整个向量矩阵。
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger('memory')
+
+VECTORS_FILENAME = "long_term_memory.f32"
+TEXTS_FILENAME = "long_term_memory.jsonl"
+META_FILENAME = "long_term_memory.json"
+
+# 单条对话送去嵌入的最大字符数，超出部分截断
+MAX_EMBED_CHARS = 2000
+
+# 回复前检索时获取查询向量的超时时间（秒），超时则本次不检索，不阻塞回复
+RECALL_TIMEOUT = 1.0
+
+# 停止写入线程的标记
+_STOP = object()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """按行归一化，之后余弦相似度即为点积"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def _signatures(vectors: np.ndarray, words: int) -> np.ndarray:
+    """计算向量的符号位签名，返回 (words, 行数) 的 uint64 数组（按列存放，扫描时每次只读一整列）"""
+    packed = np.packbits(vectors > 0, axis=1)
+    padded = np.zeros((len(vectors), words * 8), dtype=np.uint8)
+    padded[:, :packed.shape[1]] = packed
+    return np.ascontiguousarray(padded.view(np.uint64).T)
+
+
+def conversation_text(conversation: Dict) -> str:
+    """一轮对话用于嵌入的文本"""
+    return f"{conversation.get('user', '')}\n{conversation.get('bot', '')}"[:MAX_EMBED_CHARS]
+
+
+class _VectorIndex:
+    """单个用户的长期记忆（调用方需持有该目录的锁）"""
+
+    def __init__(self, memory_dir: str, dimension: int, model_name: str):
+        self.memory_dir = memory_dir
+        self.dimension = dimension
+        self.words = (dimension + 63) // 64
+        self.vectors_path = os.path.join(memory_dir, VECTORS_FILENAME)
+        self.texts_path = os.path.join(memory_dir, TEXTS_FILENAME)
+        self._check_meta(model_name)
+
+        # 每行对话在文本文件中的起始位置，最后一项为文件末尾
+        self.offsets = [0]
+        if os.path.exists(self.texts_path):
+            with open(self.texts_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    self.offsets.append(self.offsets[-1] + len(line))
+        row_bytes = dimension * 4
+        vector_rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        self.rows = min(vector_rows, len(self.offsets) - 1)
+        # 进程中断可能留下没有对应文本的向量或写了一半的行，截断到两者一致
+        del self.offsets[self.rows + 1:]
+        self._truncate(self.vectors_path, self.rows * row_bytes)
+        self._truncate(self.texts_path, self.offsets[-1])
+
+        self.vectors = None
+        self._signatures = np.zeros((self.words, max(self.rows, 1024)), dtype=np.uint64)
+        self._map()
+        # 分块计算已有向量的签名，避免一次读入整个矩阵
+        for start in range(0, self.rows, 8192):
+            chunk = np.asarray(self.vectors[start:start + 8192])
+            self._signatures[:, start:start + len(chunk)] = _signatures(chunk, self.words)
+
+    def _check_meta(self, model_name: str):
+        meta_path = os.path.join(self.memory_dir, META_FILENAME)
+        meta = {"dimension": self.dimension, "model": model_name}
+        if os.path.exists(meta_path):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    existing = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                existing = {}
+            if existing == meta:
+                return
+            logger.warning(f"长期记忆的嵌入模型已变更（{existing} -> {meta}），旧记忆已备份: {self.memory_dir}")
+            for path in (self.vectors_path, self.texts_path):
+                if os.path.exists(path):
+                    os.replace(path, f"{path}.bak")
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    @staticmethod
+    def _truncate(path: str, size: int):
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+
+    def _map(self):
+        self.vectors = (np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.rows, self.dimension))
+                        if self.rows else np.zeros((0, self.dimension), dtype=np.float32))
+
+    def append(self, conversations: List[Dict], vectors: np.ndarray):
+        """追加对话及其（已归一化的）向量，先写向量再写文本，中断时以两者较少的行数为准"""
+        with open(self.vectors_path, "ab") as f:
+            f.write(vectors.tobytes())
+        lines = [(json.dumps(conversation, ensure_ascii=False) + "\n").encode("utf-8")
+                 for conversation in conversations]
+        with open(self.texts_path, "ab") as f:
+            f.write(b"".join(lines))
+        for line in lines:
+            self.offsets.append(self.offsets[-1] + len(line))
+
+        needed = self.rows + len(vectors)
+        if needed > self._signatures.shape[1]:
+            grown = np.zeros((self.words, max(needed, self._signatures.shape[1] * 2)), dtype=np.uint64)
+            grown[:, :self.rows] = self._signatures[:, :self.rows]
+            self._signatures = grown
+        self._signatures[:, self.rows:needed] = _signatures(vectors, self.words)
+        self.rows = needed
+        self._map()
+
+    def search(self, query: np.ndarray, top_k: int, exclude_recent: int = 0,
+               candidates: int = 200) -> List[tuple]:
+        """
+        检索最相似的记忆
+
+        :param query: 归一化后的查询向量
+        :param top_k: 返回的条数
+        :param exclude_recent: 跳过最近的若干条（已在对话上下文中）
+        :param candidates: 按签名筛选的候选数，记忆数不超过其 8 倍时直接精确计算
+        :return: [(行号, 相似度)]，按相似度从高到低排列
+        """
+        total = self.rows - exclude_recent
+        if total <= 0 or top_k <= 0:
+            return []
+        if total <= candidates * 8:
+            rows = np.arange(total)
+        else:
+            query_signature = _signatures(query[None, :], self.words)[:, 0]
+            distance = np.bitwise_count(self._signatures[0, :total] ^ query_signature[0]).astype(np.uint16)
+            for word in range(1, self.words):
+                distance += np.bitwise_count(self._signatures[word, :total] ^ query_signature[word])
+            # 汉明距离是 0 ~ 位数的整数，按直方图找到第 candidates 个候选的距离，比 argpartition 更快
+            limit = int(np.searchsorted(np.cumsum(np.bincount(distance)), candidates))
+            rows = np.flatnonzero(distance <= limit)
+        scores = self.vectors[rows] @ query
+        order = np.argsort(-scores)[:top_k]
+        return [(int(rows[i]), float(scores[i])) for i in order]
+
+    def read(self, rows: List[int]) -> List[Dict]:
+        """读取指定行的对话内容"""
+        results = []
+        with open(self.texts_path, "rb") as f:
+            for row in rows:
+                f.seek(self.offsets[row])
+                results.append(json.loads(f.read(self.offsets[row + 1] - self.offsets[row])))
+        return results
+
+
+class VectorMemoryStore:
+    def __init__(self, embed_texts: Callable[..., Optional[List[List[float]]]], dimension: int,
+                 model_name: str = "", batch_size: int = 10, candidates: int = 200, max_open: int = 32,
+                 recall_timeout: float = RECALL_TIMEOUT):
+        """
+        初始化长期记忆存储
+
+        Args:
+            embed_texts: 批量获取嵌入向量的函数 embed_texts(texts, timeout=None)，返回与 texts 顺序一致的向量列表，
+                         失败或超时时返回 None
+            dimension: 向量维度
+            model_name: 嵌入模型名称，记录在记忆目录中，用于发现模型变更
+            batch_size: 单次嵌入请求最多包含的对话数
+            candidates: 检索时按签名筛选的候选数
+            max_open: 最多同时打开的用户记忆数，超出时关闭最久未使用的
+            recall_timeout: 检索时获取查询向量的超时时间（秒）
+        """
+        self.embed_texts = embed_texts
+        self.recall_timeout = recall_timeout
+        self.dimension = dimension
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.candidates = candidates
+        self.max_open = max_open
+        self._indexes: "OrderedDict[str, _VectorIndex]" = OrderedDict()
+        self._locks: Dict[str, threading.RLock] = {}
+        self._guard = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._idle = threading.Condition()
+        self._unfinished = 0
+        self.embedded = 0
+        self.failed = 0
+
+    def get_lock(self, memory_dir: str) -> threading.RLock:
+        """获取指定记忆目录的锁"""
+        with self._guard:
+            lock = self._locks.get(memory_dir)
+            if lock is None:
+                lock = self._locks[memory_dir] = threading.RLock()
+            return lock
+
+    def _get_index(self, memory_dir: str) -> _VectorIndex:
+        """获取已打开的用户记忆，未打开时加载（调用方需持有该目录的锁）"""
+        with self._guard:
+            index = self._indexes.get(memory_dir)
+            if index is not None:
+                self._indexes.move_to_end(memory_dir)
+                return index
+        index = _VectorIndex(memory_dir, self.dimension, self.model_name)
+        with self._guard:
+            self._indexes[memory_dir] = index
+            while len(self._indexes) > self.max_open:
+                self._indexes.popitem(last=False)
+        return index
+
+    def add(self, memory_dir: str, conversation: Dict):
+        """
+        添加一轮对话（加入嵌入队列后立即返回）
+
+        Args:
+            memory_dir: 用户记忆目录
+            conversation: 对话内容 {"timestamp", "user", "bot"}
+        """
+        if self._thread is None:
+            with self._guard:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="long-term-memory", daemon=True)
+                    self._thread.start()
+        with self._idle:
+            self._unfinished += 1
+        self._queue.put((memory_dir, conversation))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = False
+            # 合并队列中已有的对话，不额外等待
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._embed_batch(batch)
+            if stop:
+                return
+
+    def _embed_batch(self, batch: List):
+        try:
+            vectors = self.embed_texts([conversation_text(conversation) for _, conversation in batch])
+            if not vectors or len(vectors) != len(batch):
+                raise ValueError("嵌入服务没有返回结果")
+            vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+            if vectors.shape[1] != self.dimension:
+                raise ValueError(f"向量维度 {vectors.shape[1]} 与设置的 {self.dimension} 不一致")
+
+            groups: Dict[str, List[int]] = {}
+            for position, (memory_dir, _) in enumerate(batch):
+                groups.setdefault(memory_dir, []).append(position)
+            for memory_dir, positions in groups.items():
+                with self.get_lock(memory_dir):
+                    self._get_index(memory_dir).append([batch[i][1] for i in positions], vectors[positions])
+            self.embedded += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"写入长期记忆失败（{len(batch)} 轮对话）: {str(e)}")
+        finally:
+            with self._idle:
+                self._unfinished -= len(batch)
+                self._idle.notify_all()
+
+    def search(self, memory_dir: str, query_vector, top_k: int = 3, exclude_recent: int = 0,
+               min_score: float = 0.0) -> List[Dict]:
+        """
+        按余弦相似度检索最相关的对话
+
+        Args:
+            memory_dir: 用户记忆目录
+            query_vector: 查询向量
+            top_k: 返回的条数
+            exclude_recent: 跳过最近的若干轮对话（已在对话上下文中）
+            min_score: 相似度下限
+
+        Returns:
+            List[Dict]: 对话内容 {"timestamp", "user", "bot", "score"}，按相似度从高到低排列
+        """
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        with self.get_lock(memory_dir):
+            index = self._get_index(memory_dir)
+            matches = [(row, score) for row, score in index.search(query, top_k, exclude_recent, self.candidates)
+                       if score >= min_score]
+            conversations = index.read([row for row, _ in matches])
+        for conversation, (_, score) in zip(conversations, matches):
+            conversation["score"] = score
+        return conversations
+
+    def recall(self, memory_dir: str, query: str, top_k: int = 3, exclude_recent: int = 0,
+               min_score: float = 0.0) -> List[Dict]:
+        """
+        检索与文本最相关的对话（先获取文本的嵌入向量）
+
+        Args:
+            memory_dir: 用户记忆目录
+            query: 查询文本（通常为当前用户消息）
+            top_k: 返回的条数
+            exclude_recent: 跳过最近的若干轮对话
+            min_score: 相似度下限
+
+        Returns:
+            List[Dict]: 同 search，获取嵌入向量失败、超时或没有记忆时为空列表
+        """
+        # 没有可检索的记忆时不请求嵌入服务
+        if not query or not os.path.exists(os.path.join(memory_dir, VECTORS_FILENAME)) \
+                or self.count(memory_dir) <= exclude_recent:
+            return []
+        vectors = self.embed_texts([query[:MAX_EMBED_CHARS]], timeout=self.recall_timeout)
+        if not vectors:
+            logger.warning("获取查询向量失败或超时，本次回复不检索长期记忆")
+            return []
+        return self.search(memory_dir, vectors[0], top_k, exclude_recent, min_score)
+
+    def count(self, memory_dir: str) -> int:
+        """已保存的对话轮数（不包含仍在队列中的）"""
+        with self.get_lock(memory_dir):
+            return self._get_index(memory_dir).rows
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待队列中的对话全部写入，返回是否已全部写入"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._unfinished == 0, timeout=timeout)
+
+    def stop(self, timeout: float = 30):
+        """写入队列中剩余的对话后停止后台线程"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout=timeout)
+
+    def get_metrics(self) -> Dict:
+        return {
+            "embedded": self.embedded,
+            "failed": self.failed,
+            "pending": self._unfinished,
+            "open": len(self._indexes)
+        }
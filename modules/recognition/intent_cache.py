@@ -0,0 +1,161 @@
+"""
+意图识别缓存模块
+
+为提醒意图和联网意图识别提供公共的加速手段：
+- few-shot 示例消息只在进程启动时加载一次
+- 按规范化后的消息文本缓存识别结果（短时有效）
+- 本地预过滤：问候语、纯表情、表情包识别文本等无需调用识别模型
+"""
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# 规范化时去除的字符：空白、标点及各类符号（包括 emoji）
+_STRIP_PATTERN = re.compile(r"[\s\W_]+", re.UNICODE)
+
+# 表情包、图片经图片识别服务转换后的文本前缀
+STICKER_PREFIXES = ("用户发送了一张表情包",)
+
+# 常见的问候、附和等短消息
+TRIVIAL_MESSAGES = {
+    "你好", "您好", "hi", "hello", "嗨", "哈喽", "在吗", "在不在", "在么", "在",
+    "早", "早安", "早上好", "午安", "中午好", "晚上好", "晚安", "拜拜", "再见", "88",
+    "嗯", "嗯嗯", "哦", "哦哦", "噢", "啊", "好", "好的", "好哒", "好滴", "行", "可以", "ok", "okk",
+    "哈", "哈哈", "哈哈哈", "哈哈哈哈", "嘿嘿", "嘻嘻", "呵呵", "hhh", "hhhh",
+    "谢谢", "谢啦", "谢谢你", "多谢", "收到", "知道了", "晓得了", "对", "对的", "是的", "没事",
+}
+
+# 与时间、提醒相关的关键词，消息中既没有这些词也没有数字时不可能包含提醒意图（宁可多放行，不可漏掉提醒）
+TIME_KEYWORDS = (
+    "提醒", "叫我", "喊我", "记得", "别忘", "闹钟", "定时", "计时",
+    "秒", "分钟", "刻钟", "小时", "钟头", "点", "半",
+    "今天", "明天", "后天", "大后天", "今晚", "明晚", "今早", "明早",
+    "早上", "上午", "中午", "下午", "傍晚", "晚上", "凌晨", "半夜", "夜里",
+    "周", "星期", "礼拜", "月", "号", "日", "年",
+    "待会", "一会", "等会", "等下", "稍后", "之后", "以后", "后再", "过会",
+    # 相对时间（"三天后"、"两周后"、"下个月"等数字为汉字的写法）
+    "天", "后", "下个", "下次", "回头", "晚点", "早点",
+)
+_DIGIT_PATTERN = re.compile(r"[0-9０-９]")
+
+
+def normalize_message(message: str) -> str:
+    """规范化消息文本：去除空白、标点和表情符号，英文转小写"""
+    return _STRIP_PATTERN.sub("", message).lower()
+
+
+def is_trivial_message(message: str) -> bool:
+    """
+    判断是否为无需识别意图的消息（问候、附和、纯表情、表情包）
+
+    合并后的多条消息（以"；"连接）需每一条都满足条件
+    """
+    for part in message.split("；"):
+        part = part.strip()
+        if part.startswith(STICKER_PREFIXES):
+            continue
+        normalized = normalize_message(part)
+        if normalized and normalized not in TRIVIAL_MESSAGES:
+            return False
+    return True
+
+
+def has_time_hint(message: str) -> bool:
+    """判断消息是否可能包含时间信息（数字或时间相关关键词）"""
+    if _DIGIT_PATTERN.search(message):
+        return True
+    return any(keyword in message for keyword in TIME_KEYWORDS)
+
+
+def load_few_shot_messages(sys_prompt: str, example_path: str) -> List[Dict[str, str]]:
+    """
+    构建识别请求的固定部分：系统提示词 + few-shot 示例
+
+    Args:
+        sys_prompt: 系统提示词
+        example_path: 示例文件路径（example_message.json）
+
+    Returns:
+        List[Dict]: 消息列表，调用方在末尾追加用户消息后即可请求
+    """
+    messages = [{"role": "system", "content": sys_prompt}]
+    with open(example_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    for example in data.values():
+        messages.append({
+            "role": example["input"]["role"],
+            "content": example["input"]["content"]
+        })
+        messages.append({
+            "role": example["output"]["role"],
+            "content": str(example["output"]["content"])
+        })
+    return messages
+
+
+class VerdictCache:
+    def __init__(self, ttl: float = 300, max_entries: int = 512):
+        """
+        初始化识别结果缓存
+
+        Args:
+            ttl: 结果有效期（秒）
+            max_entries: 最多缓存的结果数量
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # {规范化消息: (写入时间, 识别结果)}
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.skipped = 0
+        self.classifier_calls = 0
+
+    def get(self, message: str) -> Optional[Any]:
+        """读取缓存的识别结果，未命中或已过期返回 None"""
+        key = normalize_message(message)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+            if time.time() - cached[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+    def put(self, message: str, verdict: Any):
+        """写入识别结果"""
+        key = normalize_message(message)
+        with self._lock:
+            self._entries[key] = (time.time(), verdict)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_skip(self):
+        """记录一次被本地预过滤跳过的识别"""
+        with self._lock:
+            self.skipped += 1
+
+    def record_call(self):
+        """记录一次实际调用识别模型"""
+        with self._lock:
+            self.classifier_calls += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回统计数据：实际调用次数、缓存命中次数、预过滤跳过次数"""
+        with self._lock:
+            total = self.classifier_calls + self.hits + self.skipped
+            avoided = self.hits + self.skipped
+            return {
+                "classifier_calls": self.classifier_calls,
+                "cache_hits": self.hits,
+                "skipped": self.skipped,
+                "avoided_rate": avoided / total if total else 0.0
+            }
@@ -18,6 +18,7 @@ from openai import OpenAI
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../")))
 from src.services.ai.llm_service import LLMService
 from src.autoupdate.updater import Updater
+from modules.recognition.intent_cache import VerdictCache, has_time_hint, is_trivial_message, load_few_shot_messages
 from data.config import config
 
 logger = logging.getLogger('main')
@@ -55,6 +56,11 @@ class ReminderRecognitionService:
         with open(os.path.join(current_dir, "prompt.md"), "r", encoding="utf-8") as f:
             self.sys_prompt = f.read().strip()
 
+        # 系统提示词和 few-shot 示例只构建一次
+        self.few_shot_messages = load_few_shot_messages(self.sys_prompt, os.path.join(current_dir, "example_message.json"))
+        # 识别结果缓存（只缓存"无提醒意图"的结果，提醒时间依赖当前时间，不能复用）
+        self.verdict_cache = VerdictCache()
+
     def recognize(self, message: str) -> Optional[str | List[Dict]]:
         """
         识别并提取消息中的任务意图，支持多个任务意图的识别
@@ -65,27 +71,27 @@ class ReminderRecognitionService:
         Returns:
             Optional[list]: 包含提醒任务的列表
         """
+        # 本地预过滤：问候、表情等消息，或既没有数字也没有时间相关词语的消息，不可能包含提醒意图
+        if is_trivial_message(message) or not has_time_hint(message):
+            self.verdict_cache.record_skip()
+            logger.debug("消息不包含时间信息，跳过提醒意图识别")
+            return "NOT_TIME_RELATED"
+        if self.verdict_cache.get(message) is not None:
+            logger.debug("命中提醒意图识别缓存，跳过提醒意图识别")
+            return "NOT_TIME_RELATED"
+
         delay = 2
         current_model = self.intent_recognition_settings["model"]
         logger.info(f"调用模型{current_model}进行意图识别（自然语言提醒）...（如果卡住或报错请检查是否配置了意图识别API！）")
+        self.verdict_cache.record_call()
         current_time = datetime.now()
-        messages = [{"role": "system", "content": self.sys_prompt}]
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        with open(os.path.join(current_dir, "example_message.json"), 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        for example in data.values():
-            messages.append({
-                "role": example["input"]["role"],
-                "content": example["input"]["content"]
-            })
-            messages.append({
-                "role": example["output"]["role"],
-                "content": str(example["output"]["content"])
-            })
-        messages.append({
-            "role": "user",
-            "content": f"时间：{current_time.strftime('%Y-%m-%d %H:%M:%S')}\n消息：{message}"
-        })
+        messages = [
+            *self.few_shot_messages,
+            {
+                "role": "user",
+                "content": f"时间：{current_time.strftime('%Y-%m-%d %H:%M:%S')}\n消息：{message}"
+            }
+        ]
 
         request_config = {
             "model": self.intent_recognition_settings["model"],
@@ -103,6 +109,7 @@ class ReminderRecognitionService:
                 response_content = response_content[7:-3].strip()
             # 不包含定时提醒意图
             if "NOT_TIME_RELATED" in response_content:
+                self.verdict_cache.put(message, "NOT_TIME_RELATED")
                 return "NOT_TIME_RELATED"
             try:
                 response_content = ast.literal_eval(response_content)
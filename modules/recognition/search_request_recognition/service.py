@@ -16,6 +16,7 @@ from openai import OpenAI
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../")))
 from src.services.ai.llm_service import LLMService
 from src.autoupdate.updater import Updater
+from modules.recognition.intent_cache import VerdictCache, is_trivial_message, load_few_shot_messages
 from data.config import config
 
 logger = logging.getLogger('main')
@@ -53,6 +54,11 @@ class SearchRecognitionService:
         with open(os.path.join(current_dir, "prompt.md"), "r", encoding="utf-8") as f:
             self.sys_prompt = f.read().strip()
 
+        # 系统提示词和 few-shot 示例只构建一次
+        self.few_shot_messages = load_few_shot_messages(self.sys_prompt, os.path.join(current_dir, "example_message.json"))
+        # 识别结果缓存
+        self.verdict_cache = VerdictCache()
+
     def recognize(self, message: str) -> Dict:
         """
         识别消息中的搜索需求
@@ -63,26 +69,27 @@ class SearchRecognitionService:
         Returns:
             Dict: {"search_required": true/false, "search_query": ""}
         """
+        # 本地预过滤：问候、表情等消息无需联网
+        if is_trivial_message(message):
+            self.verdict_cache.record_skip()
+            logger.debug("消息为问候或表情，跳过联网意图识别")
+            return {"search_required": False, "search_query": ""}
+        cached = self.verdict_cache.get(message)
+        if cached is not None:
+            logger.debug("命中联网意图识别缓存，跳过联网意图识别")
+            return dict(cached)
+
         current_model = self.intent_recognition_settings["model"]
         logger.info(f"调用模型{current_model}进行意图识别（联网意图）...（如果卡住或报错请检查是否配置了意图识别API！）")
+        self.verdict_cache.record_call()
         current_time = datetime.now()        
-        messages = [{"role": "system", "content": self.sys_prompt}]
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        with open(os.path.join(current_dir, "example_message.json"), 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        for example in data.values():
-            messages.append({
-                "role": example["input"]["role"],
-                "content": example["input"]["content"]
-            })
-            messages.append({
-                "role": example["output"]["role"],
-                "content": str(example["output"]["content"])
-            })
-        messages.append({
-            "role": "user",
-            "content": f"时间：{current_time.strftime('%Y-%m-%d %H:%M:%S')}\n消息：{message}"
-        })
+        messages = [
+            *self.few_shot_messages,
+            {
+                "role": "user",
+                "content": f"时间：{current_time.strftime('%Y-%m-%d %H:%M:%S')}\n消息：{message}"
+            }
+        ]
 
         request_config = {
             "model": self.intent_recognition_settings["model"],
@@ -108,6 +115,7 @@ class SearchRecognitionService:
                     and "search_required" in response_content
                     and "search_query" in response_content
                 ):
+                    self.verdict_cache.put(message, dict(response_content))
                     return response_content
             except (ValueError, SyntaxError): 
                 logger.warning("识别搜索需求失败，进行重试...")
@@ -5,6 +5,7 @@ import pygame
 from wxauto import WeChat
 from wxauto.elements import ChatWnd
 from uiautomation import ControlFromHandle
+from src.utils.ui_lock import ui_lock
 
 logger = logging.getLogger('main')
 
@@ -197,7 +198,9 @@ def Call(wx: WeChat, who: str, audio_file_path: str) -> None:
     Returns:
         None
     """
-    call_hwnd, success = CallforWho(wx, who)
+    # 拨号、查询通话状态和挂断都要操作微信窗口，与发送消息等界面操作互斥；等待接听和播放语音时不持有锁
+    with ui_lock:
+        call_hwnd, success = CallforWho(wx, who)
     if not success:
         logger.error(f"发起通话失败")
         return
@@ -220,13 +223,16 @@ def Call(wx: WeChat, who: str, audio_file_path: str) -> None:
             #     call_answered = False # 确保状态
             #     break 
 
-            hang_up_text = call_window.TextControl(Name=HANG_UP_BUTTON_LABEL)
-            refuse_msg = call_window.TextControl(Name=REFUSE_MSG)
-            if hang_up_text.Exists(0.1, 0.1) and not refuse_msg.Exists(0.1, 0.1):
+            with ui_lock:
+                hang_up_text = call_window.TextControl(Name=HANG_UP_BUTTON_LABEL)
+                refuse_msg = call_window.TextControl(Name=REFUSE_MSG)
+                answered = hang_up_text.Exists(0.1, 0.1)
+                refused = refuse_msg.Exists(0.1, 0.1)
+            if answered and not refused:
                 logger.info(f"通话已接通！")
                 call_status = 1
                 break
-            elif hang_up_text.Exists(0.1, 0.1) and refuse_msg.Exists(0.1, 0.1):
+            elif answered and refused:
                 logger.info(f"通话被拒接！")
                 call_status = 2
                 break
@@ -243,7 +249,8 @@ def Call(wx: WeChat, who: str, audio_file_path: str) -> None:
             '''
             PlayVoice(audio_file_path=audio_file_path)
             logger.info("语音播放完成，即将挂断...")
-            CancelCall(call_hwnd)
+            with ui_lock:
+                CancelCall(call_hwnd)
         elif call_status ==2:
             '''
             待完成：
@@ -256,12 +263,14 @@ def Call(wx: WeChat, who: str, audio_file_path: str) -> None:
             1. 可以让 bot 回复信息对未接听表示生气。
             '''
             logger.info(f"在超时时间内，对方未接听通话。")
-            CancelCall(call_hwnd)
+            with ui_lock:
+                CancelCall(call_hwnd)
 
     except Exception as e:
         logger.error(f"处理通话时发生未知错误: {e}")
         if call_hwnd is not None: # 对错误进行简单处理，确保有句柄再尝试取消
-            CancelCall(call_hwnd)
+            with ui_lock:
+                CancelCall(call_hwnd)
 
 # --- 主程序示例 (仅用于测试版) ---
 if __name__ == '__main__':
@@ -0,0 +1,134 @@
+"""
+提醒调度模块
+按到期时间调度提醒任务，包括:
+- 最小堆保存到期时间，添加、取消任务 O(log n)
+- 调度线程用条件变量等待到最早的到期时间，空闲时不轮询
+- 取消的任务在出堆时跳过（惰性删除），失效条目过多时重建堆
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('main')
+
+
+class ReminderScheduler:
+    # 单次等待的最长时间（秒），用于应对系统时间调整、休眠唤醒等情况
+    MAX_WAIT = 60
+
+    def __init__(self, on_due: Callable[[str, Any], None], name: str = "reminder-scheduler"):
+        """
+        初始化提醒调度器
+
+        :param on_due: 任务到期时的回调，参数为 (任务ID, 任务数据)，在调度线程中执行
+        :param name: 调度线程名称
+        """
+        self.on_due = on_due
+        self.name = name
+        # {任务ID: (到期时间戳, 任务数据)}
+        self._tasks: Dict[str, Tuple[float, Any]] = {}
+        # 堆元素 (到期时间戳, 序号, 任务ID)
+        self._heap: List[Tuple[float, int, str]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动调度线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止调度线程"""
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def add(self, task_id: str, due_time: float, task: Any):
+        """
+        添加任务，已存在同 ID 的任务时替换
+
+        :param task_id: 任务ID
+        :param due_time: 到期时间戳（秒）
+        :param task: 任务数据，到期时传给回调
+        """
+        with self._condition:
+            self._tasks[task_id] = (due_time, task)
+            heapq.heappush(self._heap, (due_time, next(self._counter), task_id))
+            # 新任务成为最早到期的任务时唤醒调度线程重新计算等待时间
+            if self._heap[0][2] == task_id:
+                self._condition.notify()
+
+    def cancel(self, task_id: str) -> Optional[Any]:
+        """
+        取消任务
+
+        :param task_id: 任务ID
+        :return: 被取消的任务数据，任务不存在时返回 None
+        """
+        with self._condition:
+            entry = self._tasks.pop(task_id, None)
+            # 失效条目超过一半时重建堆，避免大量取消后堆无限增长
+            if entry is not None and len(self._heap) > 2 * len(self._tasks) + 64:
+                self._heap = [item for item in self._heap
+                              if item[2] in self._tasks and self._tasks[item[2]][0] == item[0]]
+                heapq.heapify(self._heap)
+            return entry[1] if entry is not None else None
+
+    def get(self, task_id: str) -> Optional[Any]:
+        with self._condition:
+            entry = self._tasks.get(task_id)
+            return entry[1] if entry is not None else None
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """返回所有待执行任务 [(任务ID, 任务数据)]"""
+        with self._condition:
+            return [(task_id, task) for task_id, (_, task) in self._tasks.items()]
+
+    def __len__(self) -> int:
+        with self._condition:
+            return len(self._tasks)
+
+    def _pop_due(self) -> Optional[Tuple[str, Any]]:
+        """等待并取出下一个到期任务（调用方需持有锁），停止时返回 None"""
+        while not self._stop_event.is_set():
+            while self._heap:
+                due_time, _, task_id = self._heap[0]
+                entry = self._tasks.get(task_id)
+                # 已取消或已被替换的条目直接丢弃
+                if entry is None or entry[0] != due_time:
+                    heapq.heappop(self._heap)
+                    continue
+                break
+            if not self._heap:
+                self._condition.wait(timeout=self.MAX_WAIT)
+                continue
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                self._condition.wait(timeout=min(delay, self.MAX_WAIT))
+                continue
+            _, _, task_id = heapq.heappop(self._heap)
+            return task_id, self._tasks.pop(task_id)[1]
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                due = self._pop_due()
+            if due is None:
+                return
+            task_id, task = due
+            try:
+                self.on_due(task_id, task)
+            except Exception as e:
+                logger.error(f"执行提醒任务失败 - {task_id}: {str(e)}")
@@ -1,27 +1,34 @@
 import logging
-import threading
-import time
 import os
 import sys
-from datetime import datetime
-from typing import Dict, List
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
 from wxauto import WeChat
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../")))
 from modules.reminder.call import Call
+from modules.reminder.scheduler import ReminderScheduler
 from modules.tts.service import tts
 from modules.memory import MemoryService
 from src.handlers.message import MessageHandler
 from src.services.ai.llm_service import LLMService
+from src.services.database import Session, Reminder
 from data.config import config
 
 logger = logging.getLogger('main')
 
+# 重启后，错过时间超过该时长的提醒不再执行
+MISSED_REMINDER_GRACE = timedelta(hours=1)
+# 语音提醒到期时语音仍未生成完成，最多再等待的时间（秒），超时后退化为文本提醒
+VOICE_WAIT_TIMEOUT = 30
+
 
 class ReminderTask:
     """单个提醒任务结构"""
     def __init__(self, task_id: str, chat_id: str, target_time: datetime,
-                 content: str, sender_name: str, reminder_type: str = "text"):
+                 content: str, sender_name: str, reminder_type: str = "text",
+                 message_handler: MessageHandler = None, group_name: str = None):
         self.task_id = task_id
         self.chat_id = chat_id
         self.target_time = target_time
@@ -29,6 +36,12 @@ class ReminderTask:
         self.sender_name = sender_name
         self.reminder_type = reminder_type
         self.audio_path = None
+        # 后台生成语音的任务，结果为语音文件路径
+        self.audio_future: Future = None
+        # 创建提醒的消息处理器（群聊使用各自的人设），为 None 时使用服务默认的处理器
+        self.message_handler = message_handler
+        # 群聊提醒所在的群聊，从数据库恢复时据此重新获取群聊专用的处理器
+        self.group_name = group_name
 
     def is_due(self) -> bool:
         return datetime.now() >= self.target_time
@@ -40,39 +53,169 @@ class ReminderService:
         self.wx = message_handler.wx
         self.mem_service = mem_service
         self.llm_service = message_handler.deepseek
-        self.active_reminders: Dict[str, ReminderTask] = {}
-        self._lock = threading.Lock()
-        self._start_polling_thread()
+        # 语音提醒的回复和语音在后台生成，添加提醒时不等待
+        self._voice_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="VoiceReminder")
+        # 到期的提醒交给发送线程执行（等待语音、生成回复、拨打电话），调度线程只负责分派
+        self._delivery_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ReminderDelivery")
+        # 根据群聊名称获取群聊专用处理器，由群聊机器人启动后设置
+        self._group_handler_resolver: Optional[Callable[[str], MessageHandler]] = None
+        # 按到期时间调度提醒任务，调度线程只在最早的提醒到期时唤醒
+        self.scheduler = ReminderScheduler(self._on_reminder_due)
+        self._load_reminders()
+        self.scheduler.start()
         logger.info("统一提醒服务已启动")
 
-    def _start_polling_thread(self):
-        thread = threading.Thread(target=self._poll_reminders_loop, daemon=True)
-        thread.start()
-
-    def _poll_reminders_loop(self):
-        while True:
-            due_tasks: List[ReminderTask] = []
-            with self._lock:
-                for _, task in list(self.active_reminders.items()):
-                    if task.is_due():
-                        due_tasks.append(task)
-                for task in due_tasks:
-                    del self.active_reminders[task.task_id]
-            for task in due_tasks:
-                logger.info(f"到达提醒时间，执行提醒: {task.task_id}")
-                self._do_remind(task, self.wx)
-            time.sleep(1)
+    def set_group_handler_resolver(self, resolver: Callable[[str], MessageHandler]):
+        """设置根据群聊名称获取群聊专用处理器的方法，用于执行从数据库恢复的群聊提醒"""
+        self._group_handler_resolver = resolver
+
+    def _get_handler(self, task: ReminderTask) -> MessageHandler:
+        """获取执行提醒使用的消息处理器：创建时的处理器 > 按群聊名称恢复的处理器 > 默认处理器"""
+        if task.message_handler is None and task.group_name:
+            if self._group_handler_resolver is None:
+                logger.warning(f"群聊处理器尚未就绪，群聊提醒使用默认人设: {task.task_id}")
+                return self.message_handler
+            try:
+                task.message_handler = self._group_handler_resolver(task.group_name)
+            except Exception as e:
+                logger.error(f"获取群聊 {task.group_name} 的处理器失败: {str(e)}")
+        return task.message_handler or self.message_handler
+
+    def _load_reminders(self):
+        """从数据库加载未执行的提醒任务（群聊提醒在执行时按群聊名称获取群聊专用的处理器）"""
+        session = Session()
+        try:
+            now = datetime.now()
+            loaded = 0
+            for record in session.query(Reminder).all():
+                if record.target_time < now - MISSED_REMINDER_GRACE:
+                    logger.warning(f"提醒任务已过期，不再执行: {record.task_id}, 提醒时间: {record.target_time}")
+                    session.delete(record)
+                    continue
+                task = ReminderTask(record.task_id, record.chat_id, record.target_time, record.content,
+                                    record.sender_name, record.reminder_type, group_name=record.group_name)
+                self.scheduler.add(task.task_id, task.target_time.timestamp(), task)
+                if task.reminder_type == "voice":
+                    if record.audio_path and os.path.exists(record.audio_path):
+                        task.audio_path = record.audio_path
+                        tts.pin(task.audio_path)
+                    else:
+                        # 语音文件已被清理，重新生成
+                        self._prepare_voice(task)
+                loaded += 1
+            session.commit()
+            if loaded:
+                logger.info(f"已从数据库恢复 {loaded} 个提醒任务")
+        except Exception as e:
+            session.rollback()
+            logger.error(f"加载提醒任务失败: {str(e)}")
+        finally:
+            session.close()
+
+    def _save_reminder(self, task: ReminderTask):
+        """将提醒任务写入数据库"""
+        session = Session()
+        try:
+            session.merge(Reminder(
+                task_id=task.task_id,
+                chat_id=task.chat_id,
+                target_time=task.target_time,
+                content=task.content,
+                sender_name=task.sender_name,
+                reminder_type=task.reminder_type,
+                audio_path=task.audio_path,
+                group_name=task.group_name
+            ))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"保存提醒任务失败: {str(e)}")
+        finally:
+            session.close()
+
+    def _delete_reminder(self, task_id: str):
+        """从数据库删除提醒任务"""
+        session = Session()
+        try:
+            session.query(Reminder).filter(Reminder.task_id == task_id).delete()
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"删除提醒任务失败: {str(e)}")
+        finally:
+            session.close()
+
+    def _schedule_reminder(self, task: ReminderTask):
+        """保存并调度提醒任务"""
+        self._save_reminder(task)
+        self.scheduler.add(task.task_id, task.target_time.timestamp(), task)
+        logger.info(f"提醒任务已添加。提醒时间: {task.target_time}, 内容: {task.content}，用户：{task.sender_name}，类型：{task.reminder_type}")
+
+    def _on_reminder_due(self, task_id: str, task: ReminderTask):
+        logger.info(f"到达提醒时间，执行提醒: {task_id}")
+        self._delete_reminder(task_id)
+        self._delivery_executor.submit(self._do_remind, task, self.wx)
+
+    def _prepare_voice(self, task: ReminderTask):
+        """在后台生成语音提醒的回复和语音"""
+        task.audio_future = self._voice_executor.submit(self._generate_voice, task)
+
+    def _generate_voice(self, task: ReminderTask):
+        """生成语音提醒的回复和语音（在后台线程中执行），返回语音文件路径"""
+        try:
+            logger.info("检测到语音提醒任务，预生成回复中")
+            remind_text = self._remind_text_generate(remind_content=task.content, sender_name=task.sender_name,
+                                                     message_handler=self._get_handler(task))
+            logger.info(f"预生成回复:{tts._clear_tts_text(remind_text)}")
+            logger.info("生成语音中")
+            audio_file_path = tts._generate_audio_file(tts._clear_tts_text(remind_text))
+        except Exception as e:
+            logger.error(f"生成提醒语音失败: {str(e)}")
+            audio_file_path = None
+        if audio_file_path is None:
+            logger.warning("提醒任务语音生成失败，到期时将以文本提醒")
+            return None
+
+        # 提醒执行前语音文件不会被清理
+        tts.pin(audio_file_path)
+        task.audio_path = audio_file_path
+        logger.info("提醒任务语音生成完成")
+        # 提醒仍在等待执行时保存语音路径，重启后无需重新生成
+        if self.scheduler.get(task.task_id) is task:
+            self._save_reminder(task)
+        return audio_file_path
+
+    def _wait_voice(self, task: ReminderTask):
+        """获取语音提醒的语音文件，仍在生成时最多等待 VOICE_WAIT_TIMEOUT 秒"""
+        if task.audio_path or task.audio_future is None:
+            return task.audio_path
+        try:
+            return task.audio_future.result(timeout=VOICE_WAIT_TIMEOUT)
+        except TimeoutError:
+            logger.warning(f"提醒语音生成超时: {task.task_id}")
+            return None
+
+    def _release_voice(self, task: ReminderTask):
+        """取消语音文件的使用标记（语音仍在生成时，在生成完成后取消）"""
+        if task.audio_future is not None:
+            task.audio_future.add_done_callback(lambda future: future.result() and tts.release(future.result()))
+        elif task.audio_path:
+            tts.release(task.audio_path)
 
     def _do_remind(self, task: ReminderTask, wx: WeChat):
+        """执行提醒（在发送线程中执行）"""
         try:
             prompt = self._get_reminder_prompt(task.content)
             logger.debug(f"生成提醒消息 - 用户: {task.sender_name}, 类型: {task.reminder_type}, 提示词: {prompt}")
 
-            if task.reminder_type == "voice":
-                Call(wx=wx, who=task.sender_name, audio_file_path=task.audio_path)
-                tts._del_audio_file(task.audio_path)
+            audio_path = self._wait_voice(task) if task.reminder_type == "voice" else None
+            if task.reminder_type == "voice" and audio_path is None:
+                logger.warning("语音提醒没有可用的语音，退化为文本提醒")
+            if audio_path:
+                Call(wx=wx, who=task.sender_name, audio_file_path=audio_path)
             else:
-                self.message_handler.handle_user_message(
+                message_handler = self._get_handler(task)
+                message_handler.handle_user_message(
                     content=prompt,
                     chat_id=task.chat_id,
                     sender_name="System",
@@ -82,75 +225,64 @@ class ReminderService:
             logger.info(f"已发送提醒消息给 {task.sender_name}")
         except Exception as e:
             logger.error(f"发送提醒消息失败: {str(e)}")
+        finally:
+            if task.reminder_type == "voice":
+                # 语音文件保留在缓存中，相同内容的提醒可以复用，由磁盘占用上限统一清理
+                self._release_voice(task)
 
-    def _remind_text_generate(self, remind_content: str, sender_name: str):
-        core_mem = self.mem_service.get_core_memory(avatar_name=self.message_handler.current_avatar, user_id=sender_name)
-        context = self.mem_service.get_recent_context(avatar_name=self.message_handler.current_avatar, user_id=sender_name)
-        sys_prompt = f"你将进行角色扮演，请你同用户进行符合人设的交流沟通。你的人设如下：\n\n{self.message_handler.prompt_content}\n\n"
+    def _remind_text_generate(self, remind_content: str, sender_name: str, message_handler: MessageHandler = None):
+        message_handler = message_handler or self.message_handler
+        core_mem = self.mem_service.get_core_memory(avatar_name=message_handler.current_avatar, user_id=sender_name)
+        context = self.mem_service.get_recent_context(avatar_name=message_handler.current_avatar, user_id=sender_name)
+        sys_prompt = f"你将进行角色扮演，请你同用户进行符合人设的交流沟通。你的人设如下：\n\n{message_handler.prompt_content}\n\n"
         sys_prompt = sys_prompt + f"另外，作为一个仿真的角色扮演者，你需要掌握一些你不一定用到的、但是十分重要的知识：{core_mem}。你的每次回应都不应该违反这些知识！"
-        messages = [{"role": "system", "content": sys_prompt}, *context[-self.message_handler.max_groups * 2:]]
+        messages = [{"role": "system", "content": sys_prompt}, *context[-message_handler.max_groups * 2:]]
         sys_prompt = f"现在提醒时间到了，用户之前设定的提示内容为“{remind_content}”。请以你的人设中的身份主动找用户聊天。保持角色设定的一致性和上下文的连贯性。"
         messages.append({"role": "system", "content": sys_prompt})
         request_config = {
-                        "model": self.message_handler.model,
+                        "model": message_handler.model,
                         "messages": messages,
-                        "temperature": self.message_handler.temperature,
-                        "max_tokens": self.message_handler.max_token,
+                        "temperature": message_handler.temperature,
+                        "max_tokens": message_handler.max_token,
                     }
         response = self.llm_service.client.chat.completions.create(**request_config)
         raw_content = response.choices[0].message.content
         return raw_content
 
 
-    def add_reminder(self, chat_id: str, target_time: datetime, content: str, sender_name: str, reminder_type: str = "text"):
+    def add_reminder(self, chat_id: str, target_time: datetime, content: str, sender_name: str, reminder_type: str = "text",
+                     message_handler: MessageHandler = None, group_name: str = None):
         try:
             task_id = f"reminder_{chat_id}_{datetime.now().timestamp()}"
-            task = ReminderTask(task_id, chat_id, target_time, content, sender_name, reminder_type)
+            task = ReminderTask(task_id, chat_id, target_time, content, sender_name, reminder_type,
+                                message_handler, group_name)
+            self._schedule_reminder(task)
+            # 语音提醒立即在后台生成语音，到期时直接拨打，生成失败时退化为文本提醒
             if reminder_type == "voice":
-                logger.info("检测到语音提醒任务，预生成回复中")
-                remind_text = self._remind_text_generate(remind_content=content, sender_name=sender_name)
-                logger.info(f"预生成回复:{tts._clear_tts_text(remind_text)}")
-                logger.info("生成语音中")
-                audio_file_path = tts._generate_audio_file(tts._clear_tts_text(remind_text))
-                # 语音生成失败，退化为文本提醒
-                if audio_file_path is None:
-                    logger.warning("提醒任务语音生成失败，将替换为文本提醒任务")
-                    fixed_task = ReminderTask(task_id, chat_id, target_time, content, sender_name, reminder_type="text")
-                    with self._lock:
-                        self.active_reminders[task_id] = fixed_task
-                    logger.info(f"提醒任务已添加。提醒时间: {target_time}, 内容: {content}，用户：{sender_name}，类型：{reminder_type}")
-                # 语音生成成功，保存音频路径到 task 属性中
-                else:
-                    task.audio_path = audio_file_path
-                    logger.info("提醒任务语音生成完成")
-                    with self._lock:
-                        self.active_reminders[task_id] = task
-                    logger.info(f"提醒任务已添加。提醒时间: {target_time}, 内容: {content}，用户：{sender_name}，类型：{reminder_type}")
-            else:
-                with self._lock:
-                    self.active_reminders[task_id] = task
-                logger.info(f"提醒任务已添加。提醒时间: {target_time}, 内容: {content}，用户：{sender_name}，类型：{reminder_type}")
+                self._prepare_voice(task)
         except Exception as e:
             logger.error(f"添加提醒任务失败: {str(e)}")
 
     def cancel_reminder(self, task_id: str) -> bool:
-        with self._lock:
-            if task_id in self.active_reminders:
-                del self.active_reminders[task_id]
-                logger.info(f"提醒任务已取消: {task_id}")
-                return True
+        task = self.scheduler.cancel(task_id)
+        if task is None:
             return False
+        if task.reminder_type == "voice":
+            self._release_voice(task)
+        self._delete_reminder(task_id)
+        logger.info(f"提醒任务已取消: {task_id}")
+        return True
 
     def list_reminders(self) -> List[Dict]:
-        with self._lock:
-            return [{
-                'task_id': task_id,
-                'chat_id': task.chat_id,
-                'target_time': task.target_time.isoformat(),
-                'content': task.content,
-                'sender_name': task.sender_name,
-                'reminder_type': task.reminder_type
-            } for task_id, task in self.active_reminders.items()]
+        return [{
+            'task_id': task_id,
+            'chat_id': task.chat_id,
+            'target_time': task.target_time.isoformat(),
+            'content': task.content,
+            'sender_name': task.sender_name,
+            'reminder_type': task.reminder_type,
+            'group_name': task.group_name
+        } for task_id, task in sorted(self.scheduler.items(), key=lambda item: item[1].target_time)]
 
     def _get_reminder_prompt(self, content: str) -> str:
         return f"""现在提醒时间到了，用户之前设定的提示内容为“{content}”。请以你的人设中的身份主动找用户聊天。保持角色设定的一致性和上下文的连贯性"""
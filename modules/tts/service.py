@@ -2,9 +2,9 @@
 语音处理模块
 负责处理语音相关功能，包括:
 - 语音请求识别
-- TTS语音生成
-- 语音文件管理
-- 清理临时文件
+- TTS语音生成（复用会话，相同文本的并发请求合并为一次生成）
+- 语音文件管理（按内容哈希命名，相同文本只生成一次）
+- 按磁盘占用上限清理最久未使用的语音文件
 """
 
 import os
@@ -12,8 +12,10 @@ import logging
 import re
 import emoji
 import sys
-from datetime import datetime
-from typing import Optional
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Dict, Optional
 from fish_audio_sdk import Session, TTSRequest
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
@@ -23,14 +25,33 @@ from data.config import config
 logger = logging.getLogger('main')
 
 class TTSService:
-    def __init__(self):
+    # 语音文件的磁盘占用上限（字节），超出时删除最久未使用的文件
+    MAX_CACHE_BYTES = 200 * 1024 * 1024
+
+    def __init__(self, base_url: str = "https://api.fish.audio", voice_dir: str = None):
         self.root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"))
-        self.voice_dir = os.path.join(self.root_dir, "data", "voices")
+        self.voice_dir = voice_dir or os.path.join(self.root_dir, "data", "voices")
         self.tts_api_key = config.media.text_to_speech.tts_api_key
-        
+        self.base_url = base_url
+
+        # 复用的 TTS 会话（首次使用时创建）
+        self._session = None
+        self._session_lock = threading.Lock()
+        # 正在生成的语音 {文件路径: Future}，相同文本的并发请求共享一次生成
+        self._in_flight: Dict[str, Future] = {}
+        # 被待执行提醒引用的语音文件 {文件路径: 引用数}，清理时跳过
+        self._pinned: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
         # 确保语音目录存在
         os.makedirs(self.voice_dir, exist_ok=True)
 
+    def _get_session(self) -> Session:
+        with self._session_lock:
+            if self._session is None:
+                self._session = Session(self.tts_api_key, base_url=self.base_url)
+            return self._session
+
     def _clear_tts_text(self, text: str) -> str:
         """用于清洗回复,使得其适合进行TTS"""
         # 完全移除emoji表情符号
@@ -44,30 +65,89 @@ class TTSService:
         text = re.sub(r'\[.*?\]','', text)
         return text.strip()
 
+    def _audio_path(self, text: str) -> str:
+        """根据音色和文本内容计算语音文件路径"""
+        model_id = config.media.text_to_speech.tts_model_id
+        digest = hashlib.sha256(f"{model_id}\0{text}".encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.voice_dir, f"tts_{digest}.mp3")
+
     def _generate_audio_file(self, text: str) -> Optional[str]:
-        """调用TTS API生成语音"""
+        """调用TTS API生成语音，相同文本已生成过时直接返回已有文件"""
+        voice_path = self._audio_path(text)
+        with self._lock:
+            if os.path.isfile(voice_path) and os.path.getsize(voice_path) > 0:
+                # 更新修改时间，作为最近使用时间
+                os.utime(voice_path)
+                logger.info(f"复用已生成的语音: {voice_path}")
+                return voice_path
+            future = self._in_flight.get(voice_path)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._in_flight[voice_path] = future
+        if not is_leader:
+            return future.result()
+
+        result = None
         try:
             # 确保语音目录存在
-            if not os.path.exists(self.voice_dir):
-                os.makedirs(self.voice_dir)
-                
-            # 生成唯一的文件名
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            voice_path = os.path.join(self.voice_dir, f"voice_{timestamp}.mp3")
-            
-            # 调用TTS API
-            with open(voice_path, "wb") as f:
-                for chunk in Session(self.tts_api_key).tts(TTSRequest(
+            os.makedirs(self.voice_dir, exist_ok=True)
+
+            # 先写入临时文件，完成后再替换，避免生成失败留下不完整的文件
+            tmp_path = f"{voice_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                for chunk in self._get_session().tts(TTSRequest(
                     reference_id=config.media.text_to_speech.tts_model_id,
                     text=text
                 )):
                     f.write(chunk)
-                
+            os.replace(tmp_path, voice_path)
+            result = voice_path
+            self._enforce_disk_budget()
         except Exception as e:
             logger.error(f"语音生成失败: {str(e)}")
-            return None
-        
-        return voice_path
+        finally:
+            with self._lock:
+                self._in_flight.pop(voice_path, None)
+            future.set_result(result)
+        return result
+
+    def pin(self, audio_file_path: str):
+        """标记语音文件正在被使用，清理时跳过"""
+        with self._lock:
+            self._pinned[audio_file_path] = self._pinned.get(audio_file_path, 0) + 1
+
+    def release(self, audio_file_path: str):
+        """取消语音文件的使用标记"""
+        with self._lock:
+            count = self._pinned.get(audio_file_path, 0) - 1
+            if count > 0:
+                self._pinned[audio_file_path] = count
+            else:
+                self._pinned.pop(audio_file_path, None)
+
+    def _enforce_disk_budget(self):
+        """磁盘占用超出上限时，删除最久未使用且未被引用的语音文件"""
+        try:
+            files = []
+            for entry in os.scandir(self.voice_dir):
+                if entry.is_file() and entry.name.startswith("tts_") and entry.name.endswith(".mp3"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            if total <= self.MAX_CACHE_BYTES:
+                return
+            with self._lock:
+                pinned = set(self._pinned)
+            for _, size, path in sorted(files):
+                if total <= self.MAX_CACHE_BYTES:
+                    break
+                if path in pinned:
+                    continue
+                self._del_audio_file(path)
+                total -= size
+        except Exception as e:
+            logger.error(f"清理语音缓存失败: {str(e)}")
 
     def _del_audio_file(self, audio_file_path: str):
         """清理语音目录中的旧文件"""
@@ -78,4 +158,4 @@ class TTSService:
         except Exception as e:
             logger.error(f"清理语音文件失败 {audio_file_path}: {str(e)}")
 
-tts = TTSService()
\ No newline at end of file
+tts = TTSService()
@@ -11,7 +11,7 @@ import os
 import sys
 import re
 import logging
-from flask import Flask, render_template, jsonify, request, send_from_directory, redirect, url_for, session, g
+from flask import Flask, render_template, jsonify, request, send_from_directory, redirect, url_for, session, g, Response
 import importlib
 import json
 from colorama import init, Fore, Style
@@ -23,7 +23,6 @@ import threading
 from src.autoupdate.updater import Updater
 import requests
 import time
-from queue import Queue
 import datetime
 from logging.config import dictConfig
 import shutil
@@ -35,6 +34,7 @@ import hashlib
 import secrets
 from datetime import timedelta
 from src.utils.console import print_status
+from src.utils.log_buffer import LogRingBuffer
 from src.avatar_manager import avatar_manager  # 导入角色设定管理器
 from src.webui.routes.avatar import avatar_bp
 import ctypes
@@ -46,7 +46,7 @@ import win32process
 # 在文件开头添加全局变量声明
 bot_process = None
 bot_start_time = None
-bot_logs = Queue(maxsize=1000)
+bot_logs = LogRingBuffer(capacity=2000)  # 机器人日志环形缓冲区，内存占用固定
 job_object = None  # 添加全局作业对象变量
 
 # 配置日志
@@ -1104,13 +1104,13 @@ def start_log_reading_thread():
                             if isinstance(line, bytes):
                                 line = line.decode('utf-8', errors='replace')
                             timestamp = datetime.datetime.now().strftime('%H:%M:%S')
-                            bot_logs.put(f"[{timestamp}] {line}")
+                            bot_logs.append(f"[{timestamp}] {line}")
                         except Exception as e:
                             logger.error(f"日志处理错误: {str(e)}")
                             continue
         except Exception as e:
             logger.error(f"读取日志失败: {str(e)}")
-            bot_logs.put(f"[ERROR] 读取日志失败: {str(e)}")
+            bot_logs.append(f"[ERROR] 读取日志失败: {str(e)}")
 
     thread = threading.Thread(target=read_output, daemon=True)
     thread.start()
@@ -1142,18 +1142,73 @@ def start_bot():
         'message': message
     })
 
+def get_bot_status():
+    """获取机器人运行状态"""
+    return {
+        'uptime': get_bot_uptime(),
+        'is_running': bot_process is not None and bot_process.poll() is None
+    }
+
 @app.route('/get_bot_logs')
 def get_bot_logs():
-    """获取机器人日志"""
+    """
+    获取机器人日志
+
+    参数 since 为上次读到的日志序号，返回之后的日志和新的游标；不带 since 时只返回状态和当前游标。
+    参数 wait 大于 0 时没有新日志会最多等待 wait 秒（长轮询）。
+    """
+    since = request.args.get('since', type=int)
     logs = []
-    while not bot_logs.empty():
-        logs.append(bot_logs.get())
+    cursor = bot_logs.last_seq
+    if since is not None:
+        wait = min(request.args.get('wait', 0, type=float), 30)
+        if wait > 0:
+            bot_logs.wait(since, timeout=wait)
+        lines, cursor, _ = bot_logs.read(since)
+        logs = [line for _, line in lines]
 
     return jsonify({
         'status': 'success',
         'logs': logs,
-        'uptime': get_bot_uptime(),
-        'is_running': bot_process is not None and bot_process.poll() is None
+        'cursor': cursor,
+        **get_bot_status()
+    })
+
+@app.route('/stream_bot_logs')
+def stream_bot_logs():
+    """
+    以 SSE 推送机器人日志
+
+    每条消息是一批日志（JSON 数组），消息 ID 为这批日志的最后序号；浏览器断线重连时通过
+    Last-Event-ID 从断点继续。运行状态以 status 事件推送，同时作为心跳。
+    """
+    cursor = request.headers.get('Last-Event-ID', type=int)
+    if cursor is None:
+        cursor = request.args.get('since', 0, type=int)
+
+    def generate(cursor):
+        yield 'retry: 3000\n\n'
+        last_status = None
+        last_status_time = 0
+        while True:
+            lines, new_cursor, missed = bot_logs.read(cursor, limit=500)
+            if missed:
+                lines.insert(0, (0, f"[日志] 缓冲区已满，跳过了 {missed} 行较早的日志"))
+            if lines or new_cursor != cursor:
+                cursor = new_cursor
+                logs = json.dumps([line for _, line in lines], ensure_ascii=False)
+                yield f"id: {cursor}\ndata: {logs}\n\n"
+            status = get_bot_status()
+            if status['is_running'] != (last_status or {}).get('is_running') or time.time() - last_status_time >= 5:
+                last_status, last_status_time = status, time.time()
+                yield f"event: status\ndata: {json.dumps(status, ensure_ascii=False)}\n\n"
+            if not status['is_running'] and bot_logs.last_seq == cursor:
+                return
+            bot_logs.wait(cursor, timeout=5)
+
+    return Response(generate(cursor), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
 
 def terminate_bot_process(force=False):
@@ -1196,9 +1251,9 @@ def terminate_bot_process(force=False):
 
         # 添加日志记录
         timestamp = datetime.datetime.now().strftime('%H:%M:%S')
-        bot_logs.put(f"[{timestamp}] 正在关闭监听线程...")
-        bot_logs.put(f"[{timestamp}] 正在关闭系统...")
-        bot_logs.put(f"[{timestamp}] 系统已退出")
+        bot_logs.append(f"[{timestamp}] 正在关闭监听线程...")
+        bot_logs.append(f"[{timestamp}] 正在关闭系统...")
+        bot_logs.append(f"[{timestamp}] 系统已退出")
 
         return True, "机器人已停止"
 
@@ -1207,9 +1262,8 @@ def terminate_bot_process(force=False):
         return False, f"停止失败: {str(e)}"
 
 def clear_bot_logs():
-    """清空机器人日志队列"""
-    while not bot_logs.empty():
-        bot_logs.get()
+    """清空机器人日志缓冲区"""
+    bot_logs.clear()
 
 @app.route('/stop_bot')
 def stop_bot():
@@ -1220,6 +1274,41 @@ def stop_bot():
         'message': message
     })
 
+@app.route('/search_chat_history')
+def search_chat_history():
+    """
+    搜索聊天记录
+
+    参数 q 为搜索内容（多个词用空格分隔），sender_id 只搜索该用户或群，
+    order 为 recent（最新优先，默认）或 relevance（相关度优先），limit 为最多返回的条数。
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({
+            'status': 'error',
+            'message': '请输入搜索内容'
+        })
+    try:
+        from src.services.history_search import history_search
+        results = history_search.search(
+            query,
+            sender_id=request.args.get('sender_id') or None,
+            limit=min(request.args.get('limit', 20, type=int), 200),
+            order=request.args.get('order', 'recent')
+        )
+        for item in results:
+            item['created_at'] = item['created_at'].strftime('%Y-%m-%d %H:%M:%S') if item['created_at'] else None
+        return jsonify({
+            'status': 'success',
+            'results': results
+        })
+    except Exception as e:
+        logger.error(f"搜索聊天记录失败: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        })
+
 @app.route('/config')
 def config():
     """配置页面"""
@@ -0,0 +1,359 @@
+"""
+Delta update module for the KouriChat update system.
+
+Instead of downloading the full release package, a delta update compares a
+per-file SHA-256 manifest published with the release against the local tree
+and only downloads the files that actually changed. Each file is verified
+while it is streamed to disk, and only the files that are touched are backed
+up before they are replaced.
+
+Manifest format:
+{
+    "version": "1.4.3.3",
+    "base_url": "https://.../v{version}/files/",
+    "files": {"src/main.py": {"sha256": "...", "size": 12345}, ...},
+    "deleted": ["src/old_module.py"]
+}
+
+Manifest paths are normalized to "/"-separated relative paths. Absolute paths,
+drive letters and any path that resolves outside the application root reject
+the whole manifest before anything is downloaded or removed.
+"""
+
+import os
+import fnmatch
+import hashlib
+import logging
+import ntpath
+import posixpath
+import shutil
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import requests
+
+# Configure logging
+logger = logging.getLogger("autoupdate.delta")
+
+# Constants
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Files/directories that are never touched by an update
+EXCLUDE_PATTERNS = [
+    ".git",
+    "venv",
+    "env",
+    "__pycache__",
+    "*.pyc",
+    "*.pyo",
+    "*.pyd",
+    "user_data",
+    "logs",
+    "config.json",
+    "autoupdate_config.json",
+    "data",
+    "data/*"
+]
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DeltaUpdateError(Exception):
+    """Exception raised when a delta update cannot be completed."""
+    pass
+
+
+def is_excluded(rel_path: str) -> bool:
+    """
+    Check whether a relative path is excluded from updates.
+
+    Args:
+        rel_path: Path relative to the application root, using "/" separators.
+
+    Returns:
+        bool: True if the path must not be touched by an update.
+    """
+    parts = rel_path.replace("\\", "/").split("/")
+    for pattern in EXCLUDE_PATTERNS:
+        if fnmatch.fnmatch(rel_path, pattern) or any(fnmatch.fnmatch(part, pattern) for part in parts):
+            return True
+    return False
+
+
+def normalize_manifest_path(rel_path: str, root_dir: str = ROOT_DIR) -> str:
+    """
+    Normalize a manifest path and make sure it stays inside the application root.
+
+    Args:
+        rel_path: Path from the manifest ("/" or "\\" separators).
+        root_dir: The application root.
+
+    Returns:
+        str: The normalized relative path, using "/" separators.
+
+    Raises:
+        DeltaUpdateError: If the path is empty, absolute or resolves outside root_dir.
+    """
+    if not isinstance(rel_path, str) or not rel_path.strip():
+        raise DeltaUpdateError(f"Invalid manifest path: {rel_path!r}")
+    path = rel_path.replace("\\", "/")
+    if path.startswith("/") or ntpath.splitdrive(path)[0] or os.path.isabs(path):
+        raise DeltaUpdateError(f"Absolute path in manifest: {rel_path!r}")
+    path = posixpath.normpath(path)
+    if path in (".", "..") or path.startswith("../"):
+        raise DeltaUpdateError(f"Manifest path escapes the application root: {rel_path!r}")
+
+    # Resolve symlinks as well: a linked directory inside the tree must not lead outside it
+    real_root = os.path.realpath(root_dir)
+    real_path = os.path.realpath(os.path.join(root_dir, *path.split("/")))
+    if os.path.commonpath([real_root, real_path]) != real_root or real_path == real_root:
+        raise DeltaUpdateError(f"Manifest path escapes the application root: {rel_path!r}")
+    return path
+
+
+def normalize_manifest(manifest: Dict[str, Any], root_dir: str = ROOT_DIR) -> Dict[str, Any]:
+    """
+    Return a copy of the manifest with every file and deleted path normalized.
+
+    Raises:
+        DeltaUpdateError: If any path is unsafe, or two entries normalize to the same path.
+    """
+    files = {}
+    for rel_path, info in manifest.get("files", {}).items():
+        path = normalize_manifest_path(rel_path, root_dir)
+        if path in files:
+            raise DeltaUpdateError(f"Duplicate manifest path: {rel_path!r}")
+        if not isinstance(info, dict) or not isinstance(info.get("sha256"), str):
+            raise DeltaUpdateError(f"Invalid manifest entry for {rel_path!r}")
+        files[path] = info
+    deleted = []
+    for rel_path in manifest.get("deleted", []) or []:
+        path = normalize_manifest_path(rel_path, root_dir)
+        if path in files:
+            raise DeltaUpdateError(f"Manifest both updates and deletes {rel_path!r}")
+        if path not in deleted:
+            deleted.append(path)
+    return dict(manifest, files=files, deleted=deleted)
+
+
+def hash_file(path: str) -> str:
+    """Calculate the SHA-256 of a file in chunks."""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def build_manifest(source_dir: str, version: str, base_url: str = "") -> Dict[str, Any]:
+    """
+    Build a manifest for a release tree (used when publishing a release).
+
+    Args:
+        source_dir: Root directory of the release.
+        version: Release version.
+        base_url: URL prefix the files are served from.
+
+    Returns:
+        Dict[str, Any]: The manifest.
+    """
+    files = {}
+    for root, dirs, names in os.walk(source_dir):
+        rel_root = os.path.relpath(root, source_dir).replace(os.sep, "/")
+        rel_root = "" if rel_root == "." else rel_root
+        dirs[:] = [d for d in dirs if not is_excluded(f"{rel_root}/{d}".lstrip("/"))]
+        for name in names:
+            rel_path = f"{rel_root}/{name}".lstrip("/")
+            if is_excluded(rel_path):
+                continue
+            path = os.path.join(root, name)
+            files[rel_path] = {"sha256": hash_file(path), "size": os.path.getsize(path)}
+    return {"version": version, "base_url": base_url, "files": files, "deleted": []}
+
+
+def compute_delta(manifest: Dict[str, Any], root_dir: str = ROOT_DIR) -> Tuple[List[str], List[str]]:
+    """
+    Compare a manifest against the local tree.
+
+    Files whose size differs are known to have changed without hashing them.
+
+    Args:
+        manifest: The release manifest.
+        root_dir: The application root.
+
+    Returns:
+        Tuple[List[str], List[str]]: (files to download, files to delete), as normalized paths
+
+    Raises:
+        DeltaUpdateError: If the manifest contains an unsafe path.
+    """
+    manifest = normalize_manifest(manifest, root_dir)
+    changed = []
+    for rel_path, info in manifest.get("files", {}).items():
+        if is_excluded(rel_path):
+            continue
+        local_path = os.path.join(root_dir, rel_path)
+        if not os.path.isfile(local_path):
+            changed.append(rel_path)
+        elif os.path.getsize(local_path) != info.get("size", -1) or hash_file(local_path) != info["sha256"]:
+            changed.append(rel_path)
+    removed = [rel_path for rel_path in manifest.get("deleted", [])
+               if not is_excluded(rel_path) and os.path.isfile(os.path.join(root_dir, rel_path))]
+    return changed, removed
+
+
+def download_verified(session: requests.Session, url: str, dest_path: str,
+                      expected_sha256: str, headers: Optional[Dict[str, str]] = None) -> int:
+    """
+    Stream a file to disk while hashing it.
+
+    Args:
+        session: HTTP session (connections are reused across files).
+        url: File URL.
+        dest_path: Where to write the file.
+        expected_sha256: Expected SHA-256 of the file.
+        headers: Optional request headers.
+
+    Returns:
+        int: Number of bytes downloaded.
+
+    Raises:
+        DeltaUpdateError: If the download fails or the checksum does not match.
+    """
+    sha256 = hashlib.sha256()
+    downloaded = 0
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    with session.get(url, headers=headers, stream=True, timeout=60) as response:
+        if response.status_code != 200:
+            raise DeltaUpdateError(f"Failed to download {url}: HTTP {response.status_code}")
+        with open(dest_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    sha256.update(chunk)
+                    f.write(chunk)
+                    downloaded += len(chunk)
+    if sha256.hexdigest() != expected_sha256:
+        raise DeltaUpdateError(f"Checksum verification failed for {url}. "
+                               f"Expected: {expected_sha256}, Got: {sha256.hexdigest()}")
+    return downloaded
+
+
+def fetch_manifest(session: requests.Session, manifest_url: str,
+                   headers: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, Any], int]:
+    """
+    Download and parse a release manifest.
+
+    Returns:
+        Tuple[Dict[str, Any], int]: (manifest, bytes downloaded)
+    """
+    response = session.get(manifest_url, headers=headers, timeout=60)
+    if response.status_code != 200:
+        raise DeltaUpdateError(f"Failed to download manifest: HTTP {response.status_code}")
+    manifest = response.json()
+    if not isinstance(manifest.get("files"), dict):
+        raise DeltaUpdateError("Invalid manifest: missing file list")
+    return manifest, len(response.content)
+
+
+def apply_delta_update(manifest_url: str, version: str, current_version: str,
+                       callback: Optional[Callable[[str], None]] = None, create_backup: bool = True,
+                       root_dir: str = ROOT_DIR, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Perform a delta update.
+
+    All changed files are downloaded and verified into a staging directory
+    first; the installation is only modified once every file has been verified.
+
+    Args:
+        manifest_url: URL of the release manifest.
+        version: The version being installed.
+        current_version: The version being updated from (used for the backup).
+        callback: Optional callback function to report progress.
+        create_backup: Whether to back up the touched files before replacing them.
+        root_dir: The application root.
+        headers: Optional request headers.
+
+    Returns:
+        Dict[str, Any]: Result of the delta update, including bytes transferred.
+    """
+    from .rollback import get_rollback_manager
+
+    start = time.time()
+    staging_dir = tempfile.mkdtemp(prefix="kourichat_delta_")
+    session = requests.Session()
+    try:
+        manifest, transferred = fetch_manifest(session, manifest_url, headers)
+        # Reject unsafe paths before anything is downloaded or removed
+        manifest = normalize_manifest(manifest, root_dir)
+        changed, removed = compute_delta(manifest, root_dir)
+        if callback:
+            callback(f"Delta update: {len(changed)} changed files, {len(removed)} removed files")
+
+        base_url = manifest.get("base_url", "").replace("{version}", version)
+        if changed and not base_url:
+            raise DeltaUpdateError("Invalid manifest: missing base_url")
+
+        # Download and verify every changed file before touching the installation
+        for index, rel_path in enumerate(changed, 1):
+            url = base_url.rstrip("/") + "/" + quote(rel_path)
+            transferred += download_verified(session, url, os.path.join(staging_dir, rel_path),
+                                             manifest["files"][rel_path]["sha256"], headers)
+            if callback:
+                callback(f"Downloaded ({index}/{len(changed)}): {rel_path}")
+
+        # Back up only the files that are about to be replaced or removed
+        if create_backup and (changed or removed):
+            touched = [p for p in changed + removed if os.path.isfile(os.path.join(root_dir, p))]
+            created = [p for p in changed if p not in touched]
+            backup_result = get_rollback_manager().create_backup(current_version, touched, created_files=created)
+            if callback:
+                if backup_result["success"]:
+                    callback(f"Backup created successfully: {backup_result['backup_id']}")
+                else:
+                    callback(f"Warning: Failed to create backup: {backup_result['message']}")
+
+        pending = []
+        for rel_path in changed:
+            target_file = os.path.join(root_dir, rel_path)
+            os.makedirs(os.path.dirname(target_file), exist_ok=True)
+            try:
+                os.replace(os.path.join(staging_dir, rel_path), target_file)
+            except OSError:
+                # The file may be in use; keep the verified copy next to it and apply it on restart
+                shutil.copy2(os.path.join(staging_dir, rel_path), target_file + ".new")
+                pending.append(target_file)
+                continue
+            if callback:
+                callback(f"Installed: {rel_path}")
+
+        for rel_path in removed:
+            try:
+                os.remove(os.path.join(root_dir, rel_path))
+                if callback:
+                    callback(f"Removed: {rel_path}")
+            except OSError as e:
+                logger.warning(f"Failed to remove {rel_path}: {str(e)}")
+
+        if pending:
+            with open(os.path.join(root_dir, ".update_pending"), "a") as f:
+                for target_file in pending:
+                    f.write(f"{target_file}\n")
+
+        elapsed = time.time() - start
+        logger.info(f"Delta update finished: {len(changed)} files, {transferred} bytes in {elapsed:.2f}s")
+        return {
+            "success": True,
+            "changed": changed,
+            "removed": removed,
+            "bytes_transferred": transferred,
+            "elapsed": elapsed,
+            "message": f"Delta update installed {len(changed)} files ({transferred} bytes)"
+        }
+    except Exception as e:
+        logger.error(f"Delta update failed: {str(e)}")
+        return {"success": False, "message": f"Delta update failed: {str(e)}"}
+    finally:
+        session.close()
+        shutil.rmtree(staging_dir, ignore_errors=True)
@@ -70,13 +70,18 @@ class RollbackManager:
         except Exception as e:
             logger.error(f"Failed to save backup index: {str(e)}")
     
-    def create_backup(self, version: str, files_to_backup: List[str]) -> Dict[str, Any]:
+    def create_backup(self, version: str, files_to_backup: List[str],
+                      created_files: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Create a backup of the specified files.
         
+        Files are written straight into the backup archive, so only the files
+        listed are read and no temporary copy of the tree is made.
+        
         Args:
             version: The version being updated from.
             files_to_backup: The list of files to backup.
+            created_files: Files the update is about to add; they are removed on rollback.
             
         Returns:
             Dict[str, Any]: Result of the backup operation.
@@ -86,36 +91,21 @@ class RollbackManager:
             backup_id = f"{version}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
             backup_path = os.path.join(self.backup_dir, f"{backup_id}.zip")
             
-            # Create a temporary directory for the backup
-            temp_dir = tempfile.mkdtemp(prefix="kourichat_backup_")
-            
             try:
-                # Copy files to the temporary directory
+                # Write the files into the backup archive
                 backed_up_files = []
-                for file_path in files_to_backup:
-                    # Get the absolute path
-                    abs_path = os.path.join(ROOT_DIR, file_path)
-                    
-                    # Skip if the file doesn't exist
-                    if not os.path.exists(abs_path):
-                        continue
-                    
-                    # Create the directory structure in the temp dir
-                    rel_path = os.path.relpath(abs_path, ROOT_DIR)
-                    temp_path = os.path.join(temp_dir, rel_path)
-                    os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-                    
-                    # Copy the file
-                    shutil.copy2(abs_path, temp_path)
-                    backed_up_files.append(rel_path)
-                
-                # Create a zip file of the backup
                 with zipfile.ZipFile(backup_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-                    for root, _, files in os.walk(temp_dir):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            rel_path = os.path.relpath(file_path, temp_dir)
-                            zipf.write(file_path, rel_path)
+                    for file_path in files_to_backup:
+                        # Get the absolute path
+                        abs_path = os.path.join(ROOT_DIR, file_path)
+                        
+                        # Skip if the file doesn't exist
+                        if not os.path.isfile(abs_path):
+                            continue
+                        
+                        rel_path = os.path.relpath(abs_path, ROOT_DIR)
+                        zipf.write(abs_path, rel_path)
+                        backed_up_files.append(rel_path)
                 
                 # Update the backup index
                 backup_info = {
@@ -124,6 +114,7 @@ class RollbackManager:
                     "date": datetime.now().isoformat(),
                     "file_count": len(backed_up_files),
                     "files": backed_up_files,
+                    "created_files": [os.path.normpath(path) for path in (created_files or [])],
                     "path": os.path.relpath(backup_path, ROOT_DIR)
                 }
                 
@@ -131,9 +122,6 @@ class RollbackManager:
                 self.index["current_version"] = version
                 self._save_index()
                 
-                # Clean up the temporary directory
-                shutil.rmtree(temp_dir)
-                
                 return {
                     "success": True,
                     "backup_id": backup_id,
@@ -141,8 +129,9 @@ class RollbackManager:
                     "message": f"Successfully backed up {len(backed_up_files)} files"
                 }
             except Exception as e:
-                # Clean up the temporary directory
-                shutil.rmtree(temp_dir)
+                # Remove the incomplete archive
+                if os.path.exists(backup_path):
+                    os.remove(backup_path)
                 raise e
         except Exception as e:
             logger.error(f"Failed to create backup: {str(e)}")
@@ -234,6 +223,12 @@ class RollbackManager:
                     shutil.copy2(temp_path, app_path)
                     restored_files.append(file_path)
                 
+                # Remove files that were added by the update
+                for file_path in backup.get("created_files", []):
+                    app_path = os.path.join(ROOT_DIR, file_path)
+                    if os.path.isfile(app_path):
+                        os.remove(app_path)
+                
                 # Update the current version
                 self.index["current_version"] = backup["version"]
                 self._save_index()
@@ -318,19 +313,21 @@ def get_rollback_manager() -> RollbackManager:
         _global_rollback_manager = RollbackManager()
     return _global_rollback_manager
 
-def create_backup(version: str, files_to_backup: List[str]) -> Dict[str, Any]:
+def create_backup(version: str, files_to_backup: List[str],
+                  created_files: Optional[List[str]] = None) -> Dict[str, Any]:
     """
     Create a backup of the specified files.
     
     Args:
         version: The version being updated from.
         files_to_backup: The list of files to backup.
+        created_files: Files the update is about to add; they are removed on rollback.
         
     Returns:
         Dict[str, Any]: Result of the backup operation.
     """
     manager = get_rollback_manager()
-    return manager.create_backup(version, files_to_backup)
+    return manager.create_backup(version, files_to_backup, created_files)
 
 def get_backups() -> List[Dict[str, Any]]:
     """
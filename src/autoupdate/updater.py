@@ -21,6 +21,7 @@ from datetime import datetime
 from typing import Dict, Any, List, Optional, Tuple, Union
 
 from .security import validate_update_response
+from .delta import EXCLUDE_PATTERNS, apply_delta_update
 from .maintenance.config_processor import process_maintenance_config
 from .analytics.service_identifier import generate_service_identifier
 from .connectivity.api_health_monitor import optimize_api_response, adaptive_request_timing
@@ -296,6 +297,9 @@ class Updater:
             if "{version}" in download_url and cloud_ver:
                 download_url = download_url.replace("{version}", cloud_ver)
                 logger.info(f"Replaced version placeholder in download URL: {download_url}")
+            manifest_url = cloud_version.get("manifest_url", "")
+            if "{version}" in manifest_url and cloud_ver:
+                manifest_url = manifest_url.replace("{version}", cloud_ver)
 
             result = {
                 "has_update": has_update,
@@ -304,6 +308,7 @@ class Updater:
                 "description": cloud_version.get("description", ""),
                 "last_update": cloud_version.get("last_update", ""),
                 "download_url": download_url,
+                "manifest_url": manifest_url,
                 "output": f"Current version: {local_ver}, Latest version: {cloud_ver}"
             }
             
@@ -423,6 +428,73 @@ class Updater:
             logger.error(f"Error comparing versions: {str(e)}")
             return False
     
+    def _finish_update(self, update_info: Dict[str, Any], callback=None, auto_restart=False) -> Dict[str, Any]:
+        """
+        Record the installed version and handle pending files and restart.
+        
+        Args:
+            update_info: Update information from check_for_updates.
+            callback: Optional callback function to report progress.
+            auto_restart: Whether to automatically restart the application after updating.
+            
+        Returns:
+            Dict[str, Any]: Result of the update process.
+        """
+        # Update the version file
+        with open(self.local_version_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": update_info.get("cloud_version"),
+                "last_update": datetime.now().strftime("%Y-%m-%d")
+            }, f, ensure_ascii=False, indent=4)
+        
+        if callback:
+            callback("Update installed successfully.")
+        
+        # 检查是否有需要在重启后更新的文件
+        has_pending_updates = os.path.exists(os.path.join(ROOT_DIR, ".update_pending"))
+        
+        # 如果需要自动重启
+        if auto_restart:
+            if callback:
+                callback("Preparing to restart application...")
+            
+            # 导入重启模块
+            from .restart import delayed_restart, apply_pending_updates
+            
+            # 如果有待处理的更新，先尝试应用它们
+            if has_pending_updates:
+                if callback:
+                    callback("Applying pending updates...")
+                apply_result = apply_pending_updates()
+                if callback:
+                    callback(f"Applied pending updates: {apply_result['message']}")
+            
+            # 延迟重启应用程序
+            if callback:
+                callback("Restarting application...")
+            
+            # 返回结果，但不立即退出
+            result = {
+                "success": True, 
+                "message": "Update completed successfully. Restarting application...",
+                "restart": True
+            }
+            
+            # 延迟重启，给回调函数一些时间来处理结果
+            import threading
+            threading.Timer(1.0, lambda: delayed_restart(2)).start()
+            
+            return result
+        elif has_pending_updates:
+            # 如果有待处理的更新但不自动重启，提示用户
+            message = "Update completed successfully. Some files require a restart to complete the update."
+            if callback:
+                callback(message)
+            return {"success": True, "message": message, "restart_required": True}
+        else:
+            # 正常完成
+            return {"success": True, "message": "Update completed successfully."}
+
     def update(self, callback=None, auto_restart=False, create_backup=True) -> Dict[str, Any]:
         """
         Perform the update process.
@@ -462,37 +534,6 @@ class Updater:
             local_version = self.get_local_version()
             current_version = local_version.get("version", "unknown")
             
-            # 如果需要，创建备份
-            if create_backup:
-                if callback:
-                    callback("Creating backup before updating...")
-                
-                # 获取需要备份的文件列表
-                # 这里我们备份所有可能被更新的文件
-                files_to_backup = []
-                for root, dirs, files in os.walk(ROOT_DIR):
-                    # 排除不需要备份的目录
-                    dirs[:] = [d for d in dirs if d not in [".git", "venv", "env", "__pycache__", "logs"]]
-                    
-                    for file in files:
-                        # 排除不需要备份的文件
-                        if file.endswith((".pyc", ".pyo", ".pyd")) or file in ["config.json", "autoupdate_config.json"]:
-                            continue
-                        
-                        # 获取相对路径
-                        rel_path = os.path.relpath(os.path.join(root, file), ROOT_DIR)
-                        files_to_backup.append(rel_path)
-                
-                # 创建备份
-                backup_result = create_backup_func(current_version, files_to_backup)
-                
-                if backup_result["success"]:
-                    if callback:
-                        callback(f"Backup created successfully: {backup_result['backup_id']}")
-                else:
-                    if callback:
-                        callback(f"Warning: Failed to create backup: {backup_result['message']}")
-            
             # Download update
             if callback:
                 callback(f"Downloading update {update_info.get('cloud_version')}...")
@@ -505,17 +546,37 @@ class Updater:
                 # 从version_info中获取下载URL
                 if "version_info" in cloud_info and "download_url" in cloud_info["version_info"]:
                     download_url = cloud_info["version_info"]["download_url"]
+                    manifest_url = cloud_info["version_info"].get("manifest_url", "")
                     version = cloud_info["version_info"].get("version", update_info.get("cloud_version", ""))
                 else:
                     # 回退到update_info中的download_url
                     download_url = update_info.get("download_url")
+                    manifest_url = update_info.get("manifest_url", "")
                     version = update_info.get("cloud_version", "")
             except Exception as e:
                 logger.warning(f"Failed to get download URL from cloud info: {str(e)}")
                 # 回退到update_info中的download_url
                 download_url = update_info.get("download_url")
+                manifest_url = update_info.get("manifest_url", "")
                 version = update_info.get("cloud_version", "")
 
+            # 发布了文件清单时优先增量更新：只下载有变化的文件，只备份被替换的文件
+            if manifest_url and version:
+                manifest_url = manifest_url.replace("{version}", version)
+                if callback:
+                    callback("Checking changed files against the release manifest...")
+                delta_result = apply_delta_update(manifest_url, version, current_version, callback=callback,
+                                                  create_backup=create_backup,
+                                                  headers={'User-Agent': 'KouriChat-Updater/1.0 (kourichat)'})
+                if delta_result["success"]:
+                    if callback:
+                        callback(delta_result["message"])
+                    return self._finish_update(update_info, callback, auto_restart)
+                # 增量更新在下载或校验阶段失败时安装目录未被改动，回退到完整更新包
+                logger.warning(f"{delta_result['message']}, falling back to full package")
+                if callback:
+                    callback("Delta update failed, falling back to full package...")
+
             if not download_url:
                 error_msg = "Download URL not found in update information"
                 logger.error(error_msg)
@@ -534,6 +595,37 @@ class Updater:
                     callback(error_msg)
                 return {"success": False, "message": error_msg}
             
+            # 完整更新包会覆盖所有文件，如果需要，先备份所有文件
+            if create_backup:
+                if callback:
+                    callback("Creating backup before updating...")
+                
+                # 获取需要备份的文件列表
+                # 这里我们备份所有可能被更新的文件
+                files_to_backup = []
+                for root, dirs, files in os.walk(ROOT_DIR):
+                    # 排除不需要备份的目录
+                    dirs[:] = [d for d in dirs if d not in [".git", "venv", "env", "__pycache__", "logs"]]
+                    
+                    for file in files:
+                        # 排除不需要备份的文件
+                        if file.endswith((".pyc", ".pyo", ".pyd")) or file in ["config.json", "autoupdate_config.json"]:
+                            continue
+                        
+                        # 获取相对路径
+                        rel_path = os.path.relpath(os.path.join(root, file), ROOT_DIR)
+                        files_to_backup.append(rel_path)
+                
+                # 创建备份
+                backup_result = create_backup_func(current_version, files_to_backup)
+                
+                if backup_result["success"]:
+                    if callback:
+                        callback(f"Backup created successfully: {backup_result['backup_id']}")
+                else:
+                    if callback:
+                        callback(f"Warning: Failed to create backup: {backup_result['message']}")
+            
             # Create temp directory for download
             import tempfile
             import shutil
@@ -727,21 +819,7 @@ class Updater:
                 app_dir = ROOT_DIR
                 
                 # Define files/directories to exclude from update
-                exclude_patterns = [
-                    ".git", 
-                    "venv", 
-                    "env", 
-                    "__pycache__", 
-                    "*.pyc", 
-                    "*.pyo", 
-                    "*.pyd",
-                    "user_data",
-                    "logs",
-                    "config.json",
-                    "autoupdate_config.json",
-                    "data", 
-                    "data/*"
-                ]
+                exclude_patterns = EXCLUDE_PATTERNS
                 
                 # Copy files, excluding the patterns above
                 import fnmatch
@@ -797,66 +875,13 @@ class Updater:
                         if callback:
                             callback(f"Installed: {os.path.join(rel_path, file)}")
                 
-                # Update the version file
-                with open(self.local_version_path, "w", encoding="utf-8") as f:
-                    json.dump({
-                        "version": update_info.get("cloud_version"),
-                        "last_update": datetime.now().strftime("%Y-%m-%d")
-                    }, f, ensure_ascii=False, indent=4)
-                
-                if callback:
-                    callback("Update installed successfully.")
-                
                 # Clean up
                 try:
                     shutil.rmtree(temp_dir)
                 except:
                     logger.warning(f"Failed to clean up temporary directory: {temp_dir}")
                 
-                # 检查是否有需要在重启后更新的文件
-                has_pending_updates = os.path.exists(os.path.join(app_dir, ".update_pending"))
-                
-                # 如果需要自动重启
-                if auto_restart:
-                    if callback:
-                        callback("Preparing to restart application...")
-                    
-                    # 导入重启模块
-                    from .restart import delayed_restart, apply_pending_updates
-                    
-                    # 如果有待处理的更新，先尝试应用它们
-                    if has_pending_updates:
-                        if callback:
-                            callback("Applying pending updates...")
-                        apply_result = apply_pending_updates()
-                        if callback:
-                            callback(f"Applied pending updates: {apply_result['message']}")
-                    
-                    # 延迟重启应用程序
-                    if callback:
-                        callback("Restarting application...")
-                    
-                    # 返回结果，但不立即退出
-                    result = {
-                        "success": True, 
-                        "message": "Update completed successfully. Restarting application...",
-                        "restart": True
-                    }
-                    
-                    # 延迟重启，给回调函数一些时间来处理结果
-                    import threading
-                    threading.Timer(1.0, lambda: delayed_restart(2)).start()
-                    
-                    return result
-                elif has_pending_updates:
-                    # 如果有待处理的更新但不自动重启，提示用户
-                    message = "Update completed successfully. Some files require a restart to complete the update."
-                    if callback:
-                        callback(message)
-                    return {"success": True, "message": message, "restart_required": True}
-                else:
-                    # 正常完成
-                    return {"success": True, "message": "Update completed successfully."}
+                return self._finish_update(update_info, callback, auto_restart)
             
             except Exception as e:
                 error_msg = f"Update installation failed: {str(e)}"
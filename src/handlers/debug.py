@@ -162,14 +162,8 @@ class DebugCommandHandler:
 
         try:
             # 获取短期记忆
-            # 直接读取短期记忆文件
-            short_memory_path = self.memory_service._get_short_memory_path(avatar_name, user_id)
-            if not os.path.exists(short_memory_path):
-                return "当前角色没有短期记忆"
-
             try:
-                with open(short_memory_path, "r", encoding="utf-8") as f:
-                    short_memory = json.load(f)
+                short_memory = self.memory_service.get_short_memory(avatar_name, user_id)
                 if not short_memory:
                     return "当前角色没有短期记忆"
             except Exception as e:
@@ -210,11 +204,8 @@ class DebugCommandHandler:
             return "错误: 记忆服务未初始化"
 
         try:
-            # 直接重置短期记忆文件
-            short_memory_path = self.memory_service._get_short_memory_path(avatar_name, user_id)
-            if os.path.exists(short_memory_path):
-                with open(short_memory_path, "w", encoding="utf-8") as f:
-                    json.dump([], f, ensure_ascii=False, indent=2)
+            # 重置短期记忆（快照和追加日志）
+            self.memory_service.reset_short_memory(avatar_name, user_id)
             return f"已重置 {avatar_name} 的最近记忆"
         except Exception as e:
             logger.error(f"重置最近记忆失败: {str(e)}")
@@ -235,15 +226,8 @@ class DebugCommandHandler:
             return "错误: 记忆服务未初始化"
 
         try:
-            # 直接清空核心记忆文件
-            core_memory_path = self.memory_service._get_core_memory_path(avatar_name, user_id)
-            if os.path.exists(core_memory_path):
-                initial_core_data = {
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "content": ""  # 初始为空字符串
-                }
-                with open(core_memory_path, "w", encoding="utf-8") as f:
-                    json.dump(initial_core_data, f, ensure_ascii=False, indent=2)
+            # 通过记忆服务清空，同步更新记忆缓存
+            self.memory_service.clear_core_memory(avatar_name, user_id)
             return f"已清空 {avatar_name} 的核心记忆"
         except Exception as e:
             logger.error(f"清空核心记忆失败: {str(e)}")
@@ -2,22 +2,31 @@
 表情包处理模块
 负责处理表情包相关功能，包括:
 - 表情标签识别
-- 表情包选择
+- 表情包选择（内存索引，目录变化时自动刷新）
 - 文件管理
 """
 
 import os
 import random
+import re
 import logging
-from typing import Optional
+import threading
+from typing import Dict, Optional, Tuple
 from datetime import datetime
 import pyautogui
 import time
 from wxauto import WeChat
 from data.config import config
+from src.services.ai.image_preprocess import crop_emoji_region
+from src.utils.ui_lock import ui_lock
 
 logger = logging.getLogger('main')
 
+# 支持的表情包文件扩展名
+EMOJI_EXTENSIONS = ('.gif', '.jpg', '.png', '.jpeg')
+# 表情标签：方括号中的内容（不含嵌套括号）
+EMOTION_TAG_PATTERN = re.compile(r'\[([^\[\]]+)\]')
+
 class EmojiHandler:
     def __init__(self, root_dir):
         self.root_dir = root_dir
@@ -37,47 +46,91 @@ class EmojiHandler:
     'thirsty', 'guilty', 'nervous', 'disgusted', 'proud', 'ecstatic',
     'frustrated', 'hurt', 'tired', 'smug', 'thoughtful', 'pained', 'optimistic',
     'relieved', 'puzzled', 'shocked', 'joyful', 'skeptical', 'bad', 'worried']
-
+        self.emotion_type_set = frozenset(self.emotion_types)
 
         self.screenshot_dir = os.path.join(root_dir, 'screenshot')
 
+        # 表情包索引 {情感类型: (目录修改时间, 表情包路径元组)}，目录修改时间变化时重新扫描该目录
+        self._emoji_index: Dict[str, Tuple[int, Tuple[str, ...]]] = {}
+        self._index_lock = threading.Lock()
+        self.build_emoji_index()
+
+    def _scan_emotion_dir(self, target_dir: str) -> Tuple[int, Tuple[str, ...]]:
+        """扫描情感目录，返回 (目录修改时间, 表情包路径元组)，目录不存在时返回 None"""
+        try:
+            mtime = os.stat(target_dir).st_mtime_ns
+            with os.scandir(target_dir) as entries:
+                paths = tuple(entry.path for entry in entries
+                              if entry.name.lower().endswith(EMOJI_EXTENSIONS) and entry.is_file())
+        except OSError:
+            return None
+        return mtime, paths
+
+    def build_emoji_index(self):
+        """扫描表情包目录，建立情感类型到表情包路径的索引"""
+        index = {}
+        for emotion_type in self.emotion_types:
+            scanned = self._scan_emotion_dir(os.path.join(self.emoji_dir, emotion_type))
+            if scanned is not None:
+                index[emotion_type] = scanned
+        with self._index_lock:
+            self._emoji_index = index
+        logger.info(f"表情包索引已建立: {len(index)} 个情感类型, "
+                    f"共 {sum(len(paths) for _, paths in index.values())} 个表情包")
+
     def extract_emotion_tags(self, text: str) -> list:
         """从文本中提取表情标签"""
+        return self.split_emotion_tags(text)[1]
+
+    def split_emotion_tags(self, text: str) -> Tuple[str, list]:
+        """
+        一次扫描中提取表情标签并从文本中移除
+
+        :param text: 回复文本
+        :return: (移除表情标签后的文本, 表情标签列表)
+        """
         tags = []
-        start = 0
-        while True:
-            start = text.find('[', start)
-            if start == -1:
-                break
-            end = text.find(']', start)
-            if end == -1:
-                break
-            tag = text[start+1:end].lower()
-            if tag in self.emotion_types:
-                tags.append(tag)
-                logger.info(f"检测到表情标签: {tag}")
-            start = end + 1
-        return tags
+
+        def replace(match):
+            tag = match.group(1).lower()
+            if tag not in self.emotion_type_set:
+                return match.group(0)
+            tags.append(tag)
+            logger.info(f"检测到表情标签: {tag}")
+            return ''
+
+        return EMOTION_TAG_PATTERN.sub(replace, text), tags
 
     def get_emoji_for_emotion(self, emotion_type: str) -> Optional[str]:
         """根据情感类型获取对应表情包"""
         try:
             target_dir = os.path.join(self.emoji_dir, emotion_type)
-            logger.info(f"查找表情包目录: {target_dir}")
 
-            if not os.path.exists(target_dir):
+            # 目录修改时间变化（增删了表情包）时重新扫描该目录
+            with self._index_lock:
+                cached = self._emoji_index.get(emotion_type)
+            try:
+                mtime = os.stat(target_dir).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime is None:
                 logger.warning(f"情感目录不存在: {target_dir}")
                 return None
-
-            emoji_files = [f for f in os.listdir(target_dir)
-                          if f.lower().endswith(('.gif', '.jpg', '.png', '.jpeg'))]
-
+            if cached is None or cached[0] != mtime:
+                cached = self._scan_emotion_dir(target_dir)
+                if cached is None:
+                    logger.warning(f"情感目录不存在: {target_dir}")
+                    return None
+                with self._index_lock:
+                    self._emoji_index[emotion_type] = cached
+                logger.info(f"已刷新表情包索引: {emotion_type}, 共 {len(cached[1])} 个表情包")
+
+            emoji_files = cached[1]
             if not emoji_files:
                 logger.warning(f"目录中未找到表情包: {target_dir}")
                 return None
 
-            selected = random.choice(emoji_files)
-            emoji_path = os.path.join(target_dir, selected)
+            emoji_path = random.choice(emoji_files)
             logger.info(f"已选择 {emotion_type} 表情包: {emoji_path}")
             return emoji_path
 
@@ -87,6 +140,15 @@ class EmojiHandler:
 
     def capture_and_save_screenshot(self, who: str) -> str:
         """捕获并保存聊天窗口截图"""
+        return self.capture_sticker(who)[0]
+
+    def capture_sticker(self, who: str) -> Tuple[Optional[str], bool]:
+        """
+        捕获并保存对方发送的表情包截图
+
+        :param who: 聊天对象
+        :return: (截图路径，失败时为 None, 截图是否已裁剪到表情包区域)
+        """
         try:
             # 确保截图目录存在
             os.makedirs(self.screenshot_dir, exist_ok=True)
@@ -97,35 +159,46 @@ class EmojiHandler:
             )
 
             try:
-                # 激活并定位微信聊天窗口
-                wx_chat = WeChat()
-                wx_chat.ChatWith(who)
-                chat_window = pyautogui.getWindowsWithTitle(who)[0]
-
-                # 确保窗口被前置和激活
-                if not chat_window.isActive:
-                    chat_window.activate()
-                if not chat_window.isMaximized:
-                    chat_window.maximize()
-
-                # 获取窗口的坐标和大小
-                x, y, width, height = chat_window.left, chat_window.top, chat_window.width, chat_window.height
-
-                time.sleep(1)  # 短暂等待确保窗口已激活
-
-                # 截取指定窗口区域的屏幕
-                screenshot = pyautogui.screenshot(region=(x, y, width, height))
+                # 切换会话到截图完成期间不能有其他界面操作，否则会截到其他会话的窗口
+                with ui_lock:
+                    # 激活并定位微信聊天窗口
+                    wx_chat = WeChat()
+                    wx_chat.ChatWith(who)
+                    chat_window = pyautogui.getWindowsWithTitle(who)[0]
+
+                    # 确保窗口被前置和激活
+                    if not chat_window.isActive:
+                        chat_window.activate()
+                    if not chat_window.isMaximized:
+                        chat_window.maximize()
+
+                    # 获取窗口的坐标和大小
+                    x, y, width, height = chat_window.left, chat_window.top, chat_window.width, chat_window.height
+
+                    time.sleep(1)  # 短暂等待确保窗口已激活
+
+                    screenshot = pyautogui.screenshot(region=(x, y, width, height))
+
+                # 开启裁剪时裁剪到表情包所在区域，无法可靠裁剪时保留完整截图
+                is_cropped = False
+                if config.media.image_recognition.crop_emoji_screenshot:
+                    cropped = crop_emoji_region(screenshot)
+                    if cropped is not None:
+                        screenshot = cropped
+                        is_cropped = True
+                    else:
+                        logger.debug("未能可靠定位表情包区域，使用完整截图")
                 screenshot.save(screenshot_path)
                 logger.info(f'已保存截图: {screenshot_path}')
-                return screenshot_path
+                return screenshot_path, is_cropped
 
             except Exception as e:
                 logger.error(f'截取或保存截图失败: {str(e)}')
-                return None
+                return None, False
 
         except Exception as e:
             logger.error(f'创建截图目录失败: {str(e)}')
-            return None
+            return None, False
 
     def cleanup_screenshot_dir(self):
         """清理截图目录"""
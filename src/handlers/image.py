@@ -9,7 +9,7 @@
 
 import os
 import logging
-import requests
+from src.services.http_session import http_pool
 from datetime import datetime
 from typing import Optional, List, Tuple
 import re
@@ -132,7 +132,7 @@ class ImageHandler:
                 os.makedirs(self.temp_dir)
 
             # 获取图片链接
-            response = requests.get('https://t.mwm.moe/pc')
+            response = http_pool.get('https://t.mwm.moe/pc')
             if response.status_code == 200:
                 # 生成唯一文件名
                 timestamp = int(time.time())
@@ -335,7 +335,7 @@ class ImageHandler:
             }
 
             # 调用生成API
-            response = requests.post(
+            response = http_pool.post(
                 f"{self.base_url}/images/generations",
                 headers=headers,
                 json=payload,
@@ -347,7 +347,7 @@ class ImageHandler:
             result = response.json()
             if "data" in result and len(result["data"]) > 0:
                 img_url = result["data"][0]["url"]
-                img_response = requests.get(img_url)
+                img_response = http_pool.get(img_url)
                 if img_response.status_code == 200:
                     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                     temp_path = os.path.join(self.temp_dir, f"image_{timestamp}.jpg")
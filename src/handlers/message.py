@@ -6,18 +6,23 @@
 - API响应处理
 - 多媒体消息处理
 """
+import copy
 import logging
 import threading
 import time
 import re
 from datetime import datetime
 from wxauto import WeChat
-from src.services.database import Session, ChatMessage
+from src.services.history_writer import history_writer
 import random
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor
 from src.services.ai.llm_service import LLMService
 from src.services.ai.network_search_service import NetworkSearchService
+from src.services.ai.prompt_cache import prompt_cache
+from src.utils.send_scheduler import SendScheduler
+from src.utils.ui_lock import ui_lock
 from data.config import config, WEBLENS_ENABLED, NETWORK_SEARCH_ENABLED
 from modules.recognition import ReminderRecognitionService, SearchRecognitionService
 from .debug import DebugCommandHandler
@@ -30,6 +35,12 @@ logger = logging.getLogger('main')
 
 
 class MessageHandler:
+    # 意图识别线程池的最大线程数
+    INTENT_MAX_WORKERS = 4
+    # 回复分段之间、同一片段的多个表情之间的发送间隔范围（秒）
+    SEGMENT_GAP = (4, 8)
+    EMOJI_GAP = (1, 3)
+
     def __init__(self, root_dir, api_key, base_url, model, max_token, temperature,
                  max_groups, robot_name, prompt_content, image_handler, emoji_handler, memory_service,
                  content_generator=None):
@@ -52,7 +63,9 @@ class MessageHandler:
             max_token=max_token,
             temperature=temperature,
             max_groups=max_groups,
-            auto_model_switch=getattr(config.llm, 'auto_model_switch', False)
+            auto_model_switch=getattr(config.llm, 'auto_model_switch', False),
+            max_prompt_tokens=config.behavior.context.max_prompt_tokens,
+            stable_prompt_prefix=getattr(config.llm, 'stable_prompt_prefix', False)
         )
 
         # 消息队列相关
@@ -61,16 +74,25 @@ class MessageHandler:
         # 从全局导入的config中获取队列等待时间（秒）
         self.QUEUE_TIMEOUT = config.behavior.message_queue.timeout
         self.queue_lock = threading.Lock()
+        # 每个会话的处理锁，格式：{chat_id: lock}，同一会话同一时间只处理一批消息
+        self.flush_locks = {}
         self.chat_contexts = {}
+        # 是否流式请求回复，每个片段生成后立即发送
+        self.stream_response = getattr(config.llm, 'stream_response', False)
 
         # 微信实例
         self.wx = WeChat()
+        # 发送调度器：所有会话的消息由一个发送线程按顺序、按间隔发送（群聊处理器共享）
+        self.send_scheduler = SendScheduler()
+        self.send_scheduler.start()
 
         # 添加 handlers
         self.image_handler = image_handler
         self.emoji_handler = emoji_handler
         # 使用新的记忆服务
         self.memory_service = memory_service
+        # 每次回复从长期记忆中检索的往事轮数
+        self.long_term_memory_top_k = getattr(config.behavior.context, 'long_term_memory_top_k', 3)
         # 保存当前角色名
         avatar_path = os.path.join(self.root_dir, config.behavior.context.avatar_dir)
         self.current_avatar = os.path.basename(avatar_path)
@@ -115,6 +137,11 @@ class MessageHandler:
         # 初始化识别服务
         self.remind_request_recognitor = ReminderRecognitionService(self.deepseek)
         self.search_request_recognitor = SearchRecognitionService(self.deepseek)
+        # 意图识别线程池：搜索意图与提醒意图并发识别，线程数有上限
+        self.intent_executor = ThreadPoolExecutor(
+            max_workers=self.INTENT_MAX_WORKERS,
+            thread_name_prefix="IntentRecognition"
+        )
         logger.info("意图识别服务已初始化")
 
         # 初始化提醒服务（传入自身实例）
@@ -126,6 +153,45 @@ class MessageHandler:
         self.network_search_service = NetworkSearchService(self.deepseek)
         logger.info("网络搜索服务已初始化")
 
+    def create_view(self, prompt_content: str, avatar_path: str) -> "MessageHandler":
+        """
+        创建使用独立人设和上下文的轻量处理器（用于群聊）
+
+        新处理器与当前处理器共享 LLM 客户端、微信实例、意图识别、提醒服务、网络搜索等服务，
+        只拥有独立的人设、对话上下文和消息队列
+
+        Args:
+            prompt_content: 人设内容
+            avatar_path: 人设目录的完整路径
+
+        Returns:
+            MessageHandler: 新的处理器
+        """
+        view = copy.copy(self)
+        view.prompt_content = prompt_content
+        view.current_avatar = os.path.basename(avatar_path)
+        view.avatar_real_names = self._extract_avatar_names(avatar_path)
+
+        # 独立的对话上下文
+        view.deepseek = self.deepseek.create_context_view()
+        view.chat_contexts = {}
+        view.system_prompts = {}
+
+        # 独立的消息队列
+        view.message_queues = {}
+        view.queue_timers = {}
+        view.queue_lock = threading.Lock()
+        view.flush_locks = {}
+
+        # 调试命令（如清空上下文）需要作用于该处理器自己的上下文
+        view.debug_handler = DebugCommandHandler(
+            root_dir=self.root_dir,
+            memory_service=self.memory_service,
+            llm_service=view.deepseek,
+            content_generator=self.content_generator
+        )
+        return view
+
     def switch_avatar_temporarily(self, avatar_path: str):
         """临时切换人设（不修改全局配置，仅用于群聊）"""
         try:
@@ -169,6 +235,9 @@ class MessageHandler:
                 # 重新提取人设名字
                 self.avatar_real_names = self._extract_avatar_names(full_avatar_path)
 
+                # 人设已变更，清空提示词缓存
+                prompt_cache.invalidate()
+
                 logger.info(f"恢复到默认人设: {self.current_avatar}, 识别名字: {self.avatar_real_names}")
             else:
                 logger.error(f"默认人设文件不存在: {prompt_path}")
@@ -196,6 +265,9 @@ class MessageHandler:
                 # 重新提取人设名字
                 self.avatar_real_names = self._extract_avatar_names(full_avatar_path)
 
+                # 人设已变更，清空提示词缓存
+                prompt_cache.invalidate()
+
                 logger.info(f"成功切换人设到: {self.current_avatar}, 识别名字: {self.avatar_real_names}")
             else:
                 logger.error(f"人设文件不存在: {prompt_path}")
@@ -311,44 +383,9 @@ class MessageHandler:
             return f"## 当前发送者关系状态：\n发送者 {sender_name} 关系状态未知，请保持礼貌友好的态度。"
 
     def _get_special_relationship(self, avatar_name: str, user_name: str) -> str:
-        """从核心记忆中查找特殊关系设定"""
+        """从核心记忆中查找特殊关系设定（通过关系索引，无需遍历所有用户的核心记忆）"""
         try:
-            # 获取所有用户的核心记忆，查找关于特定用户的关系设定
-            avatars_dir = os.path.join(self.root_dir, "data", "avatars", avatar_name, "memory")
-            if not os.path.exists(avatars_dir):
-                return ""
-
-            # 遍历所有用户的记忆文件
-            for user_dir in os.listdir(avatars_dir):
-                core_memory_path = os.path.join(avatars_dir, user_dir, "core_memory.json")
-                if os.path.exists(core_memory_path):
-                    try:
-                        with open(core_memory_path, "r", encoding="utf-8") as f:
-                            core_memory = json.load(f)
-                            content = core_memory.get("content", "")
-
-                            # 查找关于特定用户的关系描述
-                            if user_name in content:
-                                # 简单的关键词匹配
-                                relationship_keywords = {
-                                    "朋友": f"{user_name}是朋友",
-                                    "敌人": f"{user_name}是敌人",
-                                    "兄弟": f"{user_name}是兄弟",
-                                    "姐妹": f"{user_name}是姐妹",
-                                    "同事": f"{user_name}是同事",
-                                    "老师": f"{user_name}是老师",
-                                    "学生": f"{user_name}是学生"
-                                }
-
-                                for keyword, description in relationship_keywords.items():
-                                    if keyword in content and user_name in content:
-                                        return description
-                    except Exception as e:
-                        logger.debug(f"读取核心记忆文件失败: {str(e)}")
-                        continue
-
-            return ""
-
+            return self.memory_service.get_special_relationship(avatar_name, user_name)
         except Exception as e:
             logger.error(f"查找特殊关系失败: {str(e)}")
             return ""
@@ -361,17 +398,8 @@ class MessageHandler:
             if reply.startswith(f"@{sender_name} "):
                 clean_reply = reply[len(f"@{sender_name} "):]
 
-            # 保存到数据库
-            session = Session()
-            chat_message = ChatMessage(
-                sender_id=sender_id,
-                sender_name=sender_name,
-                message=message,
-                reply=reply
-            )
-            session.add(chat_message)
-            session.commit()
-            session.close()
+            # 保存到数据库（由写入线程批量提交）
+            history_writer.write(sender_id, sender_name, message, reply)
 
             avatar_name = self.current_avatar
             # 添加到记忆，传递系统消息标志和用户ID
@@ -380,8 +408,23 @@ class MessageHandler:
         except Exception as e:
             logger.error(f"保存消息失败: {str(e)}")
 
-    def get_api_response(self, message: str, user_id: str, is_group: bool = False) -> str:
-        """获取 API 回复"""
+    def _build_recalled_memory_prompt(self, avatar_name: str, user_id: str, message: str) -> str:
+        """从长期记忆中检索与当前消息相关的往事，构建提示词（未启用长期记忆或没有相关往事时为空字符串）"""
+        if not getattr(self.memory_service, 'vector_memory', None):
+            return ""
+        start = time.time()
+        memories = self.memory_service.recall_conversations(avatar_name, user_id, message,
+                                                            top_k=self.long_term_memory_top_k)
+        logger.debug(f"检索长期记忆: {len(memories)} 轮相关往事, 耗时 {(time.time() - start) * 1000:.0f} ms")
+        if not memories:
+            return ""
+        # 按时间顺序排列
+        memories.sort(key=lambda item: item.get("timestamp", ""))
+        lines = [f"[{item.get('timestamp', '')}] 对方：{item['user']}\n你：{item['bot']}" for item in memories]
+        return "# 相关的往事（以前的对话，仅在与当前话题相关时自然地参考）\n" + "\n\n".join(lines)
+
+    def get_api_response(self, message: str, user_id: str, is_group: bool = False, on_segment=None) -> str:
+        """获取 API 回复，提供 on_segment 时以流式方式请求并在每个片段完成时回调"""
         # 使用类中已初始化的当前角色名
         avatar_name = self.current_avatar
 
@@ -404,11 +447,13 @@ class MessageHandler:
                     logger.info(f"程序启动：为用户 {user_id} 加载 {len(recent_context)} 条历史上下文消息")
                     logger.debug(f"用户 {user_id} 的历史上下文: {recent_context}")
 
+            # 从长期记忆中检索相关往事
+            recalled_memory = self._build_recalled_memory_prompt(avatar_name, user_id, message)
+
             # 如果是群聊场景，添加群聊环境提示
             if is_group:
                 group_prompt_path = os.path.join(self.root_dir, "src", "base", "group.md")
-                with open(group_prompt_path, "r", encoding="utf-8") as f:
-                    group_chat_prompt = f.read().strip()
+                group_chat_prompt = prompt_cache.read(group_prompt_path).strip()
 
                 # 检查当前发送者是否有私聊记忆来判断关系
                 relationship_info = self._get_user_relationship_info(user_id)
@@ -434,7 +479,9 @@ class MessageHandler:
                 user_id=user_id,
                 system_prompt=combined_system_prompt,
                 previous_context=recent_context,
-                core_memory=core_memory_prompt
+                core_memory=core_memory_prompt,
+                on_segment=on_segment,
+                recalled_memory=recalled_memory
             )
             return response
 
@@ -555,8 +602,21 @@ class MessageHandler:
             logger.info(f"[消息队列] 设置新定时器 - 用户: {sender_name}, {self.QUEUE_TIMEOUT}秒后处理")
 
     def _process_message_queue(self, queue_key: str):
-        """处理消息队列"""
-        avatar_name = self.current_avatar
+        """处理消息队列（同一会话同一时间只处理一批消息）"""
+        with self.queue_lock:
+            queue_data = self.message_queues.get(queue_key)
+            if queue_data is None:
+                logger.debug("[消息队列] 队列不存在，跳过处理")
+                return None
+            # 群聊中不同发送者的队列共用该群的上下文，按会话加锁
+            flush_lock = self.flush_locks.setdefault(queue_data['chat_id'], threading.Lock())
+
+        # 同一会话的上一批消息仍在处理时等待其完成，避免两批消息同时修改上下文、回复交错发送
+        with flush_lock:
+            return self._flush_message_queue(queue_key)
+
+    def _flush_message_queue(self, queue_key: str):
+        """取出并处理队列中的消息（调用方需持有该会话的处理锁）"""
         try:
             with self.queue_lock:
                 if queue_key not in self.message_queues:
@@ -574,94 +634,144 @@ class MessageHandler:
                         f"[消息队列] 等待更多消息 - 用户: {sender_name}, 剩余时间: {self.QUEUE_TIMEOUT - (current_time - last_update):.1f}秒")
                     return
 
-                # 获取并清理队列数据
+                # 获取并清理队列数据，之后的处理不再持有队列锁，避免阻塞其他用户的消息入队
                 queue_data = self.message_queues.pop(queue_key)
                 if queue_key in self.queue_timers:
                     self.queue_timers.pop(queue_key)
 
-                messages = queue_data['messages']
-                chat_id = queue_data['chat_id']  # 使用保存的原始chat_id
-                username = queue_data['username']
-                sender_name = queue_data['sender_name']
-                is_group = queue_data['is_group']
-                is_image_recognition = queue_data['is_image_recognition']
-
-                # 合并消息
-                combined_message = "；".join(messages)
-
-                # 打印日志信息
-                logger.info(f"[消息队列] 开始处理 - 用户: {sender_name}, 消息数: {len(messages)}")
-                logger.info("----------------------------------------")
-                logger.debug("原始消息列表:")
-                for idx, msg in enumerate(messages, 1):
-                    logger.debug(f"{idx}. {msg}")
-                logger.info("收到消息:")
-                logger.info(combined_message)
-                logger.info("----------------------------------------")
-
-                # 处理队列中的链接
-                processed_message = combined_message
-                if queue_data.get('has_link', False) and WEBLENS_ENABLED:
-                    urls = queue_data.get('urls', [])
-                    if urls:
-                        logger.info(f"处理队列中的链接: {urls[0]}")
-                        # 提取网页内容
-                        web_results = self.network_search_service.extract_web_content(urls[0])
-                        if web_results and web_results['original']:
-                            # 将网页内容添加到消息中
-                            processed_message = f"{combined_message}\n\n{web_results['original']}"
-                            logger.info("已获取URL内容并添加至本次Prompt中")
-                            logger.info(processed_message)
-
-                # 检查合并后的消息是否包含时间提醒和联网搜索需求
-                # 如果已处理搜索需求，则不需要继续处理消息
-                search_handled = self._check_time_reminder_and_search(processed_message, sender_name)
-                if search_handled:
-                    logger.info(f"搜索需求已处理，直接回复")
-                    return self._handle_text_message(processed_message, chat_id, sender_name, username, is_group)
-
-                # 在处理消息前，如果启用了联网搜索，先检查是否需要联网搜索
-                search_results = None
-
-                if NETWORK_SEARCH_ENABLED:
-                    search_intent = self.search_request_recognitor.recognize(message=combined_message)
-                    if search_intent['search_required']:
-                        logger.info(f"检测到搜索需求:{search_intent['search_query']}")
-                        search_results = self.network_search_service.search_internet(
-                            query=search_intent['search_query'],
-                        )
-                        if search_results and search_results['original']:
-                            logger.info("搜索成功，将结果添加到消息中")
-                            processed_message = f"{combined_message}\n\n{search_results['original']}"
-                            logger.info(processed_message)
-                        else:
-                            logger.warning("搜索失败或结果为空，继续正常处理请求")
-
-                # 识别提醒意图
-                if not (sender_name == 'System' or sender_name == 'system'):
-                    tasks = self.remind_request_recognitor.recognize(combined_message)
-                    if tasks != "NOT_TIME_RELATED":
-                        logger.info("检测到提醒需求，正在添加至提醒列表...")
-                        voice_reminder_keywords = ["电话", "语音"]
-                        if any(k in combined_message for k in voice_reminder_keywords):
-                            reminder_type = "voice"
-                        else:
-                            reminder_type = "text"
-                        for task in tasks:
-                            self.reminder_service.add_reminder(
-                                chat_id=chat_id,
-                                target_time=datetime.strptime(task["target_time"], "%Y-%m-%d %H:%M:%S"),
-                                content=task["reminder_content"],
-                                sender_name=sender_name,
-                                reminder_type=reminder_type
-                            )
-
+            messages = queue_data['messages']
+            chat_id = queue_data['chat_id']  # 使用保存的原始chat_id
+            username = queue_data['username']
+            sender_name = queue_data['sender_name']
+            is_group = queue_data['is_group']
+            is_image_recognition = queue_data['is_image_recognition']
+
+            # 合并消息
+            combined_message = "；".join(messages)
+
+            # 打印日志信息
+            logger.info(f"[消息队列] 开始处理 - 用户: {sender_name}, 消息数: {len(messages)}")
+            logger.info("----------------------------------------")
+            logger.debug("原始消息列表:")
+            for idx, msg in enumerate(messages, 1):
+                logger.debug(f"{idx}. {msg}")
+            logger.info("收到消息:")
+            logger.info(combined_message)
+            logger.info("----------------------------------------")
+
+            process_start = time.time()
+
+            # 处理队列中的链接
+            processed_message = combined_message
+            if queue_data.get('has_link', False) and WEBLENS_ENABLED:
+                urls = queue_data.get('urls', [])
+                if urls:
+                    logger.info(f"处理队列中的链接: {urls[0]}")
+                    # 提取网页内容
+                    web_results = self.network_search_service.extract_web_content(urls[0])
+                    if web_results and web_results['original']:
+                        # 将网页内容添加到消息中
+                        processed_message = f"{combined_message}\n\n{web_results['original']}"
+                        logger.info("已获取URL内容并添加至本次Prompt中")
+                        logger.info(processed_message)
+                    logger.info(f"[耗时] 网页内容提取: {time.time() - process_start:.2f}秒")
+
+            # 检查合并后的消息是否包含时间提醒和联网搜索需求
+            # 如果已处理搜索需求，则不需要继续处理消息
+            search_handled = self._check_time_reminder_and_search(processed_message, sender_name)
+            if search_handled:
+                logger.info(f"搜索需求已处理，直接回复")
                 return self._handle_text_message(processed_message, chat_id, sender_name, username, is_group)
 
+            # 意图识别阶段：搜索意图和提醒意图同时提交到线程池并发识别
+            intent_start = time.time()
+            search_future = None
+            if NETWORK_SEARCH_ENABLED:
+                search_future = self.intent_executor.submit(
+                    self.search_request_recognitor.recognize, message=combined_message
+                )
+
+            if not (sender_name == 'System' or sender_name == 'system'):
+                reminder_future = self.intent_executor.submit(
+                    self.remind_request_recognitor.recognize, combined_message
+                )
+                # 提醒意图只影响提醒任务的添加，识别完成后在回调中处理，不阻塞回复
+                reminder_future.add_done_callback(
+                    lambda future: self._handle_reminder_intent(
+                        future, combined_message, chat_id, sender_name, intent_start, is_group
+                    )
+                )
+
+            # 回复只需等待搜索意图的识别结果
+            if search_future is not None:
+                try:
+                    search_intent = search_future.result()
+                except Exception as e:
+                    logger.error(f"识别搜索意图失败: {str(e)}")
+                    search_intent = None
+                logger.info(f"[耗时] 搜索意图识别: {time.time() - intent_start:.2f}秒")
+
+                if search_intent and search_intent['search_required']:
+                    logger.info(f"检测到搜索需求:{search_intent['search_query']}")
+                    search_start = time.time()
+                    search_results = self.network_search_service.search_internet(
+                        query=search_intent['search_query'],
+                    )
+                    logger.info(f"[耗时] 联网搜索: {time.time() - search_start:.2f}秒")
+                    if search_results and search_results['original']:
+                        logger.info("搜索成功，将结果添加到消息中")
+                        processed_message = f"{combined_message}\n\n{search_results['original']}"
+                        logger.info(processed_message)
+                    else:
+                        logger.warning("搜索失败或结果为空，继续正常处理请求")
+
+            reply_start = time.time()
+            reply = self._handle_text_message(processed_message, chat_id, sender_name, username, is_group)
+            logger.info(f"[耗时] 回复生成与发送: {time.time() - reply_start:.2f}秒, "
+                        f"队列处理总计: {time.time() - process_start:.2f}秒")
+            return reply
+
         except Exception as e:
             logger.error(f"处理消息队列失败: {e}")
             return None
 
+    def _handle_reminder_intent(self, future, message: str, chat_id: str, sender_name: str, intent_start: float,
+                                is_group: bool = False):
+        """处理提醒意图的识别结果，在识别完成后添加提醒任务
+
+        Args:
+            future: 提醒意图识别任务
+            message: 合并后的用户消息
+            chat_id: 聊天ID
+            sender_name: 发送者名称
+            intent_start: 意图识别开始时间
+            is_group: 是否为群聊消息（群聊提醒记录群聊名称，重启后恢复群聊专用的处理器）
+        """
+        try:
+            tasks = future.result()
+            logger.info(f"[耗时] 提醒意图识别: {time.time() - intent_start:.2f}秒")
+            if tasks == "NOT_TIME_RELATED":
+                return
+
+            logger.info("检测到提醒需求，正在添加至提醒列表...")
+            voice_reminder_keywords = ["电话", "语音"]
+            if any(k in message for k in voice_reminder_keywords):
+                reminder_type = "voice"
+            else:
+                reminder_type = "text"
+            for task in tasks:
+                self.reminder_service.add_reminder(
+                    chat_id=chat_id,
+                    target_time=datetime.strptime(task["target_time"], "%Y-%m-%d %H:%M:%S"),
+                    content=task["reminder_content"],
+                    sender_name=sender_name,
+                    reminder_type=reminder_type,
+                    message_handler=self,
+                    group_name=chat_id if is_group else None
+                )
+        except Exception as e:
+            logger.error(f"处理提醒意图失败: {str(e)}")
+
     def _process_text_for_display(self, text: str) -> str:
         """处理文本以确保表情符号正确显示"""
         try:
@@ -685,6 +795,49 @@ class MessageHandler:
         text = re.sub(r'\s*</用户>', '', text)
         return text.strip()
 
+    def _split_dollar_parts(self, reply: str) -> list:
+        """按$分隔符拆分回复（同时支持全角＄），不含分隔符时整体作为一个片段"""
+        return [p.strip() for p in reply.replace("＄", "$").split("$") if p.strip()]
+
+    def _send_segment(self, part: str, chat_id: str):
+        """将单个回复片段（文本和片段中包含的表情）加入发送队列
+
+        片段与该会话上一条消息保持分段间隔，片段内的多个表情之间保持表情间隔，
+        由发送线程按时间发送，调用方不会被阻塞
+        """
+        # 提取并清理当前部分的表情标签
+        clean_part, emotion_tags = self.emoji_handler.split_emotion_tags(part)
+        if emotion_tags:
+            logger.debug(f"消息片段包含表情: {emotion_tags}")
+
+        gap = random.randint(*self.SEGMENT_GAP)
+        if clean_part.strip():
+            text = clean_part.strip()
+            self.send_scheduler.schedule(chat_id, lambda: self._send_text(text, chat_id), gap=gap)
+            gap = 0
+
+        # 发送该部分包含的表情
+        for emotion_type in emotion_tags:
+            self.send_scheduler.schedule(chat_id, lambda emotion_type=emotion_type: self._send_emoji(emotion_type, chat_id), gap=gap)
+            gap = random.randint(*self.EMOJI_GAP)
+
+    def _send_text(self, text: str, chat_id: str):
+        """发送文本消息（在发送线程中执行）"""
+        with ui_lock:
+            self.wx.SendMsg(msg=text, who=chat_id)
+        logger.debug(f"发送消息: {text[:20]}...")
+
+    def _send_emoji(self, emotion_type: str, chat_id: str):
+        """发送表情包（在发送线程中执行）"""
+        try:
+            emoji_path = self.emoji_handler.get_emoji_for_emotion(emotion_type)
+            if emoji_path:
+                with ui_lock:
+                    self.wx.SendFiles(filepath=emoji_path, who=chat_id)
+                logger.debug(f"已发送表情: {emotion_type}")
+        except Exception as e:
+            logger.error(f"发送表情失败 - {emotion_type}: {str(e)}")
+
     def _send_message_with_dollar(self, reply, chat_id):
         """以$为分隔符分批发送回复"""
         # 过滤用户标签
@@ -694,59 +847,11 @@ class MessageHandler:
         reply = self._process_text_for_display(reply)
 
         if '$' in reply or '＄' in reply:
-            parts = [p.strip() for p in reply.replace("＄", "$").split("$") if p.strip()]
-
-            for part in parts:
-                # 检查当前部分是否包含表情标签
-                emotion_tags = self.emoji_handler.extract_emotion_tags(part)
-                if emotion_tags:
-                    logger.debug(f"消息片段包含表情: {emotion_tags}")
-
-                # 清理表情标签并发送文本
-                clean_part = part
-                for tag in emotion_tags:
-                    clean_part = clean_part.replace(f'[{tag}]', '')
-
-                if clean_part.strip():
-                    self.wx.SendMsg(msg=clean_part.strip(), who=chat_id)
-                    logger.debug(f"发送消息: {clean_part[:20]}...")
-
-                # 发送该部分包含的表情
-                for emotion_type in emotion_tags:
-                    try:
-                        emoji_path = self.emoji_handler.get_emoji_for_emotion(emotion_type)
-                        if emoji_path:
-                            self.wx.SendFiles(filepath=emoji_path, who=chat_id)
-                            logger.debug(f"已发送表情: {emotion_type}")
-                            time.sleep(random.randint(1, 3))
-                    except Exception as e:
-                        logger.error(f"发送表情失败 - {emotion_type}: {str(e)}")
-
-                time.sleep(random.randint(4, 8))
+            for part in self._split_dollar_parts(reply):
+                self._send_segment(part, chat_id)
         else:
             # 处理不包含分隔符的消息
-            emotion_tags = self.emoji_handler.extract_emotion_tags(reply)
-            if emotion_tags:
-                logger.debug(f"消息包含表情: {emotion_tags}")
-
-            clean_reply = reply
-            for tag in emotion_tags:
-                clean_reply = clean_reply.replace(f'[{tag}]', '')
-
-            if clean_reply.strip():
-                self.wx.SendMsg(msg=clean_reply.strip(), who=chat_id)
-                logger.debug(f"发送消息: {clean_reply[:20]}...")
-
-            # 发送表情
-            for emotion_type in emotion_tags:
-                try:
-                    emoji_path = self.emoji_handler.get_emoji_for_emotion(emotion_type)
-                    if emoji_path:
-                        self.wx.SendFiles(filepath=emoji_path, who=chat_id)
-                        logger.debug(f"已发送表情: {emotion_type}")
-                        time.sleep(random.randint(1, 3))
-                except Exception as e:
-                    logger.error(f"发送表情失败 - {emotion_type}: {str(e)}")
+            self._send_segment(reply, chat_id)
 
     def _send_raw_message(self, text: str, chat_id: str):
         """直接发送原始文本消息，保留所有换行符和格式
@@ -762,13 +867,8 @@ class MessageHandler:
             # 只处理表情符号，不做其他格式处理
             text = self._process_text_for_display(text)
 
-            # 提取表情标签
-            emotion_tags = self.emoji_handler.extract_emotion_tags(text)
-
-            # 清理表情标签
-            clean_text = text
-            for tag in emotion_tags:
-                clean_text = clean_text.replace(f'[{tag}]', '')
+            # 提取并清理表情标签
+            clean_text, emotion_tags = self.emoji_handler.split_emotion_tags(text)
 
             # 直接发送消息，只做必要的处理
             if clean_text:
@@ -776,7 +876,7 @@ class MessageHandler:
                 clean_text = clean_text.replace('＄', '')  # 全角$符号
                 clean_text = clean_text.replace(r'\n', '\r\n\r\n')
                 # logger.info(clean_text)
-                self.wx.SendMsg(msg=clean_text, who=chat_id)
+                self.send_scheduler.schedule(chat_id, lambda: self._send_text(clean_text, chat_id))
                 
                 # logger.info(f"已发送经过处理的文件内容: {file_content}")
 
@@ -817,7 +917,13 @@ class MessageHandler:
         else:
             api_content = content
 
-        reply = self.get_api_response(api_content, chat_id, is_group)
+        # 需要保留原始格式的命令在完整回复后统一发送，其余回复可以流式分段发送
+        preserve_format = bool(command and command in self.preserve_format_commands)
+        stream_sender = None
+        if self.stream_response and not preserve_format:
+            stream_sender = self._create_stream_sender(chat_id, sender_name, is_group)
+
+        reply = self.get_api_response(api_content, chat_id, is_group, on_segment=stream_sender)
         logger.info(f"AI回复: {reply}")
 
         # 处理回复中的思考过程
@@ -832,9 +938,14 @@ class MessageHandler:
         is_system_message = sender_name == "System" or username == "System"
 
         # 发送文本消息和表情
-        if command and command in self.preserve_format_commands:
+        if preserve_format:
             # 如果是需要保留原始格式的命令，使用原始格式发送
             self._send_command_response(command, reply, chat_id)
+        elif stream_sender is not None and stream_sender.sent:
+            # 流式发送：回复已在生成过程中全部分段发送（最后一个片段在回复结束时发送）
+            if reply.startswith("Error"):
+                # 流式中途出错，已发送的片段保持不变，不再发送错误信息
+                logger.warning(f"流式回复中断，已发送 {len(stream_sender.sent)} 个片段")
         else:
             # 否则使用正常的消息发送方式
             self._send_message_with_dollar(reply, chat_id)
@@ -849,6 +960,27 @@ class MessageHandler:
                              args=(chat_id, chat_id, "……", reply, False)).start()
         return reply
 
+    def _create_stream_sender(self, chat_id: str, sender_name: str, is_group: bool):
+        """
+        创建流式片段发送回调，片段完成后立即加入发送队列
+
+        片段之间的间隔由发送调度器保证，与分批发送相同
+        """
+        def send(segment: str):
+            segment = self._process_text_for_display(self._filter_user_tags(segment))
+            if not segment:
+                return
+            if not send.sent:
+                # 群聊中的@标签加在首个片段上
+                segment = self._add_at_tag_if_needed(segment, sender_name, is_group)
+                logger.info(f"[耗时] 流式首条消息: {time.time() - send.start:.2f}秒")
+            self._send_segment(segment, chat_id)
+            send.sent.append(segment)
+
+        send.sent = []
+        send.start = time.time()
+        return send
+
     def _add_to_system_prompt(self, chat_id: str, content: str) -> None:
         """
         将内容添加到系统提示词中
@@ -917,32 +1049,43 @@ class MessageHandler:
             model: 使用的模型（可选，如果不提供则使用用户配置的模型）
         """
         try:
-            # 等待一段时间后再执行总结，确保不占用当前对话的时间
-            # 这里设置为30秒，足够让用户进行下一次对话
-            logger.info(f"开始等待总结生成时间: {url}")
-            time.sleep(30)  # 等待 30 秒
-
-            logger.info(f"开始异步生成总结: {url}")
-
-            # 使用用户配置的模型，如果没有指定模型
-            summary_model = model if model else config.llm.model
-
-            # 使用 network_search_service 中的 llm_service
-            # 生成总结版本，用于系统提示词
-            summary_messages = [
-                {
-                    "role": "user",
-                    "content": f"请将以下内容总结为简洁的要点，以便在系统提示词中使用：\n\n{content}\n\n原始链接或查询: {url}"
-                }
-            ]
-
-            # 调用 network_search_service 中的 llm_service 获取总结版本
-            # 使用用户配置的模型
-            logger.info(f"异步总结使用模型: {summary_model}")
-            summary_result = self.network_search_service.llm_service.chat(
-                messages=summary_messages,
-                model=summary_model
-            )
+            # 同一链接或搜索词已经总结过时直接复用
+            summary_result = self.network_search_service.get_cached_summary(url)
+            if summary_result:
+                logger.info(f"命中总结缓存: {url}")
+            else:
+                # 等待一段时间后再执行总结，确保不占用当前对话的时间
+                # 这里设置为30秒，足够让用户进行下一次对话
+                logger.info(f"开始等待总结生成时间: {url}")
+                time.sleep(30)  # 等待 30 秒
+
+                logger.info(f"开始异步生成总结: {url}")
+
+                # 使用用户配置的模型，如果没有指定模型
+                summary_model = model if model else config.llm.model
+
+                # 使用 network_search_service 中的 llm_service
+                # 生成总结版本，用于系统提示词
+                summary_messages = [
+                    {
+                        "role": "user",
+                        "content": f"请将以下内容总结为简洁的要点，以便在系统提示词中使用：\n\n{content}\n\n原始链接或查询: {url}"
+                    }
+                ]
+
+                # 调用 network_search_service 中的 llm_service 获取总结版本
+                # 使用用户配置的模型
+                logger.info(f"异步总结使用模型: {summary_model}")
+                summary_result = self.network_search_service.llm_service.chat(
+                    messages=summary_messages,
+                    model=summary_model
+                )
+                # 请求失败时返回的是以 Error 开头的错误信息，不能缓存，也不能写入系统提示词
+                if summary_result and summary_result.startswith("Error"):
+                    logger.warning(f"总结请求失败: {summary_result}")
+                    summary_result = None
+                if summary_result:
+                    self.network_search_service.cache_summary(url, summary_result)
 
             if summary_result:
                 # 生成最终的总结内容
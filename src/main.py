@@ -25,12 +25,17 @@ from src.handlers.message import MessageHandler
 from src.services.ai.llm_service import LLMService
 from src.services.ai.image_recognition_service import ImageRecognitionService
 from modules.memory.memory_service import MemoryService
+from src.services.ai.embedding import EmbeddingModelAI
 from modules.memory.content_generator import ContentGenerator
 from src.utils.logger import LoggerConfig
 from colorama import init, Style
 from src.AutoTasker.autoTasker import AutoTasker
 from src.handlers.autosend import AutoSendHandler
-import queue
+from src.utils.message_dedup import MessageDeduplicator
+from src.utils.sharded_worker_pool import ShardedWorkerPool
+from src.utils.ui_lock import ui_lock
+from src.services.http_session import http_pool
+from src.services.history_writer import history_writer
 from collections import defaultdict
 
 # 创建一个事件对象来控制线程的终止
@@ -77,9 +82,9 @@ def initialize_logging():
 # 消息队列接受消息时间间隔
 wait = 1
 
-# 添加消息队列用于分发
-private_message_queue = queue.Queue()
-group_message_queue = queue.Queue()
+# 消息处理线程数，同一会话的消息由同一线程按顺序处理，不同会话并行处理
+PRIVATE_WORKERS = 4
+GROUP_WORKERS = 4
 
 class PrivateChatBot:
     """专门处理私聊的机器人"""
@@ -112,6 +117,7 @@ class PrivateChatBot:
 
             img_path = None
             is_emoji = False
+            is_cropped = False
             is_image_recognition = False
 
             if content and content.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
@@ -121,12 +127,12 @@ class PrivateChatBot:
 
             # 检查动画表情
             if content and "[动画表情]" in content:
-                img_path = self.emoji_handler.capture_and_save_screenshot(username)
+                img_path, is_cropped = self.emoji_handler.capture_sticker(username)
                 is_emoji = True
                 content = None
 
             if img_path:
-                recognized_text = self.image_recognition_service.recognize_image(img_path, is_emoji)
+                recognized_text = self.image_recognition_service.recognize_image(img_path, is_emoji, is_cropped)
                 content = recognized_text if content is None else f"{content} {recognized_text}"
                 is_image_recognition = True
 
@@ -146,18 +152,28 @@ class PrivateChatBot:
 
 class GroupChatBot:
     """专门处理群聊的机器人"""
-    def __init__(self, message_handler_class, base_config, auto_sender, emoji_handler, image_recognition_service):
-        # 为群聊创建独立的消息处理器实例
+    def __init__(self, base_message_handler, base_config, auto_sender, emoji_handler, image_recognition_service):
+        # 每个群聊使用独立的人设和上下文，LLM 客户端、提醒服务等由基础处理器共享
         self.message_handlers = {}  # 为每个群聊维护独立的处理器
-        self.message_handler_class = message_handler_class
+        self.base_message_handler = base_message_handler
         self.base_config = base_config
         self.auto_sender = auto_sender
         self.emoji_handler = emoji_handler
         self.image_recognition_service = image_recognition_service
         self.wx = WeChat()
         self.robot_name = self.wx.A_MyIcon.Name
+        # 重启后恢复的群聊提醒按群聊名称获取群聊专用处理器
+        base_message_handler.reminder_service.set_group_handler_resolver(self.get_group_handler_by_name)
         logger.info(f"群聊机器人初始化完成 - 机器人名称: {self.robot_name}")
 
+    def get_group_handler_by_name(self, group_name):
+        """按群聊名称查找群聊配置并获取群聊专用的消息处理器"""
+        group_config = None
+        if self.base_config.user.group_chat_config:
+            group_config = next((item for item in self.base_config.user.group_chat_config
+                                 if item.group_name == group_name), None)
+        return self.get_group_handler(group_name, group_config)
+
     def get_group_handler(self, group_name, group_config=None):
         """获取或创建群聊专用的消息处理器"""
         if group_name not in self.message_handlers:
@@ -176,26 +192,8 @@ class GroupChatBot:
                 logger.error(f"群聊人设文件不存在: {prompt_path}")
                 group_prompt_content = prompt_content  # 使用默认人设内容作为备选
             
-            # 创建群聊专用的处理器实例，直接使用正确的人设内容
-            handler = self.message_handler_class(
-                root_dir=root_dir,
-                api_key=self.base_config.llm.api_key,
-                base_url=self.base_config.llm.base_url,
-                model=self.base_config.llm.model,
-                max_token=self.base_config.llm.max_tokens,
-                temperature=self.base_config.llm.temperature,
-                max_groups=self.base_config.behavior.context.max_groups,
-                robot_name=self.robot_name,
-                prompt_content=group_prompt_content,  # 使用正确的群聊人设内容
-                image_handler=image_handler,
-                emoji_handler=self.emoji_handler,
-                memory_service=memory_service,
-                content_generator=content_generator
-            )
-            
-            # 手动设置群聊专用属性（避免初始化时使用全局配置）
-            handler.current_avatar = os.path.basename(full_avatar_path)
-            handler.avatar_real_names = handler._extract_avatar_names(full_avatar_path)
+            # 创建群聊专用的轻量处理器：独立的人设、上下文和消息队列，其余服务与私聊处理器共享
+            handler = self.base_message_handler.create_view(group_prompt_content, full_avatar_path)
             
             self.message_handlers[group_name] = handler
             logger.info(f"[群聊] 为群聊 '{group_name}' 创建专用处理器，使用人设: {handler.current_avatar}, 识别名字: {handler.avatar_real_names}")
@@ -216,6 +214,7 @@ class GroupChatBot:
 
             img_path = None
             is_emoji = False
+            is_cropped = False
             is_image_recognition = False
 
             # 处理群聊@消息
@@ -229,12 +228,12 @@ class GroupChatBot:
 
             # 检查动画表情
             if content and "[动画表情]" in content:
-                img_path = self.emoji_handler.capture_and_save_screenshot(username)
+                img_path, is_cropped = self.emoji_handler.capture_sticker(username)
                 is_emoji = True
                 content = None
 
             if img_path:
-                recognized_text = self.image_recognition_service.recognize_image(img_path, is_emoji)
+                recognized_text = self.image_recognition_service.recognize_image(img_path, is_emoji, is_cropped)
                 content = recognized_text if content is None else f"{content} {recognized_text}"
                 is_image_recognition = True
 
@@ -252,45 +251,19 @@ class GroupChatBot:
         except Exception as e:
             logger.error(f"[群聊] 消息处理失败: {str(e)}")
 
-def private_message_processor():
-    """私聊消息处理线程"""
-    logger.info("私聊消息处理线程启动")
-    
-    while not stop_event.is_set():
-        try:
-            # 从队列获取私聊消息
-            msg_data = private_message_queue.get(timeout=1)
-            if msg_data is None:  # 退出信号
-                break
-                
-            msg, chat_name = msg_data
-            private_chat_bot.handle_private_message(msg, chat_name)
-            private_message_queue.task_done()
-            
-        except queue.Empty:
-            continue
-        except Exception as e:
-            logger.error(f"私聊消息处理线程出错: {str(e)}")
+def process_private_message(msg, chat_name):
+    """私聊消息处理（在私聊线程池中执行）"""
+    private_chat_bot.handle_private_message(msg, chat_name)
 
-def group_message_processor():
-    """群聊消息处理线程"""
-    logger.info("群聊消息处理线程启动")
-    
-    while not stop_event.is_set():
-        try:
-            # 从队列获取群聊消息
-            msg_data = group_message_queue.get(timeout=1)
-            if msg_data is None:  # 退出信号
-                break
-                
-            msg, group_name, group_config = msg_data
-            group_chat_bot.handle_group_message(msg, group_name, group_config)
-            group_message_queue.task_done()
-            
-        except queue.Empty:
-            continue
-        except Exception as e:
-            logger.error(f"群聊消息处理线程出错: {str(e)}")
+def process_group_message(msg, group_name, group_config):
+    """群聊消息处理（在群聊线程池中执行）"""
+    group_chat_bot.handle_group_message(msg, group_name, group_config)
+
+# 消息处理线程池：私聊按聊天名称分片，群聊按群名称分片
+# 并行的是消息的预处理（图片、表情包识别请求等）；截图等界面操作仍由 ui_lock 串行，
+# 回复生成在消息队列的定时器线程中执行，不占用这里的工作线程
+private_message_pool = ShardedWorkerPool("PrivateProcessor", PRIVATE_WORKERS, process_private_message, stop_event)
+group_message_pool = ShardedWorkerPool("GroupProcessor", GROUP_WORKERS, process_group_message, stop_event)
 
 # 全局变量
 prompt_content = ""
@@ -304,8 +277,10 @@ auto_sender = None
 private_chat_bot = None
 group_chat_bot = None
 ROBOT_WX_NAME = ""
-processed_messages = set()
-last_processed_content = {}
+# 已处理的消息ID，按数量和时间淘汰，并定期保存快照，重启后不会重复回复最近的消息
+processed_messages = MessageDeduplicator(
+    snapshot_path=os.path.join(root_dir, 'data', 'database', 'processed_messages.json')
+)
 
 def initialize_services():
     """初始化服务实例"""
@@ -347,6 +322,29 @@ def initialize_services():
         base_url=config.llm.base_url,
         image_model=config.media.image_generation.model
     )
+    # 长期记忆：对话嵌入向量保存在各用户的记忆目录中，回复时检索相关往事
+    vector_memory = None
+    context_settings = config.behavior.context
+    if context_settings.long_term_memory and not context_settings.embedding_api_key:
+        logger.warning("未设置嵌入模型的 API Key（embedding_api_key），长期记忆未启用")
+    elif context_settings.long_term_memory:
+        embedding_model = EmbeddingModelAI(
+            model_name=context_settings.embedding_model,
+            dimension=context_settings.embedding_dimension,
+            api_key=context_settings.embedding_api_key,
+            base_url=context_settings.embedding_base_url
+        )
+        if embedding_model.available:
+            # 长期记忆依赖 numpy，只在启用时导入
+            from modules.memory.vector_memory import VectorMemoryStore
+            vector_memory = VectorMemoryStore(
+                embed_texts=embedding_model.get_embeddings_batch,
+                dimension=embedding_model.dimension,
+                model_name=embedding_model.model_name
+            )
+            logger.info(f"长期记忆已启用，嵌入模型: {embedding_model.model_name}（{embedding_model.dimension} 维）")
+        else:
+            logger.warning("嵌入模型不可用，长期记忆未启用")
     memory_service = MemoryService(
         root_dir=root_dir,
         api_key=DEEPSEEK_API_KEY,
@@ -354,7 +352,8 @@ def initialize_services():
         model=MODEL,
         max_token=MAX_TOKEN,
         temperature=TEMPERATURE,
-        max_groups=MAX_GROUPS
+        max_groups=MAX_GROUPS,
+        vector_memory=vector_memory
     )
 
     content_generator = ContentGenerator(
@@ -370,7 +369,10 @@ def initialize_services():
         api_key=config.media.image_recognition.api_key,
         base_url=config.media.image_recognition.base_url,
         temperature=config.media.image_recognition.temperature,
-        model=config.media.image_recognition.model
+        model=config.media.image_recognition.model,
+        max_image_edge=config.media.image_recognition.max_image_edge,
+        image_quality=config.media.image_recognition.image_quality,
+        image_format=config.media.image_recognition.image_format
     )
 
     # 获取机器人名称
@@ -404,14 +406,14 @@ def initialize_services():
 
     # 创建并行聊天机器人实例 
     private_chat_bot = PrivateChatBot(message_handler, image_recognition_service, auto_sender, emoji_handler)
-    group_chat_bot = GroupChatBot(MessageHandler, config, auto_sender, emoji_handler, image_recognition_service)
+    group_chat_bot = GroupChatBot(message_handler, config, auto_sender, emoji_handler, image_recognition_service)
 
     # 启动主动消息倒计时
     auto_sender.start_countdown()
 
 def message_dispatcher():
     """消息分发器 - 将消息分发到对应的处理队列"""
-    global ROBOT_WX_NAME, logger, wait, processed_messages, last_processed_content
+    global ROBOT_WX_NAME, logger, wait, processed_messages
 
     wx = None
     last_window_check = 0
@@ -424,13 +426,17 @@ def message_dispatcher():
             current_time = time.time()
 
             if wx is None or (current_time - last_window_check > check_interval):
-                wx = WeChat()
-                if not wx.GetSessionList():
+                with ui_lock:
+                    wx = WeChat()
+                    has_session = bool(wx.GetSessionList())
+                if not has_session:
                     time.sleep(5)
                     continue
                 last_window_check = current_time
 
-            msgs = wx.GetListenMessage()
+            # 读取新消息与发送、截图等界面操作互斥
+            with ui_lock:
+                msgs = wx.GetListenMessage()
             if not msgs:
                 time.sleep(wait)
                 continue
@@ -466,13 +472,12 @@ def message_dispatcher():
                         
                         if msg_id:
                             processed_messages.add(msg_id)
-                        last_processed_content[who] = content            
                             
                         # 接收窗口名跟发送人一样，代表是私聊，否则是群聊
                         if who == msg.sender:
                             # 私聊消息 - 放入私聊队列
-                            logger.debug(f"[分发] 私聊消息 -> 私聊队列: {who}")
-                            private_message_queue.put((msg, msg.sender))
+                            logger.debug(f"[分发] 私聊消息 -> 私聊线程池: {who}")
+                            private_message_pool.submit(who, msg, msg.sender)
                         else:
                             # 群聊消息 - 检查触发条件后放入群聊队列
                             trigger_reason = ""
@@ -517,8 +522,8 @@ def message_dispatcher():
                                                 break
                             
                             if should_respond:
-                                logger.debug(f"[分发] 群聊消息触发响应 - 原因: {trigger_reason} -> 群聊队列: {who}")
-                                group_message_queue.put((msg, who, group_config))
+                                logger.debug(f"[分发] 群聊消息触发响应 - 原因: {trigger_reason} -> 群聊线程池: {who}")
+                                group_message_pool.submit(who, msg, who, group_config)
                             else:
                                 logger.debug(f"群聊消息未触发响应 - 群聊:{who}, 内容: {content}")
                                 
@@ -552,13 +557,14 @@ def initialize_wx_listener():
             # 循环添加监听对象，设置保存图片和语音消息
             for chat_name in listen_list:
                 try:
-                    # 先检查会话是否存在
-                    if not wx.ChatWith(chat_name):
-                        logger.error(f"找不到会话: {chat_name}")
-                        continue
+                    with ui_lock:
+                        # 先检查会话是否存在
+                        if not wx.ChatWith(chat_name):
+                            logger.error(f"找不到会话: {chat_name}")
+                            continue
 
-                    # 尝试添加监听，设置savepic=True, savevoice=True
-                    wx.AddListenChat(who=chat_name, savepic=True, savevoice=True)
+                        # 尝试添加监听，设置savepic=True, savevoice=True
+                        wx.AddListenChat(who=chat_name, savepic=True, savevoice=True)
                     logger.info(f"成功添加监听: {chat_name}")
                     time.sleep(0.5)  # 添加短暂延迟，避免操作过快
                 except Exception as e:
@@ -658,8 +664,6 @@ def switch_avatar(new_avatar_name):
 def main():
     # 初始化变量
     dispatcher_thread = None
-    private_thread = None
-    group_thread = None
 
     try:
         # 初始化日志系统
@@ -714,23 +718,15 @@ def main():
         dispatcher_thread = threading.Thread(target=message_dispatcher, name="MessageDispatcher")
         dispatcher_thread.daemon = True
         
-        # 启动私聊处理线程
-        private_thread = threading.Thread(target=private_message_processor, name="PrivateProcessor")
-        private_thread.daemon = True
-        
-        # 启动群聊处理线程
-        group_thread = threading.Thread(target=group_message_processor, name="GroupProcessor")
-        group_thread.daemon = True
-        
-        # 启动所有线程
+        # 启动所有线程（私聊、群聊处理线程池按会话分片）
         dispatcher_thread.start()
-        private_thread.start()
-        group_thread.start()
+        private_message_pool.start()
+        group_message_pool.start()
         
         print_status("并行消息处理系统已启动", "success", "CHECK")
         print_status("  ├─ 消息分发器线程", "info", "ANTENNA")
-        print_status("  ├─ 私聊处理器线程", "info", "USER")
-        print_status("  └─ 群聊处理器线程", "info", "USERS")
+        print_status(f"  ├─ 私聊处理线程池 ({PRIVATE_WORKERS} 线程)", "info", "USER")
+        print_status(f"  └─ 群聊处理线程池 ({GROUP_WORKERS} 线程)", "info", "USERS")
 
         # 初始化主动消息系统
         print_status("初始化主动消息系统...", "info", "CLOCK")
@@ -747,20 +743,50 @@ def main():
             return
 
         # 主循环 - 监控并行处理线程状态
+        metrics_interval = 60
+        last_metrics_time = time.time()
         while True:
             time.sleep(1)
             
             # 检查关键线程状态
-            threads_status = [
-                ("消息分发器", dispatcher_thread),
-                ("私聊处理器", private_thread),
-                ("群聊处理器", group_thread)
-            ]
-            
             dead_threads = []
-            for thread_name, thread in threads_status:
-                if not thread.is_alive():
-                    dead_threads.append(thread_name)
+            if not dispatcher_thread.is_alive():
+                dead_threads.append("消息分发器")
+            dead_threads.extend(private_message_pool.get_dead_workers())
+            dead_threads.extend(group_message_pool.get_dead_workers())
+
+            # 定期记录线程池队列深度和等待时间
+            if time.time() - last_metrics_time >= metrics_interval:
+                last_metrics_time = time.time()
+                for pool in (private_message_pool, group_message_pool):
+                    metrics = pool.get_metrics()
+                    logger.info(f"[线程池] {metrics['name']} - 队列深度: {metrics['queue_depth']}, "
+                                f"已处理: {metrics['processed']}, 平均等待: {metrics['avg_wait']:.2f}秒, "
+                                f"最大等待: {metrics['max_wait']:.2f}秒")
+                if image_recognition_service:
+                    cache_stats = image_recognition_service.recognition_cache.stats()
+                    logger.info(f"[图片识别缓存] 命中: {cache_stats['hits']}, 未命中: {cache_stats['misses']}, "
+                                f"命中率: {cache_stats['hit_rate']:.0%}, 缓存数: {cache_stats['size']}")
+                if message_handler:
+                    send_metrics = message_handler.send_scheduler.get_metrics()
+                    logger.info(f"[发送队列] 已发送: {send_metrics['sent']}, 待发送: {send_metrics['pending']}, "
+                                f"失败: {send_metrics['failed']}, 平均延迟: {send_metrics['avg_lag']:.2f}秒")
+                    usage_stats = message_handler.deepseek.usage_stats.stats()
+                    if usage_stats['requests']:
+                        logger.info(f"[提示词缓存] 请求: {usage_stats['requests']}, 提示词: {usage_stats['prompt_tokens']} tokens, "
+                                    f"缓存命中: {usage_stats['cached_tokens']} tokens ({usage_stats['hit_rate']:.0%})")
+                history_metrics = history_writer.get_metrics()
+                if history_metrics['written'] or history_metrics['failed']:
+                    logger.info(f"[聊天记录] 已写入: {history_metrics['written']}, 事务: {history_metrics['batches']}, "
+                                f"失败: {history_metrics['failed']}, 待写入: {history_metrics['pending']}, "
+                                f"P99 延迟: {history_metrics['p99_latency'] * 1000:.1f}ms")
+                if memory_service and memory_service.vector_memory:
+                    memory_metrics = memory_service.vector_memory.get_metrics()
+                    logger.info(f"[长期记忆] 已写入: {memory_metrics['embedded']}, 失败: {memory_metrics['failed']}, "
+                                f"待写入: {memory_metrics['pending']}, 已打开: {memory_metrics['open']}")
+                for host, host_stats in http_pool.stats().items():
+                    logger.info(f"[连接池] {host} - 请求: {host_stats['requests']}, "
+                                f"新建连接: {host_stats['handshakes']}, 复用: {host_stats['reused']}")
             
             if dead_threads:
                 print_status(f"检测到线程异常: {', '.join(dead_threads)}", "warning", "WARNING")
@@ -778,26 +804,29 @@ def main():
         # 设置事件以停止线程
         stop_event.set()
 
-        # 向队列发送退出信号
-        try:
-            private_message_queue.put(None)
-            group_message_queue.put(None)
-        except:
-            pass
-
-        # 等待所有处理线程结束
-        threads_to_wait = [
-            ("消息分发器", dispatcher_thread),
-            ("私聊处理器", private_thread),
-            ("群聊处理器", group_thread)
-        ]
-        
-        for thread_name, thread in threads_to_wait:
-            if thread and thread.is_alive():
-                print_status(f"正在关闭{thread_name}线程...", "info", "SYNC")
-                thread.join(timeout=3)
-                if thread.is_alive():
-                    print_status(f"{thread_name}线程未能正常关闭", "warning", "WARNING")
+        # 保存消息去重快照
+        processed_messages.save()
+
+        # 向线程池发送退出信号并等待处理线程结束
+        print_status("正在关闭消息处理线程池...", "info", "SYNC")
+        private_message_pool.stop()
+        group_message_pool.stop()
+
+        # 发送队列中剩余的消息
+        if message_handler:
+            message_handler.send_scheduler.stop(drain_timeout=30)
+
+        # 写入队列中剩余的聊天记录
+        history_writer.stop()
+        if memory_service and memory_service.vector_memory:
+            memory_service.vector_memory.stop()
+
+        # 等待分发线程结束
+        if dispatcher_thread and dispatcher_thread.is_alive():
+            print_status("正在关闭消息分发器线程...", "info", "SYNC")
+            dispatcher_thread.join(timeout=3)
+            if dispatcher_thread.is_alive():
+                print_status("消息分发器线程未能正常关闭", "warning", "WARNING")
 
         print_status("正在关闭系统...", "warning", "STOP")
         print_status("系统已退出", "info", "BYE")
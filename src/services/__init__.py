@@ -2,14 +2,18 @@ from .database import (
     Base,
     Session,
     ChatMessage,
+    Reminder,
     engine
 )
+from .history_writer import ChatHistoryWriter, history_writer
+from .history_search import ChatHistorySearch, history_search
 
 from .ai.llm_service import LLMService
 from .ai.image_recognition_service import ImageRecognitionService
 
 __all__ = [
-    'Base', 'Session', 'ChatMessage', 'engine',
+    'Base', 'Session', 'ChatMessage', 'Reminder', 'engine', 'ChatHistoryWriter', 'history_writer',
+    'ChatHistorySearch', 'history_search',
     'LLMService', 'ImageRecognitionService'
 ]
 
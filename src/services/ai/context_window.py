@@ -0,0 +1,102 @@
+"""
+对话上下文窗口模块
+按 token 预算管理发送给模型的对话历史，包括:
+- 估算消息的 token 数，每条消息只在加入时估算一次
+- 双端队列保存消息，超出条数上限时淘汰最早的消息，追加和淘汰都是 O(1)
+- 构建请求时从最新消息往前选取，直到用完 token 预算（系统提示词计入预算）；
+  预算只影响单次请求选取的消息，不会丢弃已保存的对话历史
+"""
+
+import logging
+import re
+from collections import deque
+from itertools import islice
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger('main')
+
+# 中日韩文字及全角标点，大多数模型的分词器中约 1 个字 1 个 token
+CJK_PATTERN = re.compile(r'[　-〿぀-ヿ㐀-䶿一-鿿가-힯＀-￯]')
+# 每条消息的角色、分隔符等固定开销
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的 token 数（中日韩文字按 1 字 1 token，其余字符按 4 个字符 1 token）
+
+    :param text: 文本
+    :return: 估算的 token 数
+    """
+    if not text:
+        return 0
+    other = len(CJK_PATTERN.sub('', text))
+    return len(text) - other + (other + 3) // 4
+
+
+def estimate_message_tokens(message: Dict) -> int:
+    """估算一条消息的 token 数（含固定开销）"""
+    content = message.get("content", "")
+    return estimate_tokens(content if isinstance(content, str) else str(content)) + MESSAGE_OVERHEAD
+
+
+class ContextWindow:
+    def __init__(self, max_messages: int, token_budget: int = 0, messages: Optional[List[Dict]] = None):
+        """
+        初始化上下文窗口
+
+        :param max_messages: 最多保存的消息条数
+        :param token_budget: 单次请求的提示词 token 上限（含系统提示词），0 表示只按条数限制（只在 select 时生效）
+        :param messages: 初始消息
+        """
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+        # 元素为 (消息, 估算的 token 数)
+        self._messages: Deque[Tuple[Dict, int]] = deque()
+        self.total_tokens = 0
+        for message in messages or []:
+            self.append(message)
+
+    def append(self, message: Dict):
+        """追加一条消息，超出条数上限时淘汰最早的消息"""
+        tokens = estimate_message_tokens(message)
+        self._messages.append((message, tokens))
+        self.total_tokens += tokens
+        while len(self._messages) > max(self.max_messages, 1):
+            _, dropped = self._messages.popleft()
+            self.total_tokens -= dropped
+
+    def recent(self, count: int) -> List[Dict]:
+        """返回最近的 count 条消息（按时间顺序）"""
+        items = list(islice(reversed(self._messages), count))
+        return [message for message, _ in reversed(items)]
+
+    def select(self, reserved_tokens: int = 0) -> Tuple[List[Dict], int]:
+        """
+        从最新消息往前选取不超过 token 预算的对话历史
+
+        最新的一条消息总会被选中；选取结果不以助手消息开头，保持对话轮次完整。
+
+        :param reserved_tokens: 预算中已被占用的 token 数（系统提示词等）
+        :return: (按时间顺序的消息列表, 这些消息的估算 token 数)
+        """
+        if not self.token_budget:
+            return [message for message, _ in self._messages], self.total_tokens
+        budget = self.token_budget - reserved_tokens
+        selected = []
+        used = 0
+        for message, tokens in reversed(self._messages):
+            if selected and used + tokens > budget:
+                break
+            selected.append((message, tokens))
+            used += tokens
+        while len(selected) > 1 and selected[-1][0].get("role") == "assistant":
+            used -= selected.pop()[1]
+        selected.reverse()
+        return [message for message, _ in selected], used
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return (message for message, _ in self._messages)
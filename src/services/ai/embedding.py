@@ -8,17 +8,20 @@ from tenacity import retry, stop_after_attempt, wait_exponential, wait_fixed, re
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 class EmbeddingModelAI:
-    def __init__(self, model_name='text-embedding-v2', dimension=1024):
+    def __init__(self, model_name='text-embedding-v2', dimension=1024, api_key=None, base_url=None):
         self.client = None
         self.available = True
-        self.api_key = "sk-96d4c845a4ed4ab5b7af7668e298f1c6"
+        self.api_key = api_key or "sk-96d4c845a4ed4ab5b7af7668e298f1c6"
+        self.base_url = base_url or "https://dashscope.aliyuncs.com/compatible-mode/v1"
         self.model_name = model_name
+        # 请求的向量维度，为 0 或 None 时不传 dimensions 参数（部分模型不支持），使用模型的默认维度
+        self.requested_dimension = dimension or None
         self.dimension = dimension
         
         try:
             self.client = OpenAI(
                 api_key=self.api_key,
-                base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
+                base_url=self.base_url,
                 timeout=30.0,
                 max_retries=3
             )
@@ -27,17 +30,23 @@ class EmbeddingModelAI:
             test_response = self.client.embeddings.create(
                 model=self.model_name,  # 使用传入的模型名称
                 input="connection test",
-                dimensions=self.dimension,  # 使用传入的维度参数
-                encoding_format="float"
+                encoding_format="float",
+                **self._dimension_options()
             )
             if not hasattr(test_response, 'data'):
                 raise APIConnectionError("Invalid API response structure")
+            # 以实际返回的向量长度为准（服务端可能忽略 dimensions 参数）
+            self.dimension = len(test_response.data[0].embedding)
                 
         except Exception as e:
             print(f"嵌入模型初始化失败: {str(e)}")
             self._handle_initialization_error(e)
             self.available = False
 
+    def _dimension_options(self):
+        """请求参数中的向量维度"""
+        return {"dimensions": self.requested_dimension} if self.requested_dimension else {}
+
     def _handle_initialization_error(self, error):
         """处理特定类型的初始化错误"""
         if isinstance(error, AuthenticationError):
@@ -54,8 +63,8 @@ class EmbeddingModelAI:
             response = self.client.embeddings.create(
                 model=self.model_name,
                 input=text,
-                dimensions=self.dimension,
-                encoding_format="float"
+                encoding_format="float",
+                **self._dimension_options()
             )
             return response.data[0].embedding
         except APIConnectionError as e:
@@ -73,6 +82,32 @@ class EmbeddingModelAI:
             print(f"未知错误: {str(e)}")
             return None
 
+    def get_embeddings_batch(self, texts, timeout=None):
+        """
+        一次请求获取多条文本的嵌入向量
+
+        :param texts: 文本列表（数量不超过服务端单次请求的上限）
+        :param timeout: 本次请求的超时时间（秒），指定时不重试；None 使用客户端默认设置
+        :return: 与 texts 顺序一致的向量列表，请求失败或超时时为 None
+        """
+        try:
+            client = self.client if timeout is None else self.client.with_options(timeout=timeout, max_retries=0)
+            response = client.embeddings.create(
+                model=self.model_name,
+                input=list(texts),
+                encoding_format="float",
+                **self._dimension_options()
+            )
+            # 按 index 排序，保证与输入顺序一致
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        except AuthenticationError as e:
+            print(f"认证失败: {str(e)}")
+            self.available = False
+            return None
+        except Exception as e:
+            print(f"批量获取嵌入向量失败: {str(e)}")
+            return None
+
     @property
     def status(self):
         """返回服务状态信息"""
@@ -0,0 +1,145 @@
+"""
+图片预处理模块
+在上传到图像识别接口之前压缩图片，减小请求体积，包括:
+- 按 EXIF 方向信息摆正图片（重新编码会丢失方向标记）
+- 限制最长边，按比例缩放
+- 重新编码为 JPEG / WebP，质量可配置
+- 根据实际格式生成正确的 MIME 类型
+- 将聊天窗口截图裁剪到表情包所在区域（可选，识别不可靠时保留完整截图）
+"""
+
+import io
+import logging
+from typing import Optional, Tuple
+
+try:
+    from PIL import Image, ImageChops, ImageOps
+except ImportError:  # Pillow 不可用时直接上传原图
+    Image = None
+    ImageChops = None
+    ImageOps = None
+
+logger = logging.getLogger('main')
+
+# 编码格式对应的 MIME 类型
+FORMAT_MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+    "BMP": "image/bmp",
+}
+
+# 表情包在聊天窗口截图中的大致区域（按窗口宽高的比例：左, 上, 右, 下）
+# 对方的消息在左侧；顶部是标题栏，底部约四分之一是输入框，最后一条消息紧贴输入框上方
+EMOJI_REGION = (0.0, 0.25, 0.6, 0.78)
+# 去除空白后的内容短边小于该值（像素）时视为没有找到表情包
+MIN_EMOJI_SIZE = 32
+# EXIF 中记录图片方向的标签
+EXIF_ORIENTATION = 0x0112
+
+
+def _sniff_mime_type(data: bytes) -> str:
+    """根据文件头判断图片的 MIME 类型"""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"GIF87a") or data.startswith(b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data.startswith(b"BM"):
+        return "image/bmp"
+    return "image/jpeg"
+
+
+def prepare_image(image_path: str, max_edge: int = 1568, quality: int = 85,
+                  image_format: str = "JPEG") -> Tuple[bytes, str]:
+    """
+    读取并压缩图片
+
+    :param image_path: 图片路径
+    :param max_edge: 最长边的像素上限，超出时按比例缩小
+    :param quality: 重新编码的质量（1-95）
+    :param image_format: 重新编码的格式，JPEG 或 WEBP
+    :return: (图片数据, MIME 类型)，压缩后反而更大时返回原图
+    """
+    with open(image_path, "rb") as f:
+        raw = f.read()
+    if Image is None:
+        return raw, _sniff_mime_type(raw)
+
+    image_format = image_format.upper()
+    if image_format not in ("JPEG", "WEBP"):
+        image_format = "JPEG"
+    try:
+        with Image.open(image_path) as img:
+            # 动图只取第一帧
+            img.seek(0)
+            # 手机照片常以横向存储并用 EXIF 标记方向，重新编码后标记丢失，需先按标记旋转
+            rotated = img.getexif().get(EXIF_ORIENTATION, 1) != 1
+            if rotated:
+                img = ImageOps.exif_transpose(img)
+            resized = max(img.size) > max_edge
+            if resized:
+                img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            if img.mode in ("RGBA", "LA", "P"):
+                img = img.convert("RGBA")
+                if image_format == "JPEG":
+                    # JPEG 不支持透明通道，铺白色背景（与聊天窗口背景接近）
+                    background = Image.new("RGB", img.size, (255, 255, 255))
+                    background.paste(img, mask=img.getchannel("A"))
+                    img = background
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+
+            buffer = io.BytesIO()
+            img.save(buffer, format=image_format, quality=quality)
+            encoded = buffer.getvalue()
+    except Exception as e:
+        logger.warning(f"压缩图片失败，将上传原图: {str(e)}")
+        return raw, _sniff_mime_type(raw)
+
+    if not resized and not rotated and len(encoded) >= len(raw):
+        return raw, _sniff_mime_type(raw)
+    return encoded, FORMAT_MIME_TYPES[image_format]
+
+
+def crop_emoji_region(screenshot: "Image.Image", margin: int = 8) -> Optional["Image.Image"]:
+    """
+    将聊天窗口截图裁剪到表情包所在区域
+
+    先按 EMOJI_REGION 截取对方最后一条消息所在的区域，再去掉四周与背景色相同的空白。
+    该区域按常见的窗口布局估计，不同客户端版本、缩放比例下可能不准确，
+    因此没有找到内容、内容过小或内容紧贴区域边缘（表情包可能被截断）时返回 None，由调用方使用完整截图。
+
+    :param screenshot: 聊天窗口截图
+    :param margin: 去除空白后保留的边距
+    :return: 裁剪后的图片，无法可靠裁剪时返回 None
+    """
+    if ImageChops is None:
+        return None
+    width, height = screenshot.size
+    left, top, right, bottom = EMOJI_REGION
+    region = screenshot.crop((int(width * left), int(height * top), int(width * right), int(height * bottom)))
+
+    rgb = region.convert("RGB")
+    # 以右上角像素作为聊天背景色
+    background = Image.new("RGB", rgb.size, rgb.getpixel((rgb.width - 1, 0)))
+    bbox = ImageChops.difference(rgb, background).getbbox()
+    if not bbox:
+        return None
+    if min(bbox[2] - bbox[0], bbox[3] - bbox[1]) < MIN_EMOJI_SIZE:
+        return None
+    if bbox[0] == 0 or bbox[1] == 0 or bbox[2] == region.width or bbox[3] == region.height:
+        return None
+    return region.crop((
+        max(bbox[0] - margin, 0),
+        max(bbox[1] - margin, 0),
+        min(bbox[2] + margin, region.width),
+        min(bbox[3] + margin, region.height)
+    ))
+
+
+def payload_size(image_data: bytes) -> int:
+    """计算图片经 base64 编码后在请求体中占用的字节数"""
+    return (len(image_data) + 2) // 3 * 4
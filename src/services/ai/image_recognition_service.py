@@ -10,6 +10,9 @@
 import base64
 import logging
 import requests
+from src.services.http_session import http_pool
+from src.services.ai.recognition_cache import RecognitionCache
+from src.services.ai.image_preprocess import payload_size, prepare_image
 from typing import Optional
 import os
 
@@ -17,7 +20,8 @@ import os
 logger = logging.getLogger('main')
 
 class ImageRecognitionService:
-    def __init__(self, api_key: str, base_url: str, temperature: float, model: str):
+    def __init__(self, api_key: str, base_url: str, temperature: float, model: str,
+                 max_image_edge: int = 1568, image_quality: int = 85, image_format: str = "JPEG"):
         self.api_key = api_key
         self.base_url = base_url
         # 确保 temperature 在有效范围内
@@ -36,12 +40,26 @@ class ImageRecognitionService:
             'X-KouriChat-Version': version
         }
         self.model = model  # "moonshot-v1-8k-vision-preview"
+        # 上传前的图片压缩参数
+        self.max_image_edge = max_image_edge
+        self.image_quality = min(max(1, image_quality), 95)
+        self.image_format = image_format
 
         if temperature > 1.0:
             logger.warning(f"Temperature值 {temperature} 超出范围，已自动调整为 1.0")
 
-    def recognize_image(self, image_path: str, is_emoji: bool = False) -> str:
-        """使用 Moonshot AI 识别图片内容并返回文本"""
+        # 识别结果缓存：重复的图片和表情包直接返回缓存结果
+        project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        self.recognition_cache = RecognitionCache(os.path.join(project_root, "data", "cache", "image_recognition.json"))
+
+    def recognize_image(self, image_path: str, is_emoji: bool = False, is_cropped: bool = False) -> str:
+        """
+        使用 Moonshot AI 识别图片内容并返回文本
+
+        :param image_path: 图片路径
+        :param is_emoji: 是否为动画表情的聊天窗口截图
+        :param is_cropped: 表情包截图是否已裁剪到表情包区域（决定能否按感知哈希复用识别结果）
+        """
         try:
             # 验证图片路径
             if not os.path.exists(image_path):
@@ -54,10 +72,30 @@ class ImageRecognitionService:
                 logger.error(f"图片文件过大 ({file_size:.2f}MB): {image_path}")
                 return "抱歉，图片文件太大了"
 
-            # 读取并编码图片
+            # 查询识别缓存
+            cache_key = None
+            try:
+                # 未裁剪的表情包截图不缓存（cache_key 为 None）
+                cache_key = self.recognition_cache.make_key(image_path, is_emoji, is_cropped)
+                cached_text = self.recognition_cache.get(cache_key) if cache_key else None
+                if cached_text is not None:
+                    stats = self.recognition_cache.stats()
+                    logger.info(f"命中图片识别缓存（命中率 {stats['hit_rate']:.0%}）: {cached_text}")
+                    return cached_text
+            except Exception as e:
+                logger.warning(f"查询图片识别缓存失败: {str(e)}")
+
+            # 读取、压缩并编码图片
             try:
-                with open(image_path, 'rb') as img_file:
-                    image_content = base64.b64encode(img_file.read()).decode('utf-8')
+                image_data, mime_type = prepare_image(
+                    image_path,
+                    max_edge=self.max_image_edge,
+                    quality=self.image_quality,
+                    image_format=self.image_format
+                )
+                image_content = base64.b64encode(image_data).decode('utf-8')
+                logger.info(f"图片上传大小: {payload_size(image_data) / 1024:.0f}KB "
+                            f"(原图 {file_size * 1024:.0f}KB, {mime_type})")
             except Exception as e:
                 logger.error(f"读取图片文件失败: {str(e)}")
                 return "抱歉，读取图片时出现错误"
@@ -75,7 +113,7 @@ class ImageRecognitionService:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_content}"
+                                    "url": f"data:{mime_type};base64,{image_content}"
                                 }
                             },
                             {
@@ -90,7 +128,7 @@ class ImageRecognitionService:
 
             # 发送请求
             try:
-                response = requests.post(
+                response = http_pool.post(
                     f"{self.base_url}/chat/completions",
                     headers=self.headers,
                     json=data,
@@ -119,6 +157,8 @@ class ImageRecognitionService:
                     recognized_text = "用户发送了一张照片，照片的内容是：" + recognized_text
 
                 logger.info(f"Moonshot AI图片识别结果: {recognized_text}")
+                if cache_key:
+                    self.recognition_cache.put(cache_key, recognized_text)
                 return recognized_text
 
             except requests.exceptions.Timeout:
@@ -144,7 +184,7 @@ class ImageRecognitionService:
                 "temperature": kwargs.get('temperature', self.temperature)
             }
 
-            response = requests.post(
+            response = http_pool.post(
                 f"{self.base_url}/chat/completions",
                 headers=self.headers,
                 json=data
@@ -7,6 +7,7 @@ LLM AI 服务模块
 - 智能错误恢复
 """
 
+import copy
 import logging
 import re
 import os
@@ -16,10 +17,14 @@ import time  # 新增导入
 import pathlib
 from zhdate import ZhDate
 import datetime
-import requests
-from typing import Dict, List, Optional, Tuple, Union
+from src.services.http_session import http_pool
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from openai import OpenAI
 from src.autoupdate.updater import Updater
+from src.services.ai.context_window import ContextWindow, estimate_tokens, MESSAGE_OVERHEAD
+from src.services.ai.prompt_cache import prompt_cache
+from src.services.ai.prompt_layout import PromptUsageStats, build_chat_messages, extract_cached_tokens
+from src.services.ai.stream_segmenter import StreamSegmenter, consume_stream
 from tenacity import (
     retry,
     stop_after_attempt,
@@ -35,7 +40,8 @@ logger = logging.getLogger('main')
 
 class LLMService:
     def __init__(self, api_key: str, base_url: str, model: str,
-                 max_token: int, temperature: float, max_groups: int, auto_model_switch: bool = False):
+                 max_token: int, temperature: float, max_groups: int, auto_model_switch: bool = False,
+                 max_prompt_tokens: int = 0, stable_prompt_prefix: bool = False):
         """
         强化版AI服务初始化
 
@@ -47,6 +53,8 @@ class LLMService:
         :param max_groups: 最大对话轮次记忆
         :param system_prompt: 系统级提示词
         :param auto_model_switch: 是否启用自动模型切换
+        :param max_prompt_tokens: 单次请求提示词的 token 上限（含系统提示词），0 表示只按对话轮次限制
+        :param stable_prompt_prefix: 是否使用稳定前缀布局（静态提示词在前、时间信息在最后），以命中服务端的提示词缓存
         """
         # 创建 Updater 实例获取版本信息
         updater = Updater()
@@ -67,10 +75,19 @@ class LLMService:
             "max_token": max_token,
             "temperature": temperature,
             "max_groups": max_groups,
-            "auto_model_switch": auto_model_switch
+            "auto_model_switch": auto_model_switch,
+            "max_prompt_tokens": max_prompt_tokens,
+            "stable_prompt_prefix": stable_prompt_prefix
         }
         self.original_model = model
-        self.chat_contexts: Dict[str, List[Dict]] = {}
+        self.chat_contexts: Dict[str, ContextWindow] = {}
+        # 提示词用量及服务端缓存命中统计（上下文独立的实例共享同一份统计）
+        self.usage_stats = PromptUsageStats()
+
+        # 基础Prompt与世界观文件路径（内容通过提示词缓存读取）
+        project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        self.base_prompt_path = os.path.join(project_root, "src", "base", "base.md")
+        self.worldview_path = os.path.join(project_root, "src", "base", "worldview.md")
 
         # 安全字符白名单（可根据需要扩展）
         self.safe_pattern = re.compile(r'[\x00-\x1F\u202E\u200B]')
@@ -83,6 +100,20 @@ class LLMService:
 
         self.available_models = self._get_available_models()
 
+    def create_context_view(self) -> "LLMService":
+        """
+        创建共享客户端和配置、但对话上下文独立的实例
+
+        用于群聊等需要隔离上下文的场景，避免为每个群聊重复创建客户端和探测模型列表
+        """
+        view = copy.copy(self)
+        view.chat_contexts = {}
+        return view
+
+    def _new_context(self, messages: List[Dict] = None) -> ContextWindow:
+        """创建按对话轮次和 token 预算限制的上下文窗口"""
+        return ContextWindow(self.config["max_groups"] * 2, self.config.get("max_prompt_tokens", 0), messages)
+
     def _manage_context(self, user_id: str, message: str, role: str = "user"):
         """
         上下文管理器（支持动态记忆窗口）
@@ -92,15 +123,10 @@ class LLMService:
         :param role: 角色类型(user/assistant)
         """
         if user_id not in self.chat_contexts:
-            self.chat_contexts[user_id] = []
+            self.chat_contexts[user_id] = self._new_context()
 
-        # 添加新消息
+        # 添加新消息，超出轮次时自动淘汰最早的消息（token 预算在构建请求时选取）
         self.chat_contexts[user_id].append({"role": role, "content": message})
-
-        # 维护上下文窗口
-        while len(self.chat_contexts[user_id]) > self.config["max_groups"] * 2:
-            # 优先保留最近的对话组
-            self.chat_contexts[user_id] = self.chat_contexts[user_id][-self.config["max_groups"]*2:]
     
     def _build_time_context(self, user_id: str) -> str:
         """构建时间上下文信息"""
@@ -109,7 +135,7 @@ class LLMService:
     
         try:
             # 获取最后两条消息的时间
-            recent_messages = self.chat_contexts[user_id][-2:]
+            recent_messages = self.chat_contexts[user_id].recent(2)
         
             last_msg_time = None
             current_time = datetime.datetime.now()
@@ -139,6 +165,35 @@ class LLMService:
     
         return "请注意时间的连续性。"
 
+    def _read_prompt_fragment(self, path: str, name: str) -> str:
+        """通过提示词缓存读取提示词片段，读取失败时返回空字符串"""
+        try:
+            return prompt_cache.read(path)
+        except FileNotFoundError as e:
+            logger.error(f"{name}文件缺失: {str(e)}")
+        except Exception as e:
+            logger.error(f"{name}文件读取失败: {str(e)}")
+        return ""
+
+    def _get_static_prompt(self, system_prompt: str) -> Tuple[str, str]:
+        """
+        获取静态系统提示词（base + 世界观 + 人设），按人设缓存
+
+        :param system_prompt: 系统提示词（人设）
+        :return: (base + 世界观, 人设部分)，核心记忆拼接在两者之间
+        """
+        base_content = self._read_prompt_fragment(self.base_prompt_path, "基础Prompt")
+        worldview_content = self._read_prompt_fragment(self.worldview_path, "世界观")
+
+        def build() -> Tuple[str, str]:
+            if worldview_content:
+                prefix = f"{base_content}\n\n你所饰演的角色所处世界的世界观为：\n{worldview_content}"
+            else:
+                prefix = base_content
+            return prefix, f"\n\n你所扮演的角色介绍如下：\n{system_prompt}"
+
+        return prompt_cache.get_static_prompt(system_prompt, build)
+
     def _sanitize_response(self, raw_text: str) -> str:
         """
         响应安全处理器
@@ -237,7 +292,8 @@ class LLMService:
             logger.error(f"验证响应时发生错误: {str(e)}")
             return False
 
-    def get_response(self, message: str, user_id: str, system_prompt: str, previous_context: List[Dict] = None, core_memory: str = None) -> str:
+    def get_response(self, message: str, user_id: str, system_prompt: str, previous_context: List[Dict] = None, core_memory: str = None,
+                     on_segment: Callable[[str], None] = None, recalled_memory: str = None) -> str:
         """
         完整请求处理流程
         Args:
@@ -246,6 +302,9 @@ class LLMService:
             system_prompt: 系统提示词（人设）
             previous_context: 历史上下文（可选）
             core_memory: 核心记忆（可选）
+            on_segment: 流式片段回调（可选），提供时以流式方式请求，每个以 $ 分隔的片段完成后立即回调；
+                        返回值仍为完整回复，最后一个片段及上下文更新由调用方在返回后处理（Ollama 不支持，忽略该参数）
+            recalled_memory: 从长期记忆中检索到的相关往事（可选），每次请求都不同，与时间信息放在一起
         """
         # —— 阶段1：输入验证 ——
         if not message.strip():
@@ -256,7 +315,7 @@ class LLMService:
         if previous_context and user_id not in self.chat_contexts:
             logger.info(f"程序启动初始化：为用户 {user_id} 加载历史上下文，共 {len(previous_context)} 条消息")
             # 确保上下文只包含当前用户的历史信息
-            self.chat_contexts[user_id] = previous_context.copy()
+            self.chat_contexts[user_id] = self._new_context(previous_context)
 
         # 添加当前消息到上下文
         self._manage_context(user_id, message)
@@ -278,52 +337,32 @@ class LLMService:
             logger.error(f"获取农历日期失败: {str(e)}")
             lunar_date_str = "未知" # 如果失败则提供一个默认值        
         time_prompt = f"当前时间是 {current_time_str}，{lunar_date_str}。你必须根据当前时间来生成你的回复内容。 {time_context} ，你的活动要符合当前时间段"
-        
-        # 读取基础Prompt
-        try:
-            # 从当前文件位置(llm_service.py)向上导航到项目根目录
-            current_dir = os.path.dirname(os.path.abspath(__file__))  # src/services/ai
-            project_root = os.path.dirname(os.path.dirname(os.path.dirname(current_dir)))  # 项目根目录
-            base_prompt_path = os.path.join(project_root, "src", "base", "base.md")
-
-            with open(base_prompt_path, "r", encoding="utf-8") as f:
-                base_content = f.read()
-        except Exception as e:
-            logger.error(f"基础Prompt文件读取失败: {str(e)}")
-            base_content = ""
-
-        try:
-            project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))  # 项目根目录
-            worldview_path = os.path.join(project_root, "src", "base", "worldview.md")
-            with open(worldview_path, "r", encoding="utf-8") as f:
-                worldview_content = f.read()
-        except FileNotFoundError as e:
-            logger.error(f"世界观文件缺失: {str(e)}")
-        except Exception as e:
-            logger.error(f"加载世界观时出现异常: {str(e)}")
-            worldview_content = ""
+        if recalled_memory:
+            time_prompt = f"{time_prompt}\n\n{recalled_memory}"
 
         # 构建系统提示词: base + 世界观 + 核心记忆 + 人设
-        if not worldview_content and not core_memory:
-            character_prompt = f"{base_content}\n\n你所扮演的角色介绍如下：\n{system_prompt}"
-        elif worldview_content and not core_memory:
-            character_prompt = f"{base_content}\n\n你所饰演的角色所处世界的世界观为：\n{worldview_content}\n\n你所扮演的角色介绍如下：\n{system_prompt}"
-        elif not worldview_content and core_memory:
-            character_prompt = f"{base_content}\n\n你所饰演角色所具备的核心记忆为：\n{core_memory}\n\n你所扮演的角色介绍如下：\n{system_prompt}"
-        else: character_prompt = f"{base_content}\n\n你所饰演的角色所处世界的世界观为：\n{worldview_content}你所饰演角色所具备的核心记忆为：\n{core_memory}\n\n你所扮演的角色介绍如下：\n{system_prompt}"
-
-        # 构建最终的系统提示词，将时间信息放在最前面
-        final_prompt = f"{time_prompt}\n\n{character_prompt}"
-        logger.debug("最终提示词结构：当前时间 + (base.md + 世界观 + 记忆 + 人设)")
+        # base、世界观和人设按人设缓存，每次请求只拼接核心记忆
+        prefix, suffix = self._get_static_prompt(system_prompt)
+        stable_prefix = self.config.get("stable_prompt_prefix", False)
+        _, final_prompt = build_chat_messages(prefix, suffix, core_memory, time_prompt, [], stable_prefix)
+        if stable_prefix:
+            logger.debug("最终提示词结构：(base.md + 世界观 + 人设 + 记忆) + 对话历史 + 当前时间")
+        else:
+            logger.debug("最终提示词结构：当前时间 + (base.md + 世界观 + 记忆 + 人设)")
+
+        # 按 token 预算选取对话历史（系统提示词计入预算）
+        system_tokens = estimate_tokens(final_prompt) + MESSAGE_OVERHEAD * (2 if stable_prefix else 1)
+        chat_history, history_tokens = self.chat_contexts[user_id].select(system_tokens)
+        if self.config.get("max_prompt_tokens") and system_tokens + history_tokens > self.config["max_prompt_tokens"]:
+            logger.warning(f"提示词约 {system_tokens + history_tokens} tokens，超出上限 {self.config['max_prompt_tokens']}"
+                           f"（系统提示词 {system_tokens}，当前消息无法再截取）")
+        logger.debug(f"提示词估算 {system_tokens + history_tokens} tokens，"
+                     f"对话历史 {len(chat_history)}/{len(self.chat_contexts[user_id])} 条")
 
         # 构建消息列表
-        messages = [
-            {"role": "system", "content": final_prompt},
-            *self.chat_contexts.get(user_id, [])[-self.config["max_groups"] * 2:]
-        ]
+        messages, _ = build_chat_messages(prefix, suffix, core_memory, time_prompt, chat_history, stable_prefix)
 
         # 为 Ollama 构建消息内容
-        chat_history = self.chat_contexts.get(user_id, [])[-self.config["max_groups"] * 2:]
         history_text = "\n".join([
             f"{msg['role']}: {msg['content']}"
             for msg in chat_history
@@ -344,6 +383,7 @@ class LLMService:
         
         logger.info(f"准备发送API请求 - 用户: {user_id}, 模型: {self.config['model']}")
 
+        segmenter = None
         for attempt in range(max_retries):
             try:
                 models_tried.append(current_model)
@@ -365,7 +405,7 @@ class LLMService:
                     version = updater.get_current_version()
                     version_identifier = updater.get_version_identifier()
 
-                    response = requests.post(
+                    response = http_pool.post(
                         f"{str(self.client.base_url)}",
                         json=request_config,
                         headers={
@@ -399,15 +439,29 @@ class LLMService:
                         "frequency_penalty": 0.2  # 频率惩罚参数
                     }
 
-                    # 使用 OpenAI 客户端发送请求
-                    response = self.client.chat.completions.create(**request_config)
+                    if on_segment is not None:
+                        # 流式请求：每个片段完成后立即回调，同时汇总完整回复
+                        # 片段与完整回复使用同一个清理函数
+                        segmenter = StreamSegmenter(on_segment, sanitize=self._sanitize_response)
+                        if stable_prefix:
+                            # 流式响应默认不含 usage，需要显式请求才能统计缓存命中
+                            request_config["stream_options"] = {"include_usage": True}
+                        stream = self.client.chat.completions.create(stream=True, **request_config)
+                        raw_content = consume_stream(stream, segmenter)
+                        if not raw_content:
+                            raise ValueError("流式响应内容为空")
+                        self._record_usage(segmenter.usage)
+                    else:
+                        # 使用 OpenAI 客户端发送请求
+                        response = self.client.chat.completions.create(**request_config)
 
-                    # 验证 API 响应结构
-                    if not self._validate_response(response.model_dump()):
-                        raise ValueError(f"错误的API响应结构: {json.dumps(response.model_dump(), default=str)}")
+                        # 验证 API 响应结构
+                        if not self._validate_response(response.model_dump()):
+                            raise ValueError(f"错误的API响应结构: {json.dumps(response.model_dump(), default=str)}")
 
-                    # 获取原始内容
-                    raw_content = response.choices[0].message.content
+                        # 获取原始内容
+                        raw_content = response.choices[0].message.content
+                        self._record_usage(response.usage)
 
                 # 清理响应内容
                 clean_content = self._sanitize_response(raw_content)
@@ -418,6 +472,10 @@ class LLMService:
                 if filtered_content.strip().lower().startswith("error"):
                     raise ValueError(f"错误响应: {filtered_content}")
 
+                # 流式请求：发送最后一个分隔符之后的剩余内容
+                if segmenter is not None:
+                    segmenter.flush()
+
                 # 成功获取有效响应，更新上下文并返回
                 self._manage_context(user_id, filtered_content, "assistant")
                 # 如果使用了备用模型，记录日志
@@ -429,6 +487,10 @@ class LLMService:
                 last_error = f"Error: {str(e)}"
                 logger.warning(f"模型 {current_model} API请求失败 (尝试 {attempt+1}/{max_retries}): {str(e)}")
 
+                # 流式请求已发送过片段时不再重试，避免重复发送
+                if segmenter is not None and segmenter.emitted:
+                    break
+
                 # 如果启用了自动切换模型且这不是最后一次尝试
                 if self.config["auto_model_switch"] and attempt < max_retries - 1:
                     next_model = self._get_next_model(current_model)
@@ -458,6 +520,12 @@ class LLMService:
             return True
         return False
 
+    def _record_usage(self, usage):
+        """记录提示词用量和服务端缓存命中的 token 数"""
+        prompt_tokens, cached_tokens = self.usage_stats.record(usage)
+        if prompt_tokens:
+            logger.debug(f"提示词 {prompt_tokens} tokens，缓存命中 {cached_tokens} tokens")
+
     def analyze_usage(self, response: dict) -> Dict:
         """
         用量分析工具
@@ -467,6 +535,7 @@ class LLMService:
             "prompt_tokens": usage.get("prompt_tokens", 0),
             "completion_tokens": usage.get("completion_tokens", 0),
             "total_tokens": usage.get("total_tokens", 0),
+            "cached_tokens": extract_cached_tokens(usage),
             "estimated_cost": (usage.get("total_tokens", 0) / 1000) * 0.02  # 示例计价
         }
 
@@ -512,7 +581,7 @@ class LLMService:
     def get_ollama_models(self) -> List[Dict]:
         """获取本地 Ollama 可用的模型列表"""
         try:
-            response = requests.get('http://localhost:11434/api/tags')
+            response = http_pool.get('http://localhost:11434/api/tags')
             if response.status_code == 200:
                 models = response.json().get('models', [])
                 return [
@@ -5,11 +5,14 @@
 - 网页内容提取
 - 网络搜索
 - API 请求管理
+- 提取结果、搜索结果和总结的缓存
 """
 
 import logging
+import os
 import re
-import requests
+from src.services.http_session import http_pool
+from src.services.ai.web_content_cache import WebContentCache, normalize_query, normalize_url
 import json
 from typing import List, Optional, Dict, Any, Tuple
 from src.services.ai.llm_service import LLMService
@@ -19,6 +22,10 @@ from src.autoupdate.updater import Updater
 # 获取 logger
 logger = logging.getLogger('main')
 
+# 缓存有效期（秒）：网页内容变化较慢，搜索结果时效性较强
+WEBLENS_CACHE_TTL = 6 * 3600
+SEARCH_CACHE_TTL = 30 * 60
+
 class NetworkSearchService:
     def __init__(self, llm_service: LLMService):
         """
@@ -52,6 +59,10 @@ class NetworkSearchService:
         # URL 检测正则表达式
         self.url_pattern = re.compile(r'(https?://)?((?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{2,})(:\d{2,5})?(/[^\s]*)?')
 
+        # 提取结果、搜索结果和总结的缓存（群聊处理器共享同一个服务实例，因此也共享缓存）
+        project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        self.cache = WebContentCache(os.path.join(project_root, "data", "cache", "web_content.json"))
+
     def detect_urls(self, text: str) -> List[str]:
         """
         从文本中检测 URL
@@ -111,7 +122,7 @@ class NetworkSearchService:
             }
 
             # 发送请求
-            response = requests.post(
+            response = http_pool.post(
                 f"{self.base_url}/chat/completions",
                 headers=self.headers,
                 json=data,
@@ -153,10 +164,71 @@ class NetworkSearchService:
             logger.error(f"直接提取网页内容失败: {str(e)}")
             return None
 
+    def _fetch_web_content(self, url: str) -> Optional[str]:
+        """
+        调用接口提取网页内容
+
+        :param url: 要提取内容的 URL
+        :return: 格式化后的网页内容，如果失败则返回 None
+        """
+        # 始终使用KouriChat模型
+        model = "kourichat-weblens"
+        logger.info(f"使用模型 {model} 提取网页内容")
+
+        # 获取网页内容
+        # 直接传递URL，不包含提示词
+        user_content = url
+
+        content_messages = [
+            {
+                "role": "user",
+                "content": user_content
+            }
+        ]
+
+        # 重新初始化API请求
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+
+        # 直接使用requests调用API而不是使用llm_service
+        response = http_pool.post(
+            f"{self.base_url}/chat/completions",
+            headers=headers,
+            json={
+                "model": model,
+                "messages": content_messages
+            },
+            timeout=120
+        )
+
+        # 检查响应
+        if response.status_code != 200:
+            logger.error(f"提取网页内容API请求失败: {response.status_code}")
+            return None
+
+        response_data = response.json()
+        web_content = response_data['choices'][0]['message']['content']
+
+        if not web_content:
+            logger.error("网页内容提取结果为空")
+            return None
+
+        # 格式化原始内容
+        formatted_content = web_content.replace('\r\n', '\n').replace('\r', '\n')
+        if not formatted_content.startswith('#'):
+            formatted_content = f"# 网页内容摘要\n\n{formatted_content}"
+        if url not in formatted_content:
+            formatted_content = f"{formatted_content}\n\n原始链接: {url}"
+        return formatted_content
+
     def extract_web_content(self, url: str) -> Dict[str, str]:
         """
         提取网页内容，返回原始内容和总结版本
 
+        同一链接（规范化后）的结果会被缓存，并发的相同请求只调用一次接口
+
         :param url: 要提取内容的 URL
         :return: 包含原始内容和总结的字典，如果失败则返回空字典
         """
@@ -166,57 +238,14 @@ class NetworkSearchService:
         }
 
         try:
-            # 始终使用KouriChat模型
-            model = "kourichat-weblens"
-            logger.info(f"使用模型 {model} 提取网页内容")
-
-            # 获取网页内容
-            # 直接传递URL，不包含提示词
-            user_content = url
-
-            content_messages = [
-                {
-                    "role": "user",
-                    "content": user_content
-                }
-            ]
-
-            # 重新初始化API请求
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            # 直接使用requests调用API而不是使用llm_service
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json={
-                    "model": model,
-                    "messages": content_messages
-                },
-                timeout=120
+            formatted_content = self.cache.get_or_fetch(
+                f"weblens:{normalize_url(url)}",
+                lambda: self._fetch_web_content(url),
+                ttl=WEBLENS_CACHE_TTL
             )
-            
-            # 检查响应
-            if response.status_code != 200:
-                logger.error(f"提取网页内容API请求失败: {response.status_code}")
-                return result
-                
-            response_data = response.json()
-            web_content = response_data['choices'][0]['message']['content']
-
-            if not web_content:
-                logger.error("网页内容提取结果为空")
+            if not formatted_content:
                 return result
 
-            # 格式化原始内容
-            formatted_content = web_content.replace('\r\n', '\n').replace('\r', '\n')
-            if not formatted_content.startswith('#'):
-                formatted_content = f"# 网页内容摘要\n\n{formatted_content}"
-            if url not in formatted_content:
-                formatted_content = f"{formatted_content}\n\n原始链接: {url}"
-
             # 保存原始网页内容
             result['original'] = f"以下是链接 {url} 的内容，可作为你的回复参考，但无需直接提及内容来源：\n\n{formatted_content}"
 
@@ -229,10 +258,69 @@ class NetworkSearchService:
             logger.error(f"提取网页内容失败: {str(e)}")
             return result
 
+    def _fetch_search_result(self, query: str, conversation_context: str = None) -> Optional[str]:
+        """
+        调用接口搜索互联网
+
+        :param query: 搜索查询
+        :param conversation_context: 对话上下文
+        :return: 搜索结果，如果失败则返回 None
+        """
+        # 始终使用KouriChat模型
+        model = "kourichat-search"
+        logger.info(f"使用模型 {model} 搜索互联网")
+
+        # 获取搜索结果
+        # 直接传递查询，不包含提示词
+        user_content = query
+
+        # 如果有对话上下文，添加到查询中
+        if conversation_context:
+            user_content = f"本次对话上下文: {conversation_context}\n\n搜索查询: {query}"
+
+        search_messages = [
+            {
+                "role": "user",
+                "content": user_content
+            }
+        ]
+
+        # 重新初始化API请求
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+
+        # 直接使用requests调用API而不是使用llm_service
+        response = http_pool.post(
+            f"{self.base_url}/chat/completions",
+            headers=headers,
+            json={
+                "model": model,
+                "messages": search_messages
+            },
+            timeout=120
+        )
+
+        # 检查响应
+        if response.status_code != 200:
+            logger.error(f"搜索互联网API请求失败: {response.status_code}")
+            return None
+
+        response_data = response.json()
+        search_result = response_data['choices'][0]['message']['content']
+
+        if not search_result:
+            logger.error("搜索结果为空")
+            return None
+        return search_result
+
     def search_internet(self, query: str, conversation_context: str = None) -> Dict[str, str]:
         """
         搜索互联网，返回原始搜索结果和总结版本
 
+        不带对话上下文的搜索按规范化后的搜索词缓存，并发的相同请求只调用一次接口
+
         :param query: 搜索查询
         :param conversation_context: 对话上下文，用于提供更多背景信息
         :return: 包含原始结果和总结的字典，如果失败则返回空字典
@@ -243,52 +331,16 @@ class NetworkSearchService:
         }
 
         try:
-            # 始终使用KouriChat模型
-            model = "kourichat-search"
-            logger.info(f"使用模型 {model} 搜索互联网")
-
-            # 获取搜索结果
-            # 直接传递查询，不包含提示词
-            user_content = query
-
-            # 如果有对话上下文，添加到查询中
             if conversation_context:
-                user_content = f"本次对话上下文: {conversation_context}\n\n搜索查询: {query}"
-
-            search_messages = [
-                {
-                    "role": "user",
-                    "content": user_content
-                }
-            ]
-
-            # 重新初始化API请求
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            # 直接使用requests调用API而不是使用llm_service
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json={
-                    "model": model,
-                    "messages": search_messages
-                },
-                timeout=120
-            )
-            
-            # 检查响应
-            if response.status_code != 200:
-                logger.error(f"搜索互联网API请求失败: {response.status_code}")
-                return result
-                
-            response_data = response.json()
-            search_result = response_data['choices'][0]['message']['content']
-
+                # 带上下文的搜索结果因对话而异，不缓存
+                search_result = self._fetch_search_result(query, conversation_context)
+            else:
+                search_result = self.cache.get_or_fetch(
+                    f"search:{normalize_query(query)}",
+                    lambda: self._fetch_search_result(query),
+                    ttl=SEARCH_CACHE_TTL
+                )
             if not search_result:
-                logger.error("搜索结果为空")
                 return result
 
             # 保存原始搜索结果
@@ -303,6 +355,37 @@ class NetworkSearchService:
             logger.error(f"搜索互联网失败: {str(e)}")
             return result
 
+    def _summary_cache_key(self, source: str) -> str:
+        """总结的缓存键：链接按 URL 规范化，搜索词按查询规范化"""
+        if "http" in source:
+            return f"summary:{normalize_url(source)}"
+        return f"summary:{normalize_query(source)}"
+
+    def get_cached_summary(self, source: str) -> Optional[str]:
+        """
+        获取链接或搜索词已缓存的总结
+
+        :param source: 链接或搜索查询
+        :return: 总结内容，未缓存返回 None
+        """
+        summary = self.cache.get(self._summary_cache_key(source))
+        # 忽略旧版本缓存的错误信息
+        if summary and summary.startswith("Error"):
+            return None
+        return summary
+
+    def cache_summary(self, source: str, summary: str):
+        """
+        缓存链接或搜索词的总结
+
+        :param source: 链接或搜索查询
+        :param summary: 总结内容
+        """
+        if not summary or summary.startswith("Error"):
+            return
+        ttl = WEBLENS_CACHE_TTL if "http" in source else SEARCH_CACHE_TTL
+        self.cache.put(self._summary_cache_key(source), summary, ttl)
+
     def process_message(self, message: str) -> Tuple[bool, Dict[str, str], str]:
         """
         处理消息，只检测URL提取网页内容
@@ -0,0 +1,88 @@
+"""
+提示词缓存模块
+减少每次请求构建系统提示词时的磁盘读取，包含以下功能：
+- 提示词片段缓存（按 路径 + 修改时间 缓存文件内容）
+- 静态系统提示词缓存（base.md + 世界观 + 人设 的拼接结果）
+- 切换人设时的显式失效
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+logger = logging.getLogger('main')
+
+
+class PromptCache:
+    def __init__(self, max_static_prompts: int = 64):
+        """
+        初始化提示词缓存
+
+        :param max_static_prompts: 最多缓存的静态系统提示词数量（按人设计）
+        """
+        self.max_static_prompts = max_static_prompts
+        # {path: (mtime, content)}
+        self._fragments: Dict[str, Tuple[float, str]] = {}
+        # {人设内容: 拼接结果}，按最近使用顺序淘汰
+        self._static_prompts: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read(self, path: str) -> str:
+        """
+        读取提示词片段，文件未修改时直接返回缓存内容
+
+        :param path: 提示词文件路径
+        :return: 文件内容
+        :raises FileNotFoundError: 文件不存在
+        """
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            cached = self._fragments.get(path)
+            if cached and cached[0] == mtime:
+                return cached[1]
+
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+
+        with self._lock:
+            if cached:
+                # 片段已修改，依赖它的静态提示词全部失效
+                logger.info(f"提示词文件已修改，重新加载: {path}")
+                self._static_prompts.clear()
+            self._fragments[path] = (mtime, content)
+        return content
+
+    def get_static_prompt(self, persona: str, builder: Callable[[], Tuple[str, str]]) -> Tuple[str, str]:
+        """
+        获取指定人设的静态系统提示词，未命中时调用 builder 构建
+
+        :param persona: 人设内容，作为缓存键
+        :param builder: 构建函数，返回 (人设之前的部分, 人设部分)
+        :return: (人设之前的部分, 人设部分)
+        """
+        with self._lock:
+            cached = self._static_prompts.get(persona)
+            if cached is not None:
+                self._static_prompts.move_to_end(persona)
+                return cached
+
+        static_prompt = builder()
+
+        with self._lock:
+            self._static_prompts[persona] = static_prompt
+            self._static_prompts.move_to_end(persona)
+            while len(self._static_prompts) > self.max_static_prompts:
+                self._static_prompts.popitem(last=False)
+        return static_prompt
+
+    def invalidate(self):
+        """清空全部缓存（切换人设时调用）"""
+        with self._lock:
+            self._fragments.clear()
+            self._static_prompts.clear()
+        logger.debug("提示词缓存已清空")
+
+
+prompt_cache = PromptCache()
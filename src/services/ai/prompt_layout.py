@@ -0,0 +1,100 @@
+"""
+提示词布局模块
+构建发送给模型的消息列表，并统计服务端提示词缓存的命中情况，包括:
+- 默认布局：时间信息在系统提示词最前面（与原来一致）
+- 稳定前缀布局：base、世界观、人设、核心记忆等静态内容放在最前面，时间等每次都变化的内容放在最后一条消息，
+  使 DeepSeek、OpenAI 等按前缀自动缓存的服务端能够命中缓存
+- 从响应的 usage 中读取缓存命中的 token 数，累计命中率
+"""
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('main')
+
+
+def build_chat_messages(prefix: str, suffix: str, core_memory: Optional[str], time_prompt: str,
+                        history: List[Dict], stable_prefix: bool = False) -> Tuple[List[Dict], str]:
+    """
+    构建消息列表
+
+    :param prefix: base + 世界观
+    :param suffix: 人设部分
+    :param core_memory: 核心记忆（可选）
+    :param time_prompt: 当前时间、时间间隔等每次请求都会变化的内容
+    :param history: 对话历史（最后一条为当前用户消息）
+    :param stable_prefix: 是否使用稳定前缀布局
+    :return: (消息列表, 完整系统提示词文本)
+    """
+    memory_prompt = f"\n\n你所饰演角色所具备的核心记忆为：\n{core_memory}" if core_memory else ""
+    if stable_prefix:
+        # 人设比核心记忆更稳定，放在核心记忆之前；时间放在对话历史之后
+        static_prompt = f"{prefix}{suffix}{memory_prompt}"
+        messages = [
+            {"role": "system", "content": static_prompt},
+            *history,
+            {"role": "system", "content": time_prompt}
+        ]
+        return messages, f"{static_prompt}\n\n{time_prompt}"
+
+    final_prompt = f"{time_prompt}\n\n{prefix}{memory_prompt}{suffix}"
+    return [{"role": "system", "content": final_prompt}, *history], final_prompt
+
+
+def _usage_value(usage: Any, name: str, default: Any = None) -> Any:
+    if usage is None:
+        return default
+    if isinstance(usage, dict):
+        return usage.get(name, default)
+    return getattr(usage, name, default)
+
+
+def extract_cached_tokens(usage: Any) -> int:
+    """
+    读取 usage 中缓存命中的提示词 token 数
+
+    兼容 OpenAI 格式（prompt_tokens_details.cached_tokens）和 DeepSeek 格式（prompt_cache_hit_tokens）
+
+    :param usage: 响应中的 usage（对象或字典）
+    :return: 缓存命中的 token 数，服务端未返回时为 0
+    """
+    details = _usage_value(usage, "prompt_tokens_details")
+    cached = _usage_value(details, "cached_tokens")
+    if cached is None:
+        cached = _usage_value(usage, "prompt_cache_hit_tokens")
+    return int(cached or 0)
+
+
+class PromptUsageStats:
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, usage: Any) -> Tuple[int, int]:
+        """
+        记录一次请求的用量
+
+        :param usage: 响应中的 usage（对象或字典），为 None 时忽略
+        :return: (提示词 token 数, 缓存命中的 token 数)
+        """
+        if usage is None:
+            return 0, 0
+        prompt_tokens = int(_usage_value(usage, "prompt_tokens", 0) or 0)
+        cached_tokens = extract_cached_tokens(usage)
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+        return prompt_tokens, cached_tokens
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "hit_rate": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+            }
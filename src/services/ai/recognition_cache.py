@@ -0,0 +1,175 @@
+"""
+图片识别缓存模块
+按图片内容缓存识别结果，重复发送的表情包和图片无需再次调用识别模型，包括:
+- 照片按文件内容哈希（SHA-256）缓存
+- 已裁剪到表情包区域的截图按感知哈希（dHash，需要 Pillow）缓存，重新截图、重新编码后仍能命中；
+  未裁剪的聊天窗口截图不缓存（整窗截图每次都不同，内容哈希不会命中，感知哈希又主要反映聊天界面）
+- 按数量和时间淘汰，持久化到磁盘
+- 命中率统计
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 不可用时只使用内容哈希
+    Image = None
+
+logger = logging.getLogger('main')
+
+# 旧版本按整窗截图计算的感知哈希键为 "emoji:p:"，不再参与相近匹配，到期后自然淘汰
+PHASH_PREFIX = "emoji:crop:"
+# 感知哈希的汉明距离不超过该值时视为同一张表情包（重新截图、压缩会带来少量差异，放宽会把不同的表情包混为一张）
+PHASH_MAX_DISTANCE = 2
+
+
+def content_hash(image_path: str) -> str:
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def perceptual_hash(image_path: str) -> Optional[str]:
+    """计算图片的差值哈希（dHash，64 位），Pillow 不可用或解码失败时返回 None"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(image_path) as img:
+            pixels = list(img.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    except Exception as e:
+        logger.debug(f"计算感知哈希失败: {str(e)}")
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+
+class RecognitionCache:
+    def __init__(self, cache_path: str, max_entries: int = 2000, max_age: float = 30 * 24 * 3600):
+        """
+        初始化图片识别缓存
+
+        :param cache_path: 缓存文件路径
+        :param max_entries: 最多缓存的识别结果数量
+        :param max_age: 识别结果的最长保留时间（秒）
+        """
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        # {缓存键: {"text": 识别结果, "created": 创建时间, "last_used": 最近使用时间}}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def make_key(self, image_path: str, is_emoji: bool, is_cropped: bool = False) -> Optional[str]:
+        """
+        计算图片的缓存键
+
+        已裁剪到表情包区域的截图优先使用感知哈希，照片使用内容哈希；
+        未裁剪的表情包截图返回 None（不缓存）
+        """
+        if is_emoji and not is_cropped:
+            return None
+        if is_emoji:
+            phash = perceptual_hash(image_path)
+            # 横向无变化的图片（纯色等）哈希值没有区分度，改用内容哈希
+            if phash and phash not in ("0000000000000000", "ffffffffffffffff"):
+                return f"{PHASH_PREFIX}{phash}"
+            return f"emoji:{content_hash(image_path)}"
+        return f"image:{content_hash(image_path)}"
+
+    def _find_similar(self, key: str) -> Optional[str]:
+        """查找感知哈希相近的表情包缓存键（调用方需持有锁）"""
+        target = int(key[len(PHASH_PREFIX):], 16)
+        best_key, best_distance = None, PHASH_MAX_DISTANCE + 1
+        for candidate in self._entries:
+            if not candidate.startswith(PHASH_PREFIX):
+                continue
+            distance = bin(target ^ int(candidate[len(PHASH_PREFIX):], 16)).count("1")
+            if distance < best_distance:
+                best_key, best_distance = candidate, distance
+        return best_key
+
+    def get(self, key: str) -> Optional[str]:
+        """读取识别结果，未命中或已过期返回 None"""
+        now = time.time()
+        with self._lock:
+            if key not in self._entries and key.startswith(PHASH_PREFIX):
+                key = self._find_similar(key) or key
+            entry = self._entries.get(key)
+            if entry is not None and now - entry["created"] > self.max_age:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            entry["last_used"] = now
+            self.hits += 1
+            return entry["text"]
+
+    def put(self, key: str, text: str):
+        """写入识别结果并保存到磁盘"""
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {"text": text, "created": now, "last_used": now}
+            self._evict(now)
+            data = dict(self._entries)
+        self._save(data)
+
+    def _evict(self, now: float):
+        """淘汰过期的结果，超出数量上限时淘汰最久未使用的结果（调用方需持有锁）"""
+        expired = [key for key, entry in self._entries.items() if now - entry["created"] > self.max_age]
+        for key in expired:
+            del self._entries[key]
+        overflow = len(self._entries) - self.max_entries
+        if overflow > 0:
+            for key in sorted(self._entries, key=lambda k: self._entries[k]["last_used"])[:overflow]:
+                del self._entries[key]
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with self._lock:
+                self._entries = data if isinstance(data, dict) else {}
+                self._evict(time.time())
+            logger.info(f"已加载图片识别缓存，共 {len(self._entries)} 条")
+        except Exception as e:
+            logger.warning(f"加载图片识别缓存失败，将重新缓存: {str(e)}")
+
+    def _save(self, data: Dict[str, Dict[str, Any]]):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.error(f"保存图片识别缓存失败: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries
+            }
@@ -0,0 +1,132 @@
+"""
+流式回复分段模块
+流式读取 LLM 回复，在每个以 $ 分隔的片段结束时立即交给发送方，包含以下功能：
+- 跳过 <think>...</think> 思考内容，思考结束前不发送任何片段
+- 跳过 R1 格式（思考过程...\n\n\n最终回复）的思考内容，与非流式回复的过滤规则一致
+- 同时支持半角 $ 和全角 ＄ 分隔符
+- 按文本位置记录已发送的部分，回复结束后发送最后一个片段
+- 汇总完整回复文本，供结束后更新上下文等后续处理
+
+R1 格式只有在三个连续换行出现后才能识别，出现之前已发送的片段无法撤回
+"""
+
+import logging
+import re
+from typing import Callable, Iterable, List, Optional
+
+logger = logging.getLogger('main')
+
+THINK_START = "<think>"
+THINK_END = "</think>"
+R1_SEPARATOR = "\n\n\n"
+DELIMITER_PATTERN = re.compile(r"[$＄]")
+
+
+class StreamSegmenter:
+    def __init__(self, on_segment: Callable[[str], None], sanitize: Callable[[str], str] = None):
+        """
+        初始化分段器
+
+        :param on_segment: 片段回调，每个完整片段调用一次
+        :param sanitize: 片段发送前的清理函数（与非流式回复使用同一个）
+        """
+        self.on_segment = on_segment
+        self.sanitize = sanitize
+        self.text = ""
+        self.emitted: List[str] = []
+        # 最后一个分块中的用量统计（请求时需要 stream_options.include_usage）
+        self.usage = None
+        # 已发送部分在标准化文本中的结束位置
+        self.sent_offset = 0
+
+    def _normalized(self) -> str:
+        """统一换行符后的文本（与非流式回复的清理一致），已接收部分的长度和内容不会因后续文本改变"""
+        return self.text.replace("\r\n", "\n").replace("\r", "\n")
+
+    @staticmethod
+    def _visible_start(text: str) -> Optional[int]:
+        """返回思考内容之后正文的起始位置，思考尚未结束时返回 None"""
+        end = text.rfind(THINK_END)
+        if end != -1:
+            start = end + len(THINK_END)
+        else:
+            stripped = text.lstrip()
+            # 以 <think> 开头（或可能是其前缀）时，等待思考结束
+            if stripped.startswith(THINK_START) or (stripped and THINK_START.startswith(stripped)):
+                return None
+            if THINK_START in text:
+                return None
+            start = 0
+        # R1 格式：三个连续换行之前是思考过程
+        separator = text.find(R1_SEPARATOR, start)
+        if separator != -1:
+            start = separator + len(R1_SEPARATOR)
+        return start
+
+    def feed(self, delta: str):
+        """追加一段增量文本，遇到分隔符时发送已完成的片段"""
+        if not delta:
+            return
+        self.text += delta
+
+        text = self._normalized()
+        visible_start = self._visible_start(text)
+        if visible_start is None:
+            return
+        self._emit_until(text, visible_start)
+
+    def flush(self):
+        """回复结束后发送尚未发送的部分（最后一个分隔符之后的内容）"""
+        text = self._normalized()
+        visible_start = self._visible_start(text)
+        start = self._emit_until(text, visible_start or 0)
+        self._emit(text[start:])
+        self.sent_offset = len(text)
+
+    def _emit_until(self, text: str, visible_start: int) -> int:
+        """发送最后一个分隔符之前的完整片段，返回未发送部分的起始位置"""
+        start = max(self.sent_offset, visible_start)
+        for match in DELIMITER_PATTERN.finditer(text, start):
+            self._emit(text[start:match.start()])
+            start = match.end()
+        self.sent_offset = start
+        return start
+
+    def _emit(self, segment: str):
+        if self.sanitize is not None:
+            segment = self.sanitize(segment)
+        segment = segment.strip()
+        if not segment:
+            return
+        self.emitted.append(segment)
+        try:
+            self.on_segment(segment)
+        except Exception as e:
+            logger.error(f"发送流式片段失败: {str(e)}")
+
+
+def consume_stream(stream: Iterable, segmenter: StreamSegmenter) -> str:
+    """
+    读取 OpenAI 格式的流式响应并交给分段器
+
+    已发送过片段后中途出错时返回已接收的内容，避免重试导致重复发送
+
+    :param stream: chat.completions.create(stream=True) 的返回值
+    :param segmenter: 分段器
+    :return: 完整回复文本（不含 reasoning_content）
+    """
+    try:
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                segmenter.usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            content = getattr(delta, "content", None)
+            if content:
+                segmenter.feed(content)
+    except Exception as e:
+        if not segmenter.emitted:
+            raise
+        logger.warning(f"流式响应中断，使用已接收的内容: {str(e)}")
+    return segmenter.text
@@ -0,0 +1,182 @@
+"""
+网页内容缓存模块
+为网页内容提取、联网搜索和内容总结提供共享缓存，包括:
+- URL 和搜索词规范化，同一链接、同一问题的不同写法共用一条缓存
+- 按条目设置有效期，持久化到磁盘，重启后仍然有效
+- 并发请求合并：同一时间对同一键的多个请求只调用一次接口，其余请求等待并共享结果
+- 命中、合并、实际请求次数统计
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger('main')
+
+# 规范化 URL 时去除的跟踪参数
+TRACKING_PARAMS = {"spm", "from", "fbclid", "gclid", "share_source", "share_medium", "share_token", "vd_source"}
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_url(url: str) -> str:
+    """
+    规范化 URL：补全协议，协议和域名转小写，去掉默认端口、锚点和跟踪参数，查询参数排序
+    """
+    url = url.strip()
+    if not re.match(r"^https?://", url, re.IGNORECASE):
+        url = f"https://{url}"
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme, netloc.rsplit(":", 1)[-1]) in (("http", "80"), ("https", "443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    path = parts.path.rstrip("/") or "/"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith("utm_")
+    )
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+def normalize_query(query: str) -> str:
+    """规范化搜索词：去除首尾空白，合并连续空白，英文转小写"""
+    return _WHITESPACE_PATTERN.sub(" ", query.strip()).lower()
+
+
+class WebContentCache:
+    def __init__(self, cache_path: str, default_ttl: float = 6 * 3600, max_entries: int = 300):
+        """
+        初始化网页内容缓存
+
+        :param cache_path: 缓存文件路径
+        :param default_ttl: 默认有效期（秒）
+        :param max_entries: 最多缓存的条目数量，超出时淘汰最早过期的条目
+        """
+        self.cache_path = cache_path
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        # {缓存键: {"value": 内容, "expires": 过期时间}}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # 正在请求中的键 {缓存键: (完成事件, 结果容器)}
+        self._in_flight: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.coalesced = 0
+        self.fetches = 0
+        self._load()
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存内容，未命中或已过期返回 None"""
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires"] < time.time():
+            del self._entries[key]
+            return None
+        return entry["value"]
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None):
+        """写入缓存内容并保存到磁盘"""
+        with self._lock:
+            self._entries[key] = {"value": value, "expires": time.time() + (ttl or self.default_ttl)}
+            self._evict()
+            data = dict(self._entries)
+        self._save(data)
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Optional[Any]], ttl: Optional[float] = None) -> Optional[Any]:
+        """
+        读取缓存内容，未命中时调用 fetch 获取并写入缓存
+
+        同一时间对同一键只会调用一次 fetch，其他线程等待并共享结果；
+        fetch 返回空值或抛出异常时不写入缓存
+
+        :param key: 缓存键
+        :param fetch: 获取内容的函数
+        :param ttl: 有效期（秒），默认使用 default_ttl
+        :return: 内容，获取失败返回 None
+        """
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                self.hits += 1
+                logger.info(f"命中网页内容缓存: {key}")
+                return value
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                in_flight = (threading.Event(), {})
+                self._in_flight[key] = in_flight
+                is_leader = True
+                self.fetches += 1
+            else:
+                is_leader = False
+                self.coalesced += 1
+
+        done, holder = in_flight
+        if not is_leader:
+            logger.info(f"相同请求正在进行，等待其结果: {key}")
+            done.wait()
+            return holder.get("value")
+
+        value = None
+        try:
+            value = fetch()
+            if value:
+                self.put(key, value, ttl)
+        finally:
+            holder["value"] = value or None
+            with self._lock:
+                self._in_flight.pop(key, None)
+            done.set()
+        return value or None
+
+    def _evict(self):
+        """淘汰过期条目，超出数量上限时淘汰最早过期的条目（调用方需持有锁）"""
+        now = time.time()
+        for key in [key for key, entry in self._entries.items() if entry["expires"] < now]:
+            del self._entries[key]
+        overflow = len(self._entries) - self.max_entries
+        if overflow > 0:
+            for key in sorted(self._entries, key=lambda k: self._entries[k]["expires"])[:overflow]:
+                del self._entries[key]
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with self._lock:
+                self._entries = data if isinstance(data, dict) else {}
+                self._evict()
+            logger.info(f"已加载网页内容缓存，共 {len(self._entries)} 条")
+        except Exception as e:
+            logger.warning(f"加载网页内容缓存失败，将重新缓存: {str(e)}")
+
+    def _save(self, data: Dict[str, Dict[str, Any]]):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.error(f"保存网页内容缓存失败: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        """返回统计数据：缓存命中次数、合并的并发请求数、实际请求次数、缓存条目数"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "coalesced": self.coalesced,
+                "fetches": self.fetches,
+                "size": len(self._entries)
+            }
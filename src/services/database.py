@@ -2,17 +2,26 @@
 数据库服务模块
 提供数据库相关功能，包括:
 - 定义数据库模型
-- 创建数据库连接
+- 创建数据库连接（WAL 模式，读写互不阻塞）
 - 管理会话
 - 存储聊天记录
+- 聊天记录全文索引（FTS5，中文按相邻两字切分）
+
+全文索引不使用触发器，由程序在写入聊天记录的同一事务中调用 index_new_messages 补齐：
+索引 id 大于索引中最大 rowid 的聊天记录。其他工具（命令行、数据库浏览器等）可以正常读写 chat_messages，
+它们新增的记录在下次写入或启动时补进索引；修改过的记录不会重建索引，删除的记录在搜索时因关联不到原记录而被忽略。
 """
 
 import os
+import re
+import logging
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
+from sqlalchemy import create_engine, event, Column, Integer, String, DateTime, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+logger = logging.getLogger('main')
+
 # 创建基类
 Base = declarative_base()
 
@@ -23,8 +32,45 @@ db_path = os.path.join(project_root, 'data', 'database', 'chat_history.db')
 # 确保数据库目录存在
 os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
+# 连续的中日韩文字
+CJK_RUN_PATTERN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3040-\u30ff\uac00-\ud7af]+')
+
+
+def cjk_bigrams(text):
+    """
+    把连续的中日韩文字切分为相邻两字的词（"喜欢小猫" -> "喜欢 欢小 小猫"），其余文字保持不变
+
+    FTS5 自带的分词器不能切分中文，切分后任意两个字以上的词都能按短语精确匹配
+    """
+    if not text:
+        return text
+    return CJK_RUN_PATTERN.sub(
+        lambda m: f" {m.group()} " if len(m.group()) == 1
+        else " " + " ".join(m.group()[i:i + 2] for i in range(len(m.group()) - 1)) + " ",
+        text
+    )
+
+def create_db_engine(path: str):
+    """
+    创建 SQLite 数据库连接
+
+    使用 WAL 日志模式（写入时不阻塞读取）和 synchronous=NORMAL（WAL 模式下断电最多丢失最近提交的事务，
+    不会损坏数据库），避免每次提交都等待磁盘同步
+    """
+    db_engine = create_engine(f'sqlite:///{path}')
+
+    @event.listens_for(db_engine, "connect")
+    def _set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+    return db_engine
+
 # 创建数据库连接
-engine = create_engine(f'sqlite:///{db_path}')
+engine = create_db_engine(db_path)
 
 # 创建会话工厂
 Session = sessionmaker(bind=engine)
@@ -39,5 +85,99 @@ class ChatMessage(Base):
     reply = Column(Text)  # 机器人的回复
     created_at = Column(DateTime, default=datetime.now)
 
+    __table_args__ = (
+        # 按用户查询最近的聊天记录
+        Index('ix_chat_messages_sender_created', 'sender_id', 'created_at'),
+    )
+
+class Reminder(Base):
+    __tablename__ = 'reminders'
+
+    task_id = Column(String(200), primary_key=True)  # 提醒任务ID
+    chat_id = Column(String(100))  # 聊天ID
+    target_time = Column(DateTime, index=True)  # 提醒时间
+    content = Column(Text)  # 提醒内容
+    sender_name = Column(String(100))  # 设置提醒的用户
+    reminder_type = Column(String(20), default="text")  # 提醒类型：text / voice
+    audio_path = Column(Text, nullable=True)  # 语音提醒预生成的音频文件
+    group_name = Column(String(100), nullable=True)  # 群聊提醒所在的群聊，重启后据此恢复群聊专用的处理器
+    created_at = Column(DateTime, default=datetime.now)
+
+# 聊天记录全文索引：不保存原文（content=''），rowid 与 chat_messages.id 相同
+FTS_TABLE_SQL = """
+CREATE VIRTUAL TABLE chat_messages_fts USING fts5(message, reply, content='', tokenize='unicode61')
+"""
+# 旧版本用于同步全文索引的触发器（依赖自定义函数，其他工具写入时会报错），启动时删除
+LEGACY_FTS_TRIGGERS = ("chat_messages_fts_insert", "chat_messages_fts_delete", "chat_messages_fts_update")
+# 补齐索引时每次读取的聊天记录条数
+FTS_INDEX_BATCH = 5000
+
+
+def index_new_messages(conn) -> int:
+    """
+    为尚未建立索引的聊天记录建立全文索引（id 大于索引中最大 rowid 的记录）
+
+    需要在写入聊天记录的同一事务中调用；没有全文索引表（SQLite 不支持 FTS5）时直接返回
+
+    :param conn: 数据库连接（Connection 或 Session.connection()）
+    :return: 新建立索引的记录数
+    """
+    if conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='chat_messages_fts'").first() is None:
+        return 0
+    last = conn.exec_driver_sql("SELECT rowid FROM chat_messages_fts ORDER BY rowid DESC LIMIT 1").scalar() or 0
+    indexed = 0
+    while True:
+        rows = conn.exec_driver_sql(
+            "SELECT id, message, reply FROM chat_messages WHERE id > ? ORDER BY id LIMIT ?",
+            (last, FTS_INDEX_BATCH)).fetchall()
+        if not rows:
+            return indexed
+        conn.exec_driver_sql(
+            "INSERT INTO chat_messages_fts(rowid, message, reply) VALUES (?, ?, ?)",
+            [(row[0], cjk_bigrams(row[1]), cjk_bigrams(row[2])) for row in rows])
+        indexed += len(rows)
+        last = rows[-1][0]
+
+
+def init_fts(db_engine):
+    """创建聊天记录全文索引（删除旧版本的同步触发器），并为尚未建立索引的聊天记录建立索引"""
+    try:
+        with db_engine.begin() as conn:
+            for trigger in LEGACY_FTS_TRIGGERS:
+                conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+            exists = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='chat_messages_fts'").first()
+            if not exists:
+                conn.exec_driver_sql(FTS_TABLE_SQL)
+            indexed = index_new_messages(conn)
+            if indexed:
+                logger.info(f"已为 {indexed} 条聊天记录建立全文索引")
+    except Exception as e:
+        # 部分 SQLite 编译版本不包含 FTS5，此时搜索退化为逐行匹配
+        logger.warning(f"创建聊天记录全文索引失败，搜索将使用逐行匹配: {str(e)}")
+
+
+def add_missing_columns(db_engine):
+    """为已有的表补建新增的可空列（create_all 不会修改已存在的表）"""
+    with db_engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=db_engine.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                    logger.info(f"数据库表 {table.name} 已补建列 {column.name}")
+
+
+def init_db(db_engine):
+    """创建数据库表和索引（已有的表不会重建，缺少的列和索引单独补建）"""
+    Base.metadata.create_all(db_engine)
+    add_missing_columns(db_engine)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db_engine, checkfirst=True)
+    init_fts(db_engine)
+
 # 创建数据库表
-Base.metadata.create_all(engine) 
\ No newline at end of file
+init_db(engine) 
\ No newline at end of file
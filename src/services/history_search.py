@@ -0,0 +1,118 @@
+"""
+聊天记录搜索模块
+基于 FTS5 全文索引搜索历史聊天记录，包括:
+- 把搜索词切分为与索引相同的相邻两字词，按短语精确匹配（两个字以上的中文、英文单词）
+- 单个汉字等无法使用索引的搜索词，在索引结果上再逐行过滤；没有可用索引时逐行匹配
+- 按发送者过滤，按时间（最新优先）或相关度排序
+"""
+
+import logging
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from src.services.database import engine, cjk_bigrams, CJK_RUN_PATTERN
+
+logger = logging.getLogger('main')
+
+
+def build_match_query(query: str) -> Tuple[Optional[str], List[str]]:
+    """
+    把搜索内容转换为 FTS5 查询
+
+    :param query: 搜索内容，多个词用空格分隔（同时包含所有词才匹配）
+    :return: (FTS5 MATCH 表达式，没有可用索引的词时为 None, 需要逐行匹配的词)
+    """
+    phrases = []
+    like_terms = []
+    for term in query.split():
+        # 单个汉字不在索引中（索引只有相邻两字），只能逐行匹配
+        if any(len(run) == 1 for run in CJK_RUN_PATTERN.findall(term)):
+            like_terms.append(term)
+            continue
+        tokens = cjk_bigrams(term).split()
+        if not tokens or not any(re.search(r'\w', token) for token in tokens):
+            continue
+        phrases.append('"' + " ".join(tokens).replace('"', '""') + '"')
+    return (" AND ".join(phrases) if phrases else None), like_terms
+
+
+def _escape_like(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class ChatHistorySearch:
+    def __init__(self, db_engine=engine):
+        """
+        初始化聊天记录搜索
+
+        :param db_engine: 数据库连接（需通过 create_db_engine 创建并已执行 init_db）
+        """
+        self.engine = db_engine
+        self._has_fts = None
+
+    def _fts_available(self, conn) -> bool:
+        if self._has_fts is None:
+            self._has_fts = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='chat_messages_fts'").first() is not None
+        return self._has_fts
+
+    def search(self, query: str, sender_id: str = None, limit: int = 20, order: str = "recent") -> List[Dict]:
+        """
+        搜索聊天记录（用户消息和机器人回复）
+
+        :param query: 搜索内容，多个词用空格分隔
+        :param sender_id: 只搜索该发送者的聊天记录（可选）
+        :param limit: 最多返回的条数
+        :param order: recent 按时间从新到旧，relevance 按相关度
+        :return: [{"id", "sender_id", "sender_name", "message", "reply", "created_at"}]
+        """
+        match, like_terms = build_match_query(query or "")
+        if match is None and not like_terms:
+            return []
+
+        params = {"limit": limit}
+        conditions = []
+        if sender_id:
+            conditions.append("m.sender_id = :sender_id")
+            params["sender_id"] = sender_id
+        for index, term in enumerate(like_terms):
+            conditions.append(f"(m.message LIKE :like{index} ESCAPE '\\' OR m.reply LIKE :like{index} ESCAPE '\\')")
+            params[f"like{index}"] = _escape_like(term)
+
+        columns = "m.id, m.sender_id, m.sender_name, m.message, m.reply, m.created_at"
+        with self.engine.connect() as conn:
+            if match is not None and self._fts_available(conn):
+                params["match"] = match
+                where = " AND ".join(["chat_messages_fts MATCH :match", *conditions])
+                order_by = "bm25(chat_messages_fts)" if order == "relevance" else "f.rowid DESC"
+                sql = (f"SELECT {columns} FROM chat_messages_fts f JOIN chat_messages m ON m.id = f.rowid "
+                       f"WHERE {where} ORDER BY {order_by} LIMIT :limit")
+            else:
+                # 没有全文索引或只有单字搜索词时逐行匹配
+                if match is not None:
+                    for index, term in enumerate([t for t in query.split() if t not in like_terms],
+                                                   start=len(like_terms)):
+                        conditions.append(f"(m.message LIKE :like{index} ESCAPE '\\' "
+                                          f"OR m.reply LIKE :like{index} ESCAPE '\\')")
+                        params[f"like{index}"] = _escape_like(term)
+                sql = f"SELECT {columns} FROM chat_messages m WHERE {' AND '.join(conditions)} ORDER BY m.id DESC LIMIT :limit"
+            try:
+                rows = conn.execute(text(sql), params).fetchall()
+            except Exception as e:
+                logger.error(f"搜索聊天记录失败: {str(e)}")
+                return []
+
+        return [{
+            "id": row[0],
+            "sender_id": row[1],
+            "sender_name": row[2],
+            "message": row[3],
+            "reply": row[4],
+            "created_at": datetime.fromisoformat(row[5]) if isinstance(row[5], str) else row[5]
+        } for row in rows]
+
+
+history_search = ChatHistorySearch()
@@ -0,0 +1,184 @@
+"""
+聊天记录写入模块
+用一个后台线程统一写入聊天记录，包括:
+- 保存消息时只加入队列，不在调用方线程中打开会话和提交
+- 后台线程每次取出队列中已有的全部消息（最多 batch_size 条）一次事务提交，
+  提交期间到达的消息自然攒成下一批，负载低时不额外等待
+- 在写入聊天记录的同一事务中补齐全文索引
+- 按用户查询最近的聊天记录（使用 (sender_id, created_at) 索引）
+- 写入数量、批次、写入延迟统计
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+
+from src.services.database import Session, ChatMessage, index_new_messages
+
+logger = logging.getLogger('main')
+
+# 停止写入线程的标记
+_STOP = object()
+
+
+class ChatHistoryWriter:
+    def __init__(self, session_factory=Session, batch_size: int = 500, flush_interval: float = 0.0,
+                 max_queue: int = 10000):
+        """
+        初始化聊天记录写入器
+
+        :param session_factory: 数据库会话工厂
+        :param batch_size: 单次事务最多写入的消息数
+        :param flush_interval: 收到第一条消息后最多再等待的时间（秒），0 表示只取队列中已有的消息
+        :param max_queue: 队列长度上限，写入跟不上时保存消息的线程会被阻塞
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._idle = threading.Condition()
+        self._unfinished = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        # 最近的写入延迟（加入队列到提交完成，秒）
+        self._latencies = deque(maxlen=100000)
+
+    def start(self):
+        """启动写入线程（首次写入时自动启动）"""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="chat-history-writer", daemon=True)
+            self._thread.start()
+
+    def write(self, sender_id: str, sender_name: str, message: str, reply: str):
+        """
+        保存一条聊天记录（加入写入队列后立即返回）
+
+        :param sender_id: 发送者ID（私聊为用户，群聊为群）
+        :param sender_name: 发送者昵称
+        :param message: 用户消息
+        :param reply: 机器人的回复
+        """
+        if self._thread is None:
+            self.start()
+        with self._idle:
+            self._unfinished += 1
+        self._queue.put(({
+            "sender_id": sender_id,
+            "sender_name": sender_name,
+            "message": message,
+            "reply": reply,
+            "created_at": datetime.now()
+        }, time.perf_counter()))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    # 队列中已有的消息直接取出，队列为空时最多等待到 deadline
+                    item = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write_batch(batch)
+            if stop:
+                return
+
+    def _write_batch(self, batch: List):
+        session = self.session_factory()
+        try:
+            session.execute(insert(ChatMessage), [row for row, _ in batch])
+            # 全文索引与聊天记录在同一事务中提交
+            index_new_messages(session.connection())
+            session.commit()
+            now = time.perf_counter()
+            self.written += len(batch)
+            self.batches += 1
+            self._latencies.extend(now - enqueued for _, enqueued in batch)
+        except Exception as e:
+            session.rollback()
+            self.failed += len(batch)
+            logger.error(f"保存聊天记录失败（{len(batch)} 条）: {str(e)}")
+        finally:
+            session.close()
+            with self._idle:
+                self._unfinished -= len(batch)
+                self._idle.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待队列中的消息全部写入
+
+        :param timeout: 最长等待时间（秒），None 表示一直等待
+        :return: 是否已全部写入
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._unfinished == 0, timeout=timeout)
+
+    def stop(self, timeout: float = 10):
+        """写入队列中剩余的消息后停止写入线程"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout=timeout)
+        if self._thread.is_alive():
+            logger.warning(f"聊天记录写入线程未能在 {timeout} 秒内结束，剩余 {self._unfinished} 条未写入")
+
+    def get_recent_history(self, sender_id: str, limit: int = 20) -> List[Dict]:
+        """
+        按时间顺序返回指定用户最近的聊天记录（不包含仍在写入队列中的消息）
+
+        :param sender_id: 发送者ID
+        :param limit: 最多返回的条数
+        :return: [{"sender_id", "sender_name", "message", "reply", "created_at"}]
+        """
+        session = self.session_factory()
+        try:
+            rows = (session.query(ChatMessage)
+                    .filter(ChatMessage.sender_id == sender_id)
+                    .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+                    .limit(limit)
+                    .all())
+            return [{
+                "sender_id": row.sender_id,
+                "sender_name": row.sender_name,
+                "message": row.message,
+                "reply": row.reply,
+                "created_at": row.created_at
+            } for row in reversed(rows)]
+        finally:
+            session.close()
+
+    def get_metrics(self) -> Dict:
+        latencies = sorted(self._latencies)
+        return {
+            "written": self.written,
+            "batches": self.batches,
+            "failed": self.failed,
+            "pending": self._unfinished,
+            "avg_latency": sum(latencies) / len(latencies) if latencies else 0.0,
+            "p99_latency": latencies[int(len(latencies) * 0.99)] if latencies else 0.0,
+            "max_latency": latencies[-1] if latencies else 0.0
+        }
+
+
+history_writer = ChatHistoryWriter()
@@ -0,0 +1,110 @@
+"""
+HTTP 连接池模块
+为直接调用 HTTP 接口的服务提供共享的会话层，包括:
+- 按 协议 + 主机 + 端口 复用 requests.Session，保持长连接，避免每次请求重新握手
+- 可配置的连接池大小和默认超时
+- 按主机统计请求数、新建连接数（握手次数）和连接复用次数
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from data.config import config
+
+logger = logging.getLogger('main')
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class HttpSessionPool:
+    def __init__(self, pool_maxsize: int = 10, timeout: Timeout = (10, 300)):
+        """
+        初始化连接池
+
+        :param pool_maxsize: 每个主机最多保持的空闲连接数
+        :param timeout: 默认超时（连接超时, 读取超时），调用时传入 timeout 可覆盖
+        """
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self._sessions: Dict[str, requests.Session] = {}
+        self._request_counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def get_session(self, url: str) -> requests.Session:
+        """
+        获取指定地址所属主机的共享会话
+
+        :param url: 请求地址或基础地址
+        :return: 该主机的 requests.Session
+        """
+        key = self._host_key(url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[key] = session
+                self._request_counts[key] = 0
+            self._request_counts[key] += 1
+            return session
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """发送请求，未指定 timeout 时使用默认超时"""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.get_session(url).request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        获取各主机的连接统计
+
+        :return: {主机: {"requests": 请求数, "handshakes": 新建连接数, "reused": 复用连接的请求数}}
+        """
+        result = {}
+        with self._lock:
+            for key, session in self._sessions.items():
+                handshakes = 0
+                adapter = session.get_adapter(key)
+                for pool_key in list(adapter.poolmanager.pools.keys()):
+                    pool = adapter.poolmanager.pools.get(pool_key)
+                    if pool is not None:
+                        handshakes += pool.num_connections
+                requests_count = self._request_counts[key]
+                result[key] = {
+                    "requests": requests_count,
+                    "handshakes": handshakes,
+                    "reused": max(requests_count - handshakes, 0)
+                }
+        return result
+
+    def close(self):
+        """关闭所有会话"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._request_counts.clear()
+
+
+# 连接池大小和默认超时来自配置（大语言模型配置中的 http_* 项）
+http_pool = HttpSessionPool(
+    pool_maxsize=config.llm.http_pool_maxsize,
+    timeout=(config.llm.http_connect_timeout, config.llm.http_read_timeout)
+)
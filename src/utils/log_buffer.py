@@ -0,0 +1,81 @@
+"""
+日志环形缓冲区模块
+保存机器人进程输出的最近日志，供 Web 控制台的多个页面同时读取，包括:
+- 容量固定的环形缓冲区，日志再多内存也不会增长
+- 每行日志带递增序号，读取方按游标（上次读到的序号）续读，互不影响
+- 等待新日志时阻塞在条件变量上，支持长轮询和 SSE 推送
+"""
+
+import threading
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+
+class LogRingBuffer:
+    def __init__(self, capacity: int = 2000):
+        """
+        初始化日志缓冲区
+
+        :param capacity: 最多保存的日志行数，超出时丢弃最早的日志
+        """
+        self.capacity = capacity
+        # 元素为 (序号, 日志内容)，序号从 1 开始递增，清空缓冲区后也不重置
+        self._lines: Deque[Tuple[int, str]] = deque(maxlen=capacity)
+        self._last_seq = 0
+        self._condition = threading.Condition()
+
+    @property
+    def last_seq(self) -> int:
+        """最新一行日志的序号，没有日志时为 0"""
+        with self._condition:
+            return self._last_seq
+
+    def append(self, line: str) -> int:
+        """
+        写入一行日志
+
+        :param line: 日志内容
+        :return: 该行日志的序号
+        """
+        with self._condition:
+            self._last_seq += 1
+            self._lines.append((self._last_seq, line))
+            self._condition.notify_all()
+            return self._last_seq
+
+    def read(self, cursor: int = 0, limit: Optional[int] = None) -> Tuple[List[Tuple[int, str]], int, int]:
+        """
+        读取游标之后的日志
+
+        :param cursor: 上次读到的序号，0 表示从缓冲区中最早的日志开始
+        :param limit: 最多返回的行数
+        :return: ([(序号, 日志内容)], 新游标, 因缓冲区已满被丢弃而错过的行数)
+        """
+        with self._condition:
+            # 游标超过最新序号说明服务端已重启，从头读取
+            if cursor > self._last_seq:
+                cursor = 0
+            lines = [item for item in self._lines if item[0] > cursor]
+            if limit is not None:
+                lines = lines[:limit]
+            first_seq = self._lines[0][0] if self._lines else self._last_seq + 1
+            missed = max(0, first_seq - cursor - 1) if cursor else 0
+            # 没有新日志时游标移到最新序号，跳过已清空的日志
+            new_cursor = lines[-1][0] if lines else self._last_seq
+            return lines, new_cursor, missed
+
+    def wait(self, cursor: int, timeout: float) -> bool:
+        """
+        等待游标之后出现新日志
+
+        :param cursor: 上次读到的序号
+        :param timeout: 最长等待时间（秒）
+        :return: 是否有新日志
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._last_seq != cursor, timeout=timeout)
+
+    def clear(self):
+        """清空缓冲区（序号继续递增，已有的游标仍然有效）"""
+        with self._condition:
+            self._lines.clear()
@@ -0,0 +1,116 @@
+"""
+消息去重模块
+记录已处理的消息ID，避免同一条消息被重复回复，包括:
+- 按插入顺序保存消息ID，超过数量上限或保存时长后自动淘汰
+- 可选的磁盘快照，程序重启后不会重复回复最近的消息
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+logger = logging.getLogger('main')
+
+
+class MessageDeduplicator:
+    def __init__(self, max_entries: int = 10000, ttl: float = 24 * 3600, snapshot_path: Optional[str] = None,
+                 snapshot_interval: float = 30):
+        """
+        初始化消息去重器
+
+        :param max_entries: 最多记录的消息ID数量
+        :param ttl: 消息ID保留时长（秒）
+        :param snapshot_path: 快照文件路径，为 None 时不持久化
+        :param snapshot_interval: 两次自动保存快照的最小间隔（秒）
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        # {消息ID: 记录时间}，按记录时间先后排列
+        self._entries: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_snapshot = time.time()
+
+        if snapshot_path:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, msg_id: Hashable) -> bool:
+        with self._lock:
+            self._evict(time.time())
+            return msg_id in self._entries
+
+    def _evict(self, now: float):
+        """淘汰超出数量上限或已过期的记录（调用方需持有锁）"""
+        entries = self._entries
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        expire_before = now - self.ttl
+        while entries:
+            oldest = next(iter(entries.values()))
+            if oldest >= expire_before:
+                break
+            entries.popitem(last=False)
+
+    def add(self, msg_id: Hashable) -> bool:
+        """
+        记录消息ID
+
+        :param msg_id: 消息ID
+        :return: 该消息ID之前是否已记录（True 表示重复消息）
+        """
+        now = time.time()
+        with self._lock:
+            if msg_id in self._entries:
+                return True
+            self._entries[msg_id] = now
+            self._evict(now)
+            self._dirty = True
+        self._maybe_snapshot(now)
+        return False
+
+    def _maybe_snapshot(self, now: float):
+        if self.snapshot_path and now - self._last_snapshot >= self.snapshot_interval:
+            self.save()
+
+    def save(self):
+        """保存快照到磁盘（原子替换）"""
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = list(self._entries.items())
+            self._dirty = False
+            self._last_snapshot = time.time()
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            logger.error(f"保存消息去重快照失败: {str(e)}")
+
+    def load(self):
+        """从磁盘加载快照，过期记录会被直接丢弃"""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with self._lock:
+                for msg_id, timestamp in data:
+                    self._entries[msg_id] = timestamp
+                self._evict(time.time())
+            logger.info(f"已加载消息去重快照，共 {len(self._entries)} 条记录")
+        except Exception as e:
+            logger.warning(f"加载消息去重快照失败，将重新记录: {str(e)}")
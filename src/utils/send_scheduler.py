@@ -0,0 +1,145 @@
+"""
+消息发送调度模块
+用一个发送线程统一发送所有会话的消息，包括:
+- 每个会话的消息按加入顺序发送
+- 分段间隔用"最早发送时间"表示，生成回复的线程加入队列后立即返回，不再 sleep
+- 不同会话的消息互不等待，到时间即发送
+- 已发送数量、待发送数量、发送延迟统计
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger('main')
+
+
+class SendScheduler:
+    def __init__(self, name: str = "send-scheduler", stop_event: threading.Event = None):
+        """
+        初始化发送调度器
+
+        :param name: 发送线程名称
+        :param stop_event: 全局停止事件（可选）
+        """
+        self.name = name
+        self.stop_event = stop_event or threading.Event()
+        # 待发送的消息堆 (发送时间, 序号, 会话, 发送函数)
+        self._heap: List[Tuple[float, int, str, Callable[[], None]]] = []
+        # 每个会话最后一条消息的发送时间，新消息在此基础上加间隔
+        self._tails: Dict[str, float] = {}
+        self._pending: Dict[str, int] = {}
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self.sent = 0
+        self.failed = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+
+    def start(self):
+        """启动发送线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        logger.info(f"{self.name} 发送线程已启动")
+
+    def schedule(self, chat_id: str, action: Callable[[], None], gap: float = 0.0) -> float:
+        """
+        将一次发送加入队列
+
+        :param chat_id: 会话名称，同一会话的发送按加入顺序执行
+        :param action: 实际执行发送的函数
+        :param gap: 与该会话上一条消息之间的最小间隔（秒）
+        :return: 预计发送时间
+        """
+        with self._condition:
+            release_at = max(time.time(), self._tails.get(chat_id, 0.0) + gap)
+            self._tails[chat_id] = release_at
+            self._pending[chat_id] = self._pending.get(chat_id, 0) + 1
+            heapq.heappush(self._heap, (release_at, next(self._counter), chat_id, action))
+            self._condition.notify()
+        return release_at
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            with self._condition:
+                while not self.stop_event.is_set():
+                    if self._heap:
+                        delay = self._heap[0][0] - time.time()
+                        if delay <= 0:
+                            break
+                        self._condition.wait(timeout=delay)
+                    else:
+                        self._condition.wait(timeout=1)
+                if self.stop_event.is_set():
+                    return
+                release_at, _, chat_id, action = heapq.heappop(self._heap)
+
+            try:
+                action()
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"发送消息失败 - {chat_id}: {str(e)}")
+
+            lag = time.time() - release_at
+            with self._condition:
+                self._pending[chat_id] -= 1
+                if not self._pending[chat_id]:
+                    del self._pending[chat_id]
+                self.sent += 1
+                self.total_lag += lag
+                self.max_lag = max(self.max_lag, lag)
+                self._condition.notify_all()
+
+    def pending(self, chat_id: str = None) -> int:
+        """返回待发送的消息数量，指定会话时只统计该会话"""
+        with self._condition:
+            if chat_id is not None:
+                return self._pending.get(chat_id, 0)
+            return sum(self._pending.values())
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """
+        等待所有消息发送完成
+
+        :param timeout: 最长等待时间（秒），None 表示一直等待
+        :return: 是否已全部发送
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(timeout=remaining)
+            return True
+
+    def stop(self, drain_timeout: float = 0):
+        """
+        停止发送线程
+
+        :param drain_timeout: 停止前等待已排队消息发送完成的最长时间（秒）
+        """
+        if drain_timeout > 0 and not self.wait_idle(drain_timeout):
+            logger.warning(f"{self.name} 仍有 {self.pending()} 条消息未发送")
+        self.stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def get_metrics(self) -> Dict[str, float]:
+        """返回统计数据：已发送、发送失败、待发送数量，平均和最大发送延迟（秒）"""
+        with self._condition:
+            return {
+                "sent": self.sent,
+                "failed": self.failed,
+                "pending": sum(self._pending.values()),
+                "avg_lag": self.total_lag / self.sent if self.sent else 0.0,
+                "max_lag": self.max_lag
+            }
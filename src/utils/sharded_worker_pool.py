@@ -0,0 +1,144 @@
+"""
+分片工作线程池模块
+按会话名称把消息分配到固定的工作线程，包括:
+- 同一会话的消息总是由同一个线程按顺序处理
+- 不同会话的消息在多个线程间并行处理，一个慢会话不会阻塞其他会话
+- 队列深度、等待时间、处理时间统计
+"""
+
+import logging
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger('main')
+
+
+class _ShardStats:
+    """单个分片的统计数据"""
+
+    def __init__(self):
+        self.processed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_handle = 0.0
+        self.max_handle = 0.0
+
+
+class ShardedWorkerPool:
+    def __init__(self, name: str, num_workers: int, handler: Callable[..., Any], stop_event: threading.Event = None):
+        """
+        初始化分片工作线程池
+
+        :param name: 线程池名称，用于线程命名和日志
+        :param num_workers: 工作线程数量
+        :param handler: 消息处理函数，参数为 submit 时传入的参数
+        :param stop_event: 全局停止事件（可选）
+        """
+        self.name = name
+        self.num_workers = max(1, num_workers)
+        self.handler = handler
+        self.stop_event = stop_event or threading.Event()
+        self._queues: List[queue.Queue] = [queue.Queue() for _ in range(self.num_workers)]
+        self._stats: List[_ShardStats] = [_ShardStats() for _ in range(self.num_workers)]
+        self._stats_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def _get_shard(self, key: str) -> int:
+        # 使用稳定哈希，保证同一会话始终落在同一分片
+        return zlib.crc32(str(key).encode("utf-8")) % self.num_workers
+
+    def start(self):
+        """启动所有工作线程"""
+        for index in range(self.num_workers):
+            thread = threading.Thread(target=self._worker, args=(index,), name=f"{self.name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"{self.name} 线程池启动，工作线程数: {self.num_workers}")
+
+    def submit(self, key: str, *args):
+        """
+        提交消息
+
+        :param key: 分片键（私聊为聊天名称，群聊为群名称）
+        :param args: 传给处理函数的参数
+        """
+        self._queues[self._get_shard(key)].put((time.perf_counter(), args))
+
+    def _worker(self, index: int):
+        message_queue = self._queues[index]
+        stats = self._stats[index]
+        while not self.stop_event.is_set():
+            try:
+                item = message_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            if item is None:  # 退出信号
+                break
+
+            enqueue_time, args = item
+            start = time.perf_counter()
+            try:
+                self.handler(*args)
+            except Exception as e:
+                logger.error(f"{self.name}-{index} 消息处理出错: {str(e)}")
+            finally:
+                end = time.perf_counter()
+                wait_time = start - enqueue_time
+                handle_time = end - start
+                with self._stats_lock:
+                    stats.processed += 1
+                    stats.total_wait += wait_time
+                    stats.max_wait = max(stats.max_wait, wait_time)
+                    stats.total_handle += handle_time
+                    stats.max_handle = max(stats.max_handle, handle_time)
+                message_queue.task_done()
+
+    def stop(self, timeout: float = 3):
+        """发送退出信号并等待工作线程结束"""
+        for message_queue in self._queues:
+            message_queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+
+    def join(self):
+        """等待所有已提交的消息处理完成"""
+        for message_queue in self._queues:
+            message_queue.join()
+
+    def get_dead_workers(self) -> List[str]:
+        """返回已退出的工作线程名称"""
+        return [thread.name for thread in self._threads if not thread.is_alive()]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        获取线程池统计数据
+
+        :return: 包含总体和各分片的队列深度、处理数量、平均/最大等待时间和处理时间（秒）
+        """
+        shards = []
+        with self._stats_lock:
+            for index, stats in enumerate(self._stats):
+                processed = stats.processed
+                shards.append({
+                    "shard": index,
+                    "queue_depth": self._queues[index].qsize(),
+                    "processed": processed,
+                    "avg_wait": stats.total_wait / processed if processed else 0.0,
+                    "max_wait": stats.max_wait,
+                    "avg_handle": stats.total_handle / processed if processed else 0.0,
+                    "max_handle": stats.max_handle
+                })
+        processed = sum(shard["processed"] for shard in shards)
+        total_wait = sum(shard["avg_wait"] * shard["processed"] for shard in shards)
+        return {
+            "name": self.name,
+            "workers": self.num_workers,
+            "queue_depth": sum(shard["queue_depth"] for shard in shards),
+            "processed": processed,
+            "avg_wait": total_wait / processed if processed else 0.0,
+            "max_wait": max((shard["max_wait"] for shard in shards), default=0.0),
+            "shards": shards
+        }
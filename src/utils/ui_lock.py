@@ -0,0 +1,16 @@
+"""
+界面自动化锁模块
+wxauto 和 pyautogui 通过切换会话、模拟点击和键盘输入、截图来操作同一个微信窗口，包括:
+- 监听新消息（GetListenMessage）、添加监听
+- 发送文本和文件（SendMsg / SendFiles）
+- 表情包截图（ChatWith + 窗口截图）
+- 语音提醒拨打和挂断电话
+
+多个线程同时操作会互相打断（切换到错误的会话、消息发到别的聊天、截到错误的窗口），
+所有界面操作都需要在持有 ui_lock 时执行。使用可重入锁，持有锁的函数可以调用同样需要锁的函数。
+持有锁期间只做界面操作，不要等待网络请求或模型回复。
+"""
+
+import threading
+
+ui_lock = threading.RLock()
@@ -4,6 +4,8 @@ import json
 from flask import Blueprint, jsonify, request
 from pathlib import Path
 from datetime import datetime
+from modules.memory.short_memory_store import short_memory_store
+from modules.memory.relationship_index import relationship_index
 
 avatar_bp = Blueprint('avatar', __name__)
 
@@ -317,6 +319,9 @@ def save_core_memory():
         
         with open(memory_path, 'w', encoding='utf-8') as f:
             json.dump(memory_data, f, ensure_ascii=False, indent=2)
+
+        # 同步更新关系索引
+        relationship_index.update(str(memory_dir.parent), user_id, memory_data["content"])
             
         return jsonify({'status': 'success'})
     except Exception as e:
@@ -332,23 +337,10 @@ def load_short_memory():
         if not avatar_name:
             return jsonify({'status': 'error', 'message': '未提供角色名称'})
             
-        memory_path = AVATARS_DIR / avatar_name / 'memory' / user_id / 'short_memory.json'
+        memory_dir = AVATARS_DIR / avatar_name / 'memory' / user_id
         
-        # 如果记忆文件不存在，则返回空内容
-        if not memory_path.exists():
-            # 创建记忆目录
-            memory_dir = AVATARS_DIR / avatar_name / 'memory' / user_id
-            memory_dir.mkdir(parents=True, exist_ok=True)
-            
-            # 创建空的短期记忆文件
-            with open(memory_path, 'w', encoding='utf-8') as f:
-                json.dump([], f, ensure_ascii=False, indent=2)
-            
-            return jsonify({'status': 'success', 'conversations': []})
-            
-        # 读取短期记忆文件
-        with open(memory_path, 'r', encoding='utf-8') as f:
-            conversations = json.load(f)
+        # 读取短期记忆（快照 + 追加日志，两者都不存在时为空列表）
+        conversations = short_memory_store.load(str(memory_dir))
             
         return jsonify({'status': 'success', 'conversations': conversations})
     except Exception as e:
@@ -370,11 +362,8 @@ def save_short_memory():
         memory_dir = AVATARS_DIR / avatar_name / 'memory' / user_id
         memory_dir.mkdir(parents=True, exist_ok=True)
         
-        memory_path = memory_dir / 'short_memory.json'
-        
-        # 保存短期记忆
-        with open(memory_path, 'w', encoding='utf-8') as f:
-            json.dump(conversations, f, ensure_ascii=False, indent=2)
+        # 保存短期记忆（整体替换快照并清空追加日志）
+        short_memory_store.replace(str(memory_dir), conversations)
             
         return jsonify({'status': 'success'})
     except Exception as e:
@@ -395,11 +384,8 @@ def clear_short_memory():
         memory_dir = AVATARS_DIR / avatar_name / 'memory' / user_id
         memory_dir.mkdir(parents=True, exist_ok=True)
         
-        memory_path = memory_dir / 'short_memory.json'
-        
-        # 清空短期记忆
-        with open(memory_path, 'w', encoding='utf-8') as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
+        # 清空短期记忆（快照和追加日志）
+        short_memory_store.clear(str(memory_dir))
             
         return jsonify({'status': 'success'})
     except Exception as e:
@@ -431,6 +417,9 @@ def clear_core_memory():
         
         with open(memory_path, 'w', encoding='utf-8') as f:
             json.dump(memory_data, f, ensure_ascii=False, indent=2)
+
+        # 同步更新关系索引
+        relationship_index.update(str(memory_dir.parent), user_id, memory_data["content"])
             
         return jsonify({'status': 'success'})
     except Exception as e: